@@ -1,14 +1,25 @@
--- Detect vendors with high failure rate
+-- `extractions_all` = live `extractions` table + daily Parquet partitions.
+-- Filter on `date` so only the matching partitions are read.
+
+-- Detect vendors with high failure rate (last 30 days)
 SELECT vendor_name, COUNT(*) AS total, AVG(valid::INT) AS accuracy
-FROM extractions
+FROM extractions_all
 WHERE field_name = 'vendor_name'
+  AND date >= current_date - INTERVAL 30 DAY
 GROUP BY vendor_name
 HAVING AVG(valid::INT) < 0.9;
 
--- Identify fields with recurrent validation issues
+-- Identify fields with recurrent validation issues (last 7 days)
 SELECT field_name, COUNT(*) AS failures
-FROM extractions
+FROM extractions_all
 WHERE valid = FALSE
+  AND date >= current_date - INTERVAL 7 DAY
 GROUP BY field_name
 ORDER BY failures DESC
 LIMIT 10;
+
+-- All-time failure counts are kept incrementally; no scan needed
+SELECT field_name, failures
+FROM field_failures
+ORDER BY failures DESC
+LIMIT 10;
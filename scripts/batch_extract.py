@@ -0,0 +1,76 @@
+"""Run the extraction pipeline over many PDFs and write NDJSON results.
+
+Takes either a directory (searched recursively for `*.pdf`) or a manifest
+(one path per line, or JSON lines with `path` and optional `request_id`).
+Records are appended to `--out` as each document finishes. Rerunning the
+same command after a crash skips every request ID that already has an `ok`
+record in `--out`, so only unfinished or failed documents are processed.
+
+Run from repo root:
+
+    python scripts/batch_extract.py --dir /data/backfill --out reports/backfill.ndjson --workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import orjson
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.postprocess.analytics import close_connection, init_schema  # noqa: E402
+from idp.services.batch import (  # noqa: E402
+    BatchRunner,
+    completed_request_ids,
+    items_from_directory,
+    items_from_manifest,
+)
+from idp.services.pipeline import ExtractionPipeline  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=Path, help="directory of PDFs (recursive)")
+    source.add_argument("--manifest", type=Path, help="file listing PDFs, one per line or JSON lines")
+    parser.add_argument("--out", type=Path, required=True, help="NDJSON output, appended to on resume")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent documents (default: settings)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute instead of serving cached results")
+    args = parser.parse_args()
+
+    items = items_from_directory(args.dir) if args.dir else items_from_manifest(args.manifest)
+    done = completed_request_ids(args.out)
+    todo = sum(1 for item in items if item.request_id not in done)
+    print(f"{len(items)} documents, {len(items) - todo} already complete, {todo} to process", file=sys.stderr)
+
+    init_schema()
+    pipeline = ExtractionPipeline()
+    runner = BatchRunner.from_settings(pipeline)
+    if args.workers:
+        runner = BatchRunner(pipeline, workers=args.workers)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    ok = failed = 0
+    try:
+        with args.out.open("ab") as out:
+            for record in runner.run(items, skip=done, use_cache=not args.no_cache):
+                out.write(orjson.dumps(record) + b"\n")
+                out.flush()
+                if record["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                    print(f"failed: {record['source']}: {record['error']}", file=sys.stderr)
+    finally:
+        pipeline.close()
+        close_connection()
+    elapsed = time.perf_counter() - start
+    print(f"done: {ok} ok, {failed} failed in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
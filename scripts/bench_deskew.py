@@ -0,0 +1,108 @@
+"""Microbenchmark: min-area-rect deskew vs projection-profile deskew.
+
+Renders synthetic invoice pages at a letter-size raster, rotates each one by a
+known angle, optionally adds scanner-style noise, median-blurs it the way
+`preprocess_array` does, and then times both skew estimators and the full
+deskew step (estimate + rotation) on the result.
+
+Run from repo root:
+
+    python scripts/bench_deskew.py --dpi 300 --angles -7 -3 -1 0 0.5 2 5
+
+Prints per-method mean/max absolute angle error (degrees) and mean latency.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from bench_preprocess import _letter_page  # noqa: E402
+
+from idp.ocr.preprocess import (  # noqa: E402
+    PreprocessConfig,
+    _deskew,
+    _deskew_projection,
+    estimate_skew_min_area_rect,
+    estimate_skew_projection,
+)
+from tests.fixtures.synthetic import make_invoice  # noqa: E402
+
+
+def _skewed_pages(dpi: int, angles: List[float], noise: int, seeds: int) -> List[tuple]:
+    rng = np.random.default_rng(0)
+    pages = []
+    with tempfile.TemporaryDirectory(prefix="idp_bench_") as tmp:
+        for seed in range(seeds):
+            source = make_invoice(Path(tmp) / f"src{seed}.png", seed=seed).image_path
+            gray = cv2.cvtColor(np.asarray(_letter_page(source, dpi)), cv2.COLOR_RGB2GRAY)
+            h, w = gray.shape
+            for angle in angles:
+                M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+                page = cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+                if noise:
+                    page = np.clip(page.astype(np.int16) - rng.integers(0, noise, page.shape), 0, 255)
+                    page = page.astype(np.uint8)
+                pages.append((angle, cv2.medianBlur(page, 3)))
+    return pages
+
+
+def _bench(pages: List[tuple], estimate, deskew) -> Dict:
+    errors: List[float] = []
+    estimate_ms: List[float] = []
+    deskew_ms: List[float] = []
+    for angle, page in pages:
+        start = time.perf_counter()
+        skew = estimate(page) or 0.0
+        estimate_ms.append((time.perf_counter() - start) * 1000)
+        errors.append(abs(skew - angle))
+        start = time.perf_counter()
+        deskew(page)
+        deskew_ms.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_abs_error_deg": round(statistics.mean(errors), 3),
+        "max_abs_error_deg": round(max(errors), 3),
+        "estimate_ms_mean": round(statistics.mean(estimate_ms), 2),
+        "deskew_ms_mean": round(statistics.mean(deskew_ms), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--angles", type=float, nargs="+", default=[-7.0, -3.0, -1.0, 0.0, 0.5, 2.0, 5.0])
+    parser.add_argument("--noise", type=int, default=20, help="max darkening per pixel; 0 for clean pages")
+    parser.add_argument("--seeds", type=int, default=2)
+    args = parser.parse_args()
+
+    cfg = PreprocessConfig(dpi=args.dpi, deskew_method="projection")
+    pages = _skewed_pages(args.dpi, args.angles, args.noise, args.seeds)
+    results = {
+        "dpi": args.dpi,
+        "pages": len(pages),
+        "noise": args.noise,
+        "min_area_rect": _bench(pages, estimate_skew_min_area_rect, _deskew),
+        "projection": _bench(
+            pages,
+            lambda page: estimate_skew_projection(page, cfg),
+            lambda page: _deskew_projection(page, cfg),
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
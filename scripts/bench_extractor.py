@@ -0,0 +1,78 @@
+"""Microbenchmark: anchor-prefiltered `FieldScanner` vs one `re.search` per pattern.
+
+Builds OCR-like full text for a 1-page and a 100-page document. Page 1 of each
+carries an invoice's labelled fields; the other pages are body text (line
+items and terms wording) with no labels, so patterns that never match have to
+be ruled out over the whole document. Both extractor paths run on each text,
+their predictions are checked to be identical, and the best-of-`--repeat`
+time per call is reported.
+
+Run from repo root:
+
+    python scripts/bench_extractor.py --pages 1 100 --repeat 20
+
+Prints a JSON summary with per-call latency for each path and the speedup.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.models.extractor import HeuristicExtractor  # noqa: E402
+from idp.ocr.tesseract_engine import OCRResult  # noqa: E402
+
+_FIELDS_PAGE = (
+    "ACME WIDGETS INC. 123 Industrial Way, Springfield Invoice Number: INV-{n} Invoice Date: 2024-03-15 "
+    "Due Date: 2024-04-14 Description Qty Price Widget A 10 50.00 Widget B 5 120.00 "
+    "Subtotal: $1,100.00 Tax: $88.00 Total: $1,188.00 Tax ID: 12-3456789 Routing Number: 021000021 "
+    "Account Number: 0123456789"
+)
+_WORDS = (
+    "the supplier shall deliver goods under these terms and conditions payment is made within thirty days "
+    "of receipt late fees apply to any outstanding balance widget assembly unit qty price each shipping "
+    "handling warranty covers defects in materials and workmanship for twelve months from delivery"
+).split()
+
+
+def _document(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    body = [" ".join(rng.choice(_WORDS) for _ in range(350)) for _ in range(pages - 1)]
+    return "\n".join([_FIELDS_PAGE.format(n=10000 + seed), *body])
+
+
+def _bench(text: str, repeat: int) -> Dict:
+    ocr = OCRResult(tokens=[], full_text=text, metadata={})
+    scanner, reference = HeuristicExtractor(), HeuristicExtractor(use_scanner=False)
+    assert scanner.extract(ocr) == reference.extract(ocr), "scanner and reference disagree"
+    number = max(1, 2000 // max(1, len(text) // 1000))
+    timings = {}
+    for name, extractor in (("reference", reference), ("scanner", scanner)):
+        best = min(timeit.repeat(lambda: extractor.extract(ocr), number=number, repeat=repeat))
+        timings[name] = best / number * 1e6
+    return {
+        "chars": len(text),
+        "reference_us": round(timings["reference"], 1),
+        "scanner_us": round(timings["scanner"], 1),
+        "speedup": round(timings["reference"] / timings["scanner"], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    results = {f"pages={pages}": _bench(_document(pages), args.repeat) for pages in args.pages}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
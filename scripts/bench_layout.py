@@ -0,0 +1,136 @@
+"""Microbenchmark: `TokenGrid` neighbour queries vs a scan over every token.
+
+Builds one synthetic letter page at 300 DPI per token count: a few labelled
+invoice fields at the top and rows of filler words below, as on a dense
+terms-and-conditions page. For each page it reports:
+
+  * build_ms     — building the `TokenIndex` (best of `--repeat`)
+  * grid_us      — nearest "same row to the right" plus "directly below"
+                   lookup for a sampled token through the grid
+  * scan_us      — the same two lookups by scanning all tokens (what a
+                   pairwise layout pass does per token)
+  * extract_ms   — a full `LayoutExtractor.extract` on the page (best of
+                   `--repeat`)
+
+Grid queries should stay roughly flat as the token count grows while the
+scan grows linearly. Run from repo root:
+
+    python scripts/bench_layout.py --tokens 250 1000 4000 16000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.models.layout import LayoutExtractor  # noqa: E402
+from idp.ocr.tesseract_engine import OCRResult, OCRToken  # noqa: E402
+from idp.ocr.token_index import TokenIndex  # noqa: E402
+
+_WIDTH, _HEIGHT = 2550, 3300
+_HEADER = [["Invoice", "Number:", "INV-10042"], ["Invoice", "Date:", "2024-03-15"], ["Total:", "$1,188.00"]]
+
+
+def _page(n_tokens: int, seed: int = 0) -> List[OCRToken]:
+    rng = random.Random(seed)
+    tokens: List[OCRToken] = []
+    for row, words in enumerate(_HEADER):
+        x, y = 150, 100 + 40 * row
+        for word in words:
+            tokens.append(OCRToken(word, 0.9, (x, y, x + 14 * len(word), y + 24), 1))
+            x += 14 * len(word) + 12
+    rows = max(1, min(120, round(math.sqrt(n_tokens))))
+    per_row = math.ceil(n_tokens / rows)
+    pitch_x = (_WIDTH - 300) // per_row
+    pitch_y = (_HEIGHT - 400) // rows
+    for i in range(n_tokens):
+        r, c = divmod(i, per_row)
+        x, y = 150 + c * pitch_x, 250 + r * pitch_y
+        w = max(4, int(pitch_x * rng.uniform(0.5, 0.85)))
+        tokens.append(OCRToken("lorem", 0.9, (x, y, x + w, y + min(24, pitch_y - 2)), 1))
+    return tokens
+
+
+def _scan_right(tokens: List[OCRToken], box) -> Optional[OCRToken]:
+    x0, y0, x1, y1 = box
+    best = None
+    for t in tokens:
+        tx0, ty0, _, ty1 = t.bbox
+        if tx0 > x0 and tx0 >= x1 - (y1 - y0) // 4 and 2 * (min(y1, ty1) - max(y0, ty0)) >= min(y1 - y0, ty1 - ty0):
+            if best is None or tx0 < best.bbox[0]:
+                best = t
+    return best
+
+
+def _scan_below(tokens: List[OCRToken], box) -> Optional[OCRToken]:
+    x0, y0, x1, y1 = box
+    best = None
+    for t in tokens:
+        tx0, ty0, tx1, _ = t.bbox
+        if ty0 > y0 and ty0 >= y1 - (y1 - y0) // 4 and min(x1, tx1) > max(x0, tx0):
+            if best is None or ty0 < best.bbox[1]:
+                best = t
+    return best
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def _bench(n_tokens: int, queries: int, repeat: int) -> Dict:
+    tokens = _page(n_tokens)
+    rng = random.Random(1)
+    sample = rng.sample(tokens, min(queries, len(tokens)))
+
+    build = _best(lambda: TokenIndex(tokens), repeat)
+    grid = TokenIndex(tokens).pages[1]
+
+    start = time.perf_counter()
+    for t in sample:
+        next(grid.right_of(t.bbox), None)
+        next(grid.below(t.bbox), None)
+    grid_time = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    for t in sample:
+        _scan_right(tokens, t.bbox)
+        _scan_below(tokens, t.bbox)
+    scan_time = (time.perf_counter() - start) / len(sample)
+
+    for t in sample[:20]:
+        assert next(grid.right_of(t.bbox), None) is _scan_right(tokens, t.bbox)
+
+    ocr = OCRResult(tokens=tokens, full_text=" ".join(t.text for t in tokens), metadata={})
+    extract = _best(lambda: LayoutExtractor().extract(ocr), repeat)
+    extraction = LayoutExtractor().extract(ocr)
+    linked = sorted(p.name for p in extraction.fields if p.source == "layout")
+    return {
+        "tokens": len(tokens),
+        "build_ms": round(build * 1e3, 2),
+        "grid_us": round(grid_time * 1e6, 1),
+        "scan_us": round(scan_time * 1e6, 1),
+        "extract_ms": round(extract * 1e3, 2),
+        "linked": linked,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, nargs="+", default=[250, 1000, 4000, 16000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5, help="best-of for build_ms and extract_ms")
+    args = parser.parse_args()
+    print(json.dumps([_bench(n, args.queries, args.repeat) for n in args.tokens], indent=2))
+
+
+if __name__ == "__main__":
+    main()
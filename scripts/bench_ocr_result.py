@@ -0,0 +1,120 @@
+"""Microbenchmark: columnar `OCRResult` tokens vs one `OCRToken` per word.
+
+Simulates a scanned document: `--pages` pages of `image_to_data` output with
+`--words` words each. The reference path is the per-word loop
+`result_from_data` used to run, building `OCRToken` objects and renumbering
+`page_num` on each one while merging. The columnar path is today's
+`result_from_data` + `merge_page_results`. For each it reports:
+
+  * convert_ms / merge_ms — best of `--repeat`
+  * peak_mb     — tracemalloc peak while converting and merging
+  * gc_objects  — GC-tracked objects the merged result keeps alive
+
+Run from repo root:
+
+    python scripts/bench_ocr_result.py --pages 100 --words 2500
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.ocr.parallel import merge_page_results  # noqa: E402
+from idp.ocr.tesseract_engine import OCRResult, OCRToken, result_from_data  # noqa: E402
+
+_WORDS = "invoice number date total subtotal tax widget qty price terms payment delivery".split()
+
+
+def _page_data(words: int, seed: int) -> Dict[str, list]:
+    rng = random.Random(seed)
+    return {
+        "text": [rng.choice(_WORDS) if i % 5 else "" for i in range(words)],  # tesseract's empty block rows
+        "conf": [rng.randrange(30, 97) for _ in range(words)],
+        "left": [rng.randrange(0, 2400) for _ in range(words)],
+        "top": [rng.randrange(0, 3200) for _ in range(words)],
+        "width": [rng.randrange(10, 200) for _ in range(words)],
+        "height": [rng.randrange(18, 30) for _ in range(words)],
+        "page_num": [1] * words,
+    }
+
+
+def _reference_convert(data: Dict[str, list]) -> OCRResult:
+    tokens: List[OCRToken] = []
+    text_parts: List[str] = []
+    for i in range(len(data["text"])):
+        word = data["text"][i].strip()
+        if not word:
+            continue
+        bbox = (
+            int(data["left"][i]),
+            int(data["top"][i]),
+            int(data["left"][i] + data["width"][i]),
+            int(data["top"][i] + data["height"][i]),
+        )
+        tokens.append(OCRToken(word, float(data["conf"][i]) / 100.0, bbox, int(data["page_num"][i])))
+        text_parts.append(word)
+    avg = sum(t.confidence for t in tokens) / max(len(tokens), 1)
+    return OCRResult(tokens, " ".join(text_parts), {"avg_confidence": avg, "token_count": len(tokens)})
+
+
+def _reference_merge(results: List[OCRResult]) -> OCRResult:
+    tokens: List[OCRToken] = []
+    for page_num, result in enumerate(results, start=1):
+        for token in result.tokens:
+            token.page_num = page_num
+            tokens.append(token)
+    avg = sum(t.confidence for t in tokens) / len(tokens) if tokens else 0.0
+    return OCRResult(tokens, "\n".join(r.full_text for r in results), {"avg_confidence": avg})
+
+
+def _measure(pages: List[Dict[str, list]], convert: Callable, merge: Callable, repeat: int) -> Dict:
+    convert_s = min(timeit.repeat(lambda: [convert(p) for p in pages], number=1, repeat=repeat))
+    converted = [convert(p) for p in pages]
+    merge_s = min(timeit.repeat(lambda: merge(converted), number=1, repeat=repeat))
+    converted.clear()
+
+    gc.collect()
+    tracemalloc.start()
+    before = len(gc.get_objects())
+    merged = merge([convert(p) for p in pages])
+    gc.collect()
+    kept = len(gc.get_objects()) - before
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "tokens": len(merged.tokens),
+        "convert_ms": round(convert_s * 1e3, 1),
+        "merge_ms": round(merge_s * 1e3, 1),
+        "peak_mb": round(peak / 2**20, 1),
+        "gc_objects": kept,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--words", type=int, default=2500, help="image_to_data rows per page")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pages = [_page_data(args.words, seed) for seed in range(args.pages)]
+    columnar, reference = result_from_data(pages[0]), _reference_convert(pages[0])
+    assert list(columnar.tokens) == reference.tokens and columnar.full_text == reference.full_text
+    results = {
+        "reference": _measure(pages, _reference_convert, _reference_merge, args.repeat),
+        "columnar": _measure(pages, result_from_data, merge_page_results, args.repeat),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
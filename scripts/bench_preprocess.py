@@ -0,0 +1,131 @@
+"""Benchmark: on-disk PNG preprocessing vs the in-memory page path.
+
+Renders synthetic invoice pages at a letter-size raster (default 300 DPI) and
+pushes each one through both preprocessing paths:
+
+  * disk   — the pre-v0.3 flow: PIL page → PNG → `cv2.imread` → preprocess →
+             PNG rewrite → checksum re-reads every file.
+  * memory — PIL page → NumPy view → `preprocess_array` → pixel checksum.
+
+With `--ocr` (requires the tesseract binary) the OCR hand-off is timed too:
+the disk path gives tesseract the PNG path, the memory path the array.
+
+Run from repo root:
+
+    python scripts/bench_preprocess.py --pages 10 --dpi 300
+
+Prints a JSON summary with per-page latency and bytes written for each mode.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.ocr.preprocess import (  # noqa: E402
+    PreprocessConfig,
+    checksum,
+    checksum_arrays,
+    preprocess_array,
+    preprocess_image,
+)
+from idp.ocr.tesseract_engine import run_tesseract  # noqa: E402
+from tests.fixtures.synthetic import letter_page as _letter_page  # noqa: E402
+from tests.fixtures.synthetic import make_invoice  # noqa: E402
+
+
+def _bench_disk(pages: List[Image.Image], work_dir: Path, cfg: PreprocessConfig, ocr: bool) -> Dict:
+    latencies: List[float] = []
+    bytes_written = 0
+    paths: List[Path] = []
+    for idx, page in enumerate(pages):
+        start = time.perf_counter()
+        out_path = work_dir / f"page{idx}.png"
+        page.save(out_path, format="PNG")
+        bytes_written += out_path.stat().st_size
+        preprocess_image(out_path, cfg)
+        bytes_written += out_path.stat().st_size
+        if ocr:
+            run_tesseract(out_path)
+        latencies.append((time.perf_counter() - start) * 1000)
+        paths.append(out_path)
+    start = time.perf_counter()
+    checksum(paths)
+    checksum_ms = (time.perf_counter() - start) * 1000
+    return _summary(latencies, bytes_written, checksum_ms)
+
+
+def _bench_memory(pages: List[Image.Image], cfg: PreprocessConfig, ocr: bool) -> Dict:
+    latencies: List[float] = []
+    arrays: List[np.ndarray] = []
+    for page in pages:
+        start = time.perf_counter()
+        gray = preprocess_array(np.asarray(page), cfg)
+        if ocr:
+            run_tesseract(gray)
+        latencies.append((time.perf_counter() - start) * 1000)
+        arrays.append(gray)
+    start = time.perf_counter()
+    checksum_arrays(arrays)
+    checksum_ms = (time.perf_counter() - start) * 1000
+    return _summary(latencies, 0, checksum_ms)
+
+
+def _summary(latencies: List[float], bytes_written: int, checksum_ms: float) -> Dict:
+    return {
+        "per_page_ms_mean": round(statistics.mean(latencies), 2),
+        "per_page_ms_p50": round(statistics.median(latencies), 2),
+        "bytes_written": bytes_written,
+        "bytes_written_per_page": bytes_written // max(len(latencies), 1),
+        "checksum_ms": round(checksum_ms, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--ocr", action="store_true", help="include the tesseract hand-off")
+    args = parser.parse_args()
+    if args.ocr and shutil.which("tesseract") is None:
+        parser.error("--ocr needs the tesseract binary on PATH")
+
+    cfg = PreprocessConfig(dpi=args.dpi)
+    with tempfile.TemporaryDirectory(prefix="idp_bench_") as tmp:
+        tmp_dir = Path(tmp)
+        pages = [
+            _letter_page(make_invoice(tmp_dir / f"src{i}.png", seed=i).image_path, args.dpi)
+            for i in range(args.pages)
+        ]
+        work_dir = tmp_dir / "work"
+        work_dir.mkdir()
+        disk = _bench_disk(pages, work_dir, cfg, args.ocr)
+        memory = _bench_memory(pages, cfg, args.ocr)
+
+    results = {
+        "pages": args.pages,
+        "dpi": args.dpi,
+        "ocr": args.ocr,
+        "disk": disk,
+        "memory": memory,
+        "saved_ms_per_page": round(disk["per_page_ms_mean"] - memory["per_page_ms_mean"], 2),
+        "saved_bytes_per_page": disk["bytes_written_per_page"] - memory["bytes_written_per_page"],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Microbenchmark: batch validation vs `validate_fields` per document.
+
+Generates `--docs` field dicts drawn from a small pool of values per field.
+Stored extractions repeat heavily (the same dates, vendors' account numbers
+and totals), which is what the batch path's factorisation and memoisation
+exploit. Both paths run on the same documents and their summaries are
+checked to be identical. `--db` also loads the documents into an in-memory
+DuckDB `extractions` table (one row per field, as `persist_run` writes them)
+and times `revalidate_stored` end to end, pivot included.
+
+Run from repo root:
+
+    python scripts/bench_validation.py --docs 200000 --db
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.postprocess.analytics import _SCHEMA  # noqa: E402
+from idp.postprocess.batch_validation import revalidate_stored, validate_batch  # noqa: E402
+from idp.postprocess.validators import validate_fields  # noqa: E402
+
+
+def _docs(n: int, pool: int, seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    dates = [f"2024-{m:02d}-{d:02d}" for m in range(1, 13) for d in range(1, 29)][:pool]
+    amounts = [f"{rng.randrange(1, 5000)}.{rng.randrange(100):02d}" for _ in range(pool)]
+    docs = []
+    for i in range(n):
+        subtotal = rng.choice(amounts)
+        tax = rng.choice(["0.00", "8.00", "12.50"])
+        invoice_date = rng.choice(dates)
+        total = f"{float(subtotal) + float(tax):.2f}" if rng.random() < 0.9 else rng.choice(amounts)
+        docs.append(
+            {
+                "invoice_number": f"INV-{rng.randrange(pool)}",
+                "invoice_date": invoice_date,
+                "due_date": rng.choice(dates) if rng.random() < 0.05 else invoice_date,
+                "subtotal_amount": subtotal,
+                "tax_amount": tax,
+                "total_amount": total,
+                "routing_number": "021000021" if rng.random() < 0.98 else "02100002",
+                "bank_account": f"{rng.randrange(pool):010d}",
+            }
+        )
+    return docs
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200_000)
+    parser.add_argument("--pool", type=int, default=300, help="distinct values per field")
+    parser.add_argument("--db", action="store_true", help="also time revalidate_stored over DuckDB")
+    args = parser.parse_args()
+    docs = _docs(args.docs, args.pool)
+
+    reference, per_doc_s = _timed(lambda: [validate_fields(doc) for doc in docs])
+    batch, batch_s = _timed(lambda: validate_batch(docs))
+    assert batch == reference, "batch and per-document validation disagree"
+    results: Dict = {
+        "docs": len(docs),
+        "invalid": sum(not s.is_valid for s in batch),
+        "per_doc_s": round(per_doc_s, 2),
+        "batch_s": round(batch_s, 2),
+        "speedup": round(per_doc_s / batch_s, 1),
+    }
+
+    if args.db:
+        con = duckdb.connect()
+        con.execute(_SCHEMA)
+        with tempfile.TemporaryDirectory(prefix="idp_bench_") as tmp:
+            csv_path = Path(tmp) / "rows.csv"
+            with csv_path.open("w", newline="") as fh:
+                writer = csv.writer(fh)
+                for i, doc in enumerate(docs):
+                    writer.writerows((f"r{i:09d}", "invoice", k, v, 0.9, True, "2024-05-01") for k, v in doc.items())
+            con.execute(f"COPY extractions FROM '{csv_path}' (HEADER false)")
+        stored, db_s = _timed(lambda: list(revalidate_stored(con)))
+        assert [summary for _, summary in stored] == reference
+        results["db_rows"] = con.execute("SELECT count(*) FROM extractions").fetchone()[0]
+        results["db_s"] = round(db_s, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
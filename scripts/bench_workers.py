@@ -0,0 +1,124 @@
+"""Benchmark: Python-level pipeline work across worker processes.
+
+Starts the analytics writer process (`analytics.run_writer`) on a temporary
+DuckDB file, then `--workers` processes that split `--docs` documents
+between them. Each document goes through the pure-Python tail of
+`ExtractionPipeline.extract`: field extraction over `--pages` pages of
+OCR-like text, validation, and `persist_run`, which ships the rows to the
+writer over its socket as a worker of `idp.serve` does. OCR itself is left
+out; it needs tesseract and already runs outside the GIL.
+
+For each worker count it reports wall time, documents/sec and the scaling
+over one worker, and checks that every row reached DuckDB once the writer
+has drained. Scaling is bounded by `cpu_count`, which is reported as well.
+
+Run from repo root:
+
+    python scripts/bench_workers.py --workers 1 2 4 --docs 400 --pages 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from bench_extractor import _document  # noqa: E402
+
+import idp.postprocess.analytics as analytics  # noqa: E402
+from idp.config.settings import Settings, StorageSettings  # noqa: E402
+from idp.models.extractor import HeuristicExtractor  # noqa: E402
+from idp.ocr.tesseract_engine import OCRResult  # noqa: E402
+from idp.postprocess.analytics_ipc import WRITER_ENV  # noqa: E402
+from idp.postprocess.validators import validate_fields  # noqa: E402
+
+_ctx = multiprocessing.get_context("spawn")
+
+
+def _writer(address: str, db_path: str, ready) -> None:
+    settings = Settings(storage=StorageSettings(duckdb_path=Path(db_path), maintenance_interval_s=0))
+    analytics.get_settings = lambda: settings
+    analytics.run_writer(address, ready)
+
+
+def _worker(address: str, worker: int, docs: int, pages: int, loaded) -> None:
+    os.environ[WRITER_ENV] = address
+    extractor = HeuristicExtractor()
+    texts = [_document(pages, seed) for seed in range(8)]
+    loaded.wait()
+    for i in range(docs):
+        result = extractor.extract(OCRResult(tokens=[], full_text=texts[i % len(texts)], metadata={}))
+        fields = {p.name: p.value for p in result.fields}
+        summary = validate_fields(fields)
+        invalid = {message.field for message in summary.errors}
+        analytics.persist_run(
+            {
+                "request_id": f"w{worker}-{i}",
+                "documents": [
+                    {
+                        "doc_type": result.document_type,
+                        "fields": {
+                            p.name: {"value": p.value, "confidence": p.confidence, "valid": p.name not in invalid}
+                            for p in result.fields
+                        },
+                    }
+                ],
+            }
+        )
+    analytics.close_connection()
+
+
+def _run(workers: int, docs: int, pages: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="idp_bench_") as tmp:
+        address, db_path = str(Path(tmp) / "analytics.sock"), str(Path(tmp) / "idp.duckdb")
+        ready, loaded = _ctx.Event(), _ctx.Barrier(workers + 1)
+        writer = _ctx.Process(target=_writer, args=(address, db_path, ready))
+        writer.start()
+        assert ready.wait(60), "writer did not start"
+        shares = [docs // workers + (w < docs % workers) for w in range(workers)]
+        procs = [_ctx.Process(target=_worker, args=(address, w, n, pages, loaded)) for w, n in enumerate(shares)]
+        for proc in procs:
+            proc.start()
+        loaded.wait()  # the clock starts once every worker has finished importing
+        began = time.perf_counter()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - began
+        writer.terminate()
+        writer.join()
+        assert all(proc.exitcode == 0 for proc in procs) and writer.exitcode == 0
+        con = duckdb.connect(db_path, read_only=True)
+        stored = con.execute("SELECT count(DISTINCT request_id) FROM extractions").fetchone()[0]
+        con.close()
+    assert stored == docs, f"{stored} of {docs} documents reached DuckDB"
+    return {"seconds": round(elapsed, 2), "docs_per_s": round(docs / elapsed, 1), "stored_docs": stored}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--docs", type=int, default=400)
+    parser.add_argument("--pages", type=int, default=20, help="pages of text per document")
+    args = parser.parse_args()
+    results: Dict = {"cpu_count": os.cpu_count()}
+    for workers in args.workers:
+        results[f"workers={workers}"] = _run(workers, args.docs, args.pages)
+    base = results[f"workers={args.workers[0]}"]["docs_per_s"]
+    for workers in args.workers:
+        results[f"workers={workers}"]["scaling"] = round(results[f"workers={workers}"]["docs_per_s"] / base, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
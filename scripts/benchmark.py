@@ -0,0 +1,390 @@
+"""Performance benchmark: throughput, latency percentiles and peak memory.
+
+For every (page count, DPI) scenario the script builds an image-only PDF of
+synthetic invoices with `tests/fixtures/synthetic.py` and times each stage on
+its own, then the whole pipeline:
+
+  * render          — `pdf2image` rasterisation, one page at a time (poppler)
+  * preprocess      — `preprocess_array` on each page raster
+  * ocr             — `run_tesseract` on each preprocessed page (tesseract)
+  * extract_validate — `HeuristicExtractor` + validators on the OCR output
+  * ocr_roi         — `roi_ocr_page` (region-of-interest OCR) on the same pages
+  * end_to_end      — `ExtractionPipeline.extract` with caches disabled
+
+The `*_adaptive` stages repeat render / preprocess / OCR with adaptive DPI
+(preview render, glyph-height measurement, render at the chosen DPI), and
+each scenario's `adaptive` block gives the chosen DPIs and megapixels per
+page against the fixed DPI, i.e. the pixels adaptive mode saves.
+
+Stage latencies are per page; `end_to_end` latencies are per document. Each
+scenario runs in a fresh subprocess so its peak RSS is its own. Stages whose
+system binaries are missing are listed under `skipped` instead of failing.
+Analytics rows go to a throwaway DuckDB file, never `data/idp.duckdb`.
+
+Run from repo root:
+
+    python scripts/benchmark.py --pages 1 5 20 --dpi 200 300 --repeat 3
+
+The script writes:
+  * reports/benchmark.json — per-scenario, per-stage numbers
+  * reports/benchmark.md   — the same as tables
+
+Compare against a stored baseline (exit status 1 on regression):
+
+    python scripts/benchmark.py --compare reports/benchmark_baseline.json --threshold 0.10
+
+A regression is a p95 latency or peak RSS more than `threshold` above the
+baseline, or pages/sec more than `threshold` below it. A baseline scenario or
+stage that this run did not measure (not requested, or skipped for a missing
+binary) also fails the comparison unless `--allow-missing` is given, in which
+case it is only reported. Only numbers from the same machine are comparable.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.utils.logging import configure_logging  # noqa: E402
+
+STAGES = (
+    "render",
+    "preprocess",
+    "ocr",
+    "extract_validate",
+    "ocr_roi",
+    "end_to_end",
+    "render_adaptive",
+    "preprocess_adaptive",
+    "ocr_adaptive",
+)
+# stage -> system binaries it needs
+_REQUIRES = {
+    "render": ("pdftoppm",),
+    "ocr": ("tesseract",),
+    "extract_validate": ("tesseract",),
+    "ocr_roi": ("tesseract",),
+    "end_to_end": ("pdftoppm", "pdfinfo", "tesseract"),
+    "render_adaptive": ("pdftoppm",),
+    "ocr_adaptive": ("tesseract",),
+}
+
+
+def _summary(latencies_ms: List[float], pages: int) -> Dict:
+    total_s = sum(latencies_ms) / 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "samples": len(latencies_ms),
+        "mean_ms": round(float(np.mean(latencies_ms)), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "pages_per_sec": round(pages / total_s, 3) if total_s > 0 else None,
+    }
+
+
+def _timed(fn: Callable, *args) -> tuple:
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _isolate_settings(tmp_dir: Path) -> None:
+    """Point the cached settings at scratch storage and turn every cache off."""
+    from idp.config import get_settings
+
+    settings = get_settings()
+    settings.storage.duckdb_path = tmp_dir / "bench.duckdb"
+    settings.storage.archive_dir = tmp_dir / "archive"
+    settings.storage.write_mode = "sync"
+    settings.cache.enabled = False
+    settings.cache.pages_enabled = False
+
+
+def run_scenario(pages: int, dpi: int, repeat: int) -> Dict:
+    from pdf2image import convert_from_path
+
+    from idp.config import get_settings
+    from idp.models.extractor import HeuristicExtractor
+    from idp.ocr.preprocess import PreprocessConfig, choose_dpi, preprocess_array
+    from idp.ocr.roi import roi_ocr_page
+    from idp.ocr.tesseract_engine import OCRResult, run_tesseract
+    from idp.postprocess import validators
+    from idp.postprocess.analytics import close_connection
+    from tests.fixtures.synthetic import letter_page, make_multipage_pdf
+
+    skipped = sorted(
+        stage for stage, binaries in _REQUIRES.items() if any(shutil.which(b) is None for b in binaries)
+    )
+    latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES if stage not in skipped}
+    with tempfile.TemporaryDirectory(prefix="idp_bench_") as tmp:
+        tmp_dir = Path(tmp)
+        _isolate_settings(tmp_dir)
+        settings = get_settings()
+        settings.ocr.dpi = dpi
+        pdf_path = tmp_dir / "doc.pdf"
+        samples = make_multipage_pdf(pdf_path, pages=pages, dpi=dpi)
+        cfg = PreprocessConfig(dpi=dpi)
+        adaptive_cfg = PreprocessConfig(dpi=dpi, adaptive_dpi=True)
+        can_render = "render" not in skipped
+        megapixels: Dict[str, List[float]] = {"fixed": [], "adaptive": []}
+        chosen_dpi: List[int] = []
+        roi_coverage: List[float] = []
+
+        def raster(page_num: int, at_dpi: int) -> np.ndarray:
+            if can_render:
+                (image,) = convert_from_path(str(pdf_path), dpi=at_dpi, first_page=page_num, last_page=page_num)
+            else:
+                image = letter_page(samples[page_num - 1].image_path, at_dpi)
+            return np.asarray(image.convert("RGB"))
+
+        extractor = HeuristicExtractor()
+
+        pipeline = None
+        if "end_to_end" in latencies:
+            from idp.services.pipeline import ExtractionPipeline
+
+            pipeline = ExtractionPipeline()
+        try:
+            for _ in range(repeat):
+                rasters = []
+                for page_num in range(1, pages + 1):
+                    image, ms = _timed(raster, page_num, dpi)
+                    if can_render:
+                        latencies["render"].append(ms)
+                    rasters.append(image)
+                    megapixels["fixed"].append(image.shape[0] * image.shape[1] / 1e6)
+
+                grays = []
+                for image in rasters:
+                    gray, ms = _timed(preprocess_array, image, cfg)
+                    latencies["preprocess"].append(ms)
+                    grays.append(gray)
+
+                if "ocr" in latencies:
+                    results: List[OCRResult] = []
+                    for gray in grays:
+                        result, ms = _timed(run_tesseract, gray)
+                        latencies["ocr"].append(ms)
+                        results.append(result)
+                    for result in results:
+                        _, ms = _timed(
+                            lambda r: validators.validate_fields(
+                                {p.name: p.value for p in extractor.extract(r).fields}
+                            ),
+                            result,
+                        )
+                        latencies["extract_validate"].append(ms)
+                    for gray in grays:
+                        result, ms = _timed(roi_ocr_page, gray)
+                        latencies["ocr_roi"].append(ms)
+                        roi_coverage.append(result.metadata["roi_coverage"])
+
+                if pipeline is not None:
+                    _, ms = _timed(lambda: pipeline.extract(pdf_path, use_cache=False))
+                    latencies["end_to_end"].append(ms)
+
+                chosen_dpi.clear()
+                for page_num in range(1, pages + 1):
+                    start = time.perf_counter()
+                    page_dpi = choose_dpi(raster(page_num, adaptive_cfg.adaptive_preview_dpi), adaptive_cfg)
+                    image = raster(page_num, page_dpi)
+                    if can_render:
+                        latencies["render_adaptive"].append((time.perf_counter() - start) * 1000)
+                    chosen_dpi.append(page_dpi)
+                    megapixels["adaptive"].append(image.shape[0] * image.shape[1] / 1e6)
+                    gray, ms = _timed(preprocess_array, image, cfg)
+                    latencies["preprocess_adaptive"].append(ms)
+                    if "ocr_adaptive" in latencies:
+                        _, ms = _timed(run_tesseract, gray)
+                        latencies["ocr_adaptive"].append(ms)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+            close_connection()
+
+    stages = {}
+    for stage, values in latencies.items():
+        # end_to_end samples are whole documents; the others are single pages.
+        stage_pages = pages * len(values) if stage == "end_to_end" else len(values)
+        stages[stage] = _summary(values, stage_pages)
+    return {
+        "pages": pages,
+        "dpi": dpi,
+        "repeat": repeat,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": stages,
+        "roi_coverage": round(float(np.mean(roi_coverage)), 3) if roi_coverage else None,
+        "adaptive": {
+            "chosen_dpi": chosen_dpi,
+            "megapixels_per_page": {
+                mode: round(float(np.mean(values)), 3) for mode, values in megapixels.items()
+            },
+        },
+        "skipped": skipped,
+    }
+
+
+def _scenario_key(scenario: Dict) -> str:
+    return f"pages={scenario['pages']},dpi={scenario['dpi']}"
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> Tuple[List[str], List[str]]:
+    """Return (regressions past `threshold`, baseline entries the current run lacks)."""
+    regressions: List[str] = []
+    missing: List[str] = []
+    current_by_key = {_scenario_key(s): s for s in current["scenarios"]}
+    for base in baseline["scenarios"]:
+        key = _scenario_key(base)
+        scenario = current_by_key.get(key)
+        if scenario is None:
+            missing.append(f"{key} not run")
+            continue
+        if scenario["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key} peak_rss_mb {base['peak_rss_mb']} -> {scenario['peak_rss_mb']}")
+        for stage, base_stats in base["stages"].items():
+            stats = scenario["stages"].get(stage)
+            if stats is None:
+                reason = "skipped" if stage in scenario["skipped"] else "not run"
+                missing.append(f"{key} {stage} {reason}")
+                continue
+            if stats["p95_ms"] > base_stats["p95_ms"] * (1 + threshold):
+                regressions.append(f"{key} {stage} p95_ms {base_stats['p95_ms']} -> {stats['p95_ms']}")
+            if (
+                stats["pages_per_sec"] is not None
+                and base_stats["pages_per_sec"] is not None
+                and stats["pages_per_sec"] < base_stats["pages_per_sec"] * (1 - threshold)
+            ):
+                regressions.append(
+                    f"{key} {stage} pages_per_sec {base_stats['pages_per_sec']} -> {stats['pages_per_sec']}"
+                )
+    return regressions, missing
+
+
+def write_markdown(
+    report: Dict, path: Path, regressions: Optional[List[str]] = None, missing: Optional[List[str]] = None
+) -> None:
+    lines = [
+        "# Benchmark Results",
+        "",
+        f"Python {report['environment']['python']} on {report['environment']['platform']}, "
+        f"{report['repeat']} repeat(s) per scenario.",
+        "",
+        "| Scenario | Stage | p50 ms | p95 ms | p99 ms | Pages/s | Peak RSS MB |",
+        "| -------- | ----- | ------ | ------ | ------ | ------- | ----------- |",
+    ]
+    for scenario in report["scenarios"]:
+        key = _scenario_key(scenario)
+        for stage, stats in scenario["stages"].items():
+            lines.append(
+                f"| {key} | {stage} | {stats['p50_ms']} | {stats['p95_ms']} | {stats['p99_ms']} | "
+                f"{stats['pages_per_sec']} | {scenario['peak_rss_mb']} |"
+            )
+    lines += [
+        "",
+        "## Adaptive DPI",
+        "",
+        "| Scenario | Chosen DPI | MP/page fixed | MP/page adaptive |",
+        "| -------- | ---------- | ------------- | ---------------- |",
+    ]
+    for scenario in report["scenarios"]:
+        adaptive = scenario["adaptive"]
+        lines.append(
+            f"| {_scenario_key(scenario)} | {', '.join(map(str, sorted(set(adaptive['chosen_dpi']))))} | "
+            f"{adaptive['megapixels_per_page']['fixed']} | {adaptive['megapixels_per_page']['adaptive']} |"
+        )
+    skipped = sorted({stage for scenario in report["scenarios"] for stage in scenario["skipped"]})
+    if skipped:
+        lines += ["", f"Skipped (missing system binaries): {', '.join(skipped)}"]
+    if regressions is not None:
+        lines += ["", "## Comparison", ""]
+        lines += [f"- {r}" for r in regressions] or ["No regressions past the threshold."]
+        if missing:
+            lines += ["", "Missing from this run (in the baseline):", ""]
+            lines += [f"- {m}" for m in missing]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _run_in_subprocess(pages: int, dpi: int, repeat: int) -> Dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--scenario", str(pages), str(dpi), "--repeat", str(repeat)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=Path("reports/benchmark.json"))
+    parser.add_argument("--compare", type=Path, help="baseline benchmark.json to gate against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="warn instead of failing when baseline scenarios or stages are missing or skipped",
+    )
+    parser.add_argument("--scenario", type=int, nargs=2, metavar=("PAGES", "DPI"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    configure_logging("WARNING")
+
+    if args.scenario:
+        print(json.dumps(run_scenario(*args.scenario, repeat=args.repeat)))
+        return
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "repeat": args.repeat,
+        "scenarios": [
+            _run_in_subprocess(pages, dpi, args.repeat) for pages in args.pages for dpi in args.dpi
+        ],
+    }
+    regressions = missing = None
+    if args.compare:
+        regressions, missing = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        report["comparison"] = {
+            "baseline": str(args.compare),
+            "threshold": args.threshold,
+            "regressions": regressions,
+            "missing": missing,
+        }
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2))
+    write_markdown(report, args.out.with_suffix(".md"), regressions, missing)
+    print(f"Wrote {args.out} and {args.out.with_suffix('.md')}")
+    if missing:
+        verdict = "warning" if args.allow_missing else "failing"
+        print(f"Missing from this run ({verdict}):\n  " + "\n  ".join(missing))
+    if regressions:
+        print("Regressions past threshold:\n  " + "\n  ".join(regressions))
+    if regressions or (missing and not args.allow_missing):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
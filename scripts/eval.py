@@ -12,6 +12,13 @@ The script writes:
   * reports/eval_results.json — full per-sample predictions + metrics
   * reports/eval_results.md   — human-readable summary table
 
+`--dpi N` pastes each sample onto a letter-size page rendered at N DPI before
+OCR (by default the sample PNG is OCR'd as is); adding `--adaptive-dpi` picks
+each page's DPI from a 100 DPI preview the way `OCRSettings.adaptive_dpi`
+does, so the two runs show whether adaptive DPI costs any F1. `--layout` uses
+`LayoutExtractor` (`ExtractionSettings.mode = "layout"`) instead of the
+regex-only extractor.
+
 This is the harness that backs every accuracy claim in the README.
 """
 from __future__ import annotations
@@ -23,7 +30,9 @@ import tempfile
 from collections import defaultdict
 from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import numpy as np
 
 # Make `tests` importable when running this script directly.
 ROOT = Path(__file__).resolve().parents[1]
@@ -31,9 +40,11 @@ sys.path.insert(0, str(ROOT))
 sys.path.insert(0, str(ROOT / "src"))
 
 from idp.models.extractor import HeuristicExtractor  # noqa: E402
+from idp.models.layout import LayoutExtractor  # noqa: E402
+from idp.ocr.preprocess import PreprocessConfig, choose_dpi  # noqa: E402
 from idp.ocr.tesseract_engine import run_tesseract  # noqa: E402
 from idp.postprocess import validators  # noqa: E402
-from tests.fixtures.synthetic import SyntheticSample, generate_dataset  # noqa: E402
+from tests.fixtures.synthetic import SyntheticSample, generate_dataset, letter_page  # noqa: E402
 
 
 def _normalize(value: str | None) -> str:
@@ -42,15 +53,28 @@ def _normalize(value: str | None) -> str:
     return str(value).strip().lower().replace(",", "")
 
 
-def evaluate(samples: List[SyntheticSample]) -> Dict:
-    extractor = HeuristicExtractor()
+def _page(sample: SyntheticSample, dpi: Optional[int], adaptive: bool) -> tuple:
+    """The image to OCR for `sample` and the DPI it was rendered at (None: the raw PNG)."""
+    if dpi is None:
+        return sample.image_path, None
+    if adaptive:
+        cfg = PreprocessConfig(dpi=dpi, adaptive_dpi=True)
+        dpi = choose_dpi(np.asarray(letter_page(sample.image_path, cfg.adaptive_preview_dpi)), cfg)
+    return np.asarray(letter_page(sample.image_path, dpi)), dpi
+
+
+def evaluate(
+    samples: List[SyntheticSample], dpi: Optional[int] = None, adaptive: bool = False, layout: bool = False
+) -> Dict:
+    extractor = LayoutExtractor() if layout else HeuristicExtractor()
     per_field_tp: Dict[str, int] = defaultdict(int)
     per_field_fp: Dict[str, int] = defaultdict(int)
     per_field_fn: Dict[str, int] = defaultdict(int)
     sample_records: List[Dict] = []
 
     for sample in samples:
-        ocr_result = run_tesseract(sample.image_path)
+        image, page_dpi = _page(sample, dpi, adaptive)
+        ocr_result = run_tesseract(image)
         extraction = extractor.extract(ocr_result)
         predicted = {p.name: p.value for p in extraction.fields}
 
@@ -81,6 +105,7 @@ def evaluate(samples: List[SyntheticSample]) -> Dict:
         sample_records.append(
             {
                 "image": str(sample.image_path),
+                "dpi": page_dpi,
                 "doc_type_predicted": extraction.document_type,
                 "doc_type_truth": sample.doc_type,
                 "fields": record_fields,
@@ -116,6 +141,8 @@ def evaluate(samples: List[SyntheticSample]) -> Dict:
 
     return {
         "n_samples": len(samples),
+        "dpi": "adaptive" if adaptive else dpi,
+        "extractor": "layout" if layout else "regex",
         "per_field": per_field_metrics,
         "micro": {
             "precision": round(micro_p, 3),
@@ -154,11 +181,16 @@ def main() -> None:
     parser.add_argument("--n-ids", type=int, default=10)
     parser.add_argument("--out", type=Path, default=ROOT / "reports" / "eval_results.json")
     parser.add_argument("--md", type=Path, default=ROOT / "reports" / "eval_results.md")
+    parser.add_argument("--dpi", type=int, help="render samples onto letter pages at this DPI")
+    parser.add_argument("--adaptive-dpi", action="store_true", help="pick each page's DPI from a preview")
+    parser.add_argument("--layout", action="store_true", help="link labels to values by token position")
     args = parser.parse_args()
+    if args.adaptive_dpi and args.dpi is None:
+        parser.error("--adaptive-dpi needs --dpi (the DPI used when a page has no measurable text)")
 
     with tempfile.TemporaryDirectory(prefix="idp_eval_") as tmp:
         samples = generate_dataset(Path(tmp), n_invoices=args.n_invoices, n_ids=args.n_ids)
-        results = evaluate(samples)
+        results = evaluate(samples, dpi=args.dpi, adaptive=args.adaptive_dpi, layout=args.layout)
 
     args.out.parent.mkdir(parents=True, exist_ok=True)
     args.out.write_text(json.dumps(results, indent=2, default=str))
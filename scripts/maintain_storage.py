@@ -0,0 +1,35 @@
+"""Archive, compact and expire the extractions table.
+
+Moves rows older than `StorageSettings.hot_days` from `data/idp.duckdb` into
+daily Parquet partitions under `StorageSettings.archive_dir`, merges small
+partition files, drops partitions past `retention_days`, and refreshes the
+`extractions_all` view. The API process does the same every
+`maintenance_interval_s`; use this script from cron when that is disabled or
+when the service is not running (DuckDB allows a single writer process).
+
+Run from repo root:
+
+    python scripts/maintain_storage.py
+"""
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.postprocess.analytics import close_connection, maintain_storage  # noqa: E402
+
+
+def main() -> None:
+    try:
+        result = maintain_storage()
+    finally:
+        close_connection()
+    print(json.dumps({key: [str(day) for day in days] for key, days in result.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
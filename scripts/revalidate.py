@@ -0,0 +1,79 @@
+"""Re-run validation over every stored extraction.
+
+Streams documents out of DuckDB (`extractions`, or `extractions_all` to
+include archived partitions) in batches and validates each batch with
+`idp.postprocess.batch_validation`. It prints per-field error counts, and
+can also write every document that has errors or warnings to a JSONL file.
+Use it after a rule or tolerance change to see what the new rules reject.
+The connection is read-only, but DuckDB still allows only one process per
+file, so run it when the API is stopped or against a copy of the file.
+
+Run from repo root:
+
+    python scripts/revalidate.py --table extractions_all --out reports/revalidation.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from idp.config import get_settings  # noqa: E402
+from idp.postprocess.batch_validation import revalidate_stored  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", type=Path, default=None, help="DuckDB file (default: StorageSettings.duckdb_path)")
+    parser.add_argument("--table", choices=["extractions", "extractions_all"], default="extractions")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rows created at or after this time (UTC)")
+    parser.add_argument("--batch-docs", type=int, default=100_000)
+    parser.add_argument("--out", type=Path, help="JSONL of documents with errors or warnings")
+    args = parser.parse_args()
+
+    db_path = args.db or get_settings().storage.duckdb_path
+    con = duckdb.connect(str(db_path), read_only=True)
+    errors_by_field: Counter = Counter()
+    documents = invalid = warned = 0
+    start = time.perf_counter()
+    out = args.out.open("w") if args.out else None
+    try:
+        for request_id, summary in revalidate_stored(con, args.table, args.since, args.batch_docs):
+            documents += 1
+            invalid += not summary.is_valid
+            warned += bool(summary.warnings)
+            errors_by_field.update(message.field for message in summary.errors)
+            if out is not None and (summary.errors or summary.warnings):
+                out.write(json.dumps({"request_id": request_id, **asdict(summary)}) + "\n")
+    finally:
+        con.close()
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(
+        json.dumps(
+            {
+                "documents": documents,
+                "invalid": invalid,
+                "with_warnings": warned,
+                "errors_by_field": dict(errors_by_field.most_common()),
+                "seconds": round(elapsed, 2),
+                "docs_per_sec": round(documents / elapsed) if elapsed else None,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
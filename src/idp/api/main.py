@@ -1,18 +1,25 @@
 from __future__ import annotations
 
+import shutil
 import tempfile
 import time
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List
+from typing import AsyncIterator, List
 
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import PlainTextResponse
-from prometheus_client import generate_latest
+import orjson
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+from idp.api.uploads import MULTIPART_OVERHEAD, UploadLimitMiddleware, save_upload
 from idp.config import Settings, get_settings
-from idp.postprocess.analytics import close_connection, init_schema
+from idp.postprocess.analytics import close_connection, init_schema, start_storage_maintenance
+from idp.postprocess.analytics_ipc import writer_address
+from idp.services.admission import AdmissionController, AdmissionRejected
+from idp.services.batch import BatchItem, BatchRunner, stable_request_id
+from idp.services.jobs import JobQueue
+from idp.services.metrics import mark_process_dead, render_latest
 from idp.services.pipeline import ExtractionPipeline
 from idp.utils.logging import configure_logging
 
@@ -38,6 +45,24 @@ class ExtractionResponse(BaseModel):
     analytics: dict
 
 
+class JobProgress(BaseModel):
+    pages_done: int
+    pages_total: int | None
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    priority: int
+    filename: str | None
+    use_cache: bool
+    progress: JobProgress
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+    error: str | None
+
+
 class HealthResponse(BaseModel):
     status: str
     uptime_s: float
@@ -48,40 +73,182 @@ START_TIME = time.time()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_schema()
+    # One of several worker processes (idp.serve): DuckDB and storage
+    # maintenance belong to the writer process, job recovery to the launcher.
+    worker = writer_address() is not None
+    if not worker:
+        init_schema()
+        start_storage_maintenance()
     app.state.pipeline = ExtractionPipeline()
+    app.state.admission = AdmissionController.from_settings()
+    app.state.batch = BatchRunner.from_settings(app.state.pipeline)
+    app.state.jobs = None
+    if get_settings().jobs.enabled:
+        app.state.jobs = JobQueue.from_settings(app.state.pipeline, recover=not worker)
+        app.state.jobs.start()
     try:
         yield
     finally:
+        if app.state.jobs is not None:
+            app.state.jobs.shutdown()
+        app.state.admission.shutdown()
+        app.state.pipeline.close()
         close_connection()
+        mark_process_dead()
 
 
 app = FastAPI(title="IDP Service", version="0.2.0", lifespan=lifespan)
 
 
+def _request_body_limit(path: str) -> int | None:
+    service = get_settings().service
+    if path == "/extract/batch":
+        return service.batch_max_bytes
+    if path in ("/extract", "/jobs"):
+        return service.max_upload_bytes + MULTIPART_OVERHEAD
+    return None
+
+
+app.add_middleware(UploadLimitMiddleware, limit_for=_request_body_limit)
+
+
 def get_service_settings() -> Settings:
     return get_settings()
 
 
+def _rejected(exc: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=exc.reason,
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
 @app.post("/extract", response_model=ExtractionResponse)
-async def extract(file: UploadFile = File(...), settings: Settings = Depends(get_service_settings)):
-    if not file.filename or not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF uploads are supported")
-    contents = await file.read()
-    tmp_path: Path | None = None
+async def extract(
+    file: UploadFile = File(...),
+    use_cache: bool = Query(True, description="False recomputes instead of serving a cached result"),
+    settings: Settings = Depends(get_service_settings),
+):
+    upload = await save_upload(
+        file, max_bytes=settings.service.max_upload_bytes, chunk_bytes=settings.service.upload_chunk_bytes
+    )
     try:
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(contents)
-            tmp_path = Path(tmp.name)
-        result = app.state.pipeline.extract(tmp_path)
+        result = await app.state.admission.run(
+            app.state.pipeline.extract, upload.path, use_cache=use_cache, content_hash=upload.sha256
+        )
         return ExtractionResponse(**result)
+    except AdmissionRejected as exc:
+        raise _rejected(exc) from exc
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     finally:
-        if tmp_path is not None:
-            tmp_path.unlink(missing_ok=True)
+        upload.path.unlink(missing_ok=True)
+
+
+@app.post("/extract/batch")
+async def extract_batch(
+    files: List[UploadFile] = File(...),
+    skip: List[str] = Form(default=[], description="Request IDs already received; not processed again"),
+    use_cache: bool = Query(True, description="False recomputes instead of serving cached results"),
+    settings: Settings = Depends(get_service_settings),
+):
+    """Extract many PDFs; streams one NDJSON record per document as it finishes."""
+    if len(files) > settings.service.batch_max_files:
+        raise HTTPException(status_code=413, detail=f"At most {settings.service.batch_max_files} files per batch")
+    for file in files:
+        if not file.filename or not file.filename.lower().endswith(".pdf"):
+            raise HTTPException(status_code=400, detail=f"Only PDF uploads are supported: {file.filename!r}")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="idp_batch_"))
+    items: List[BatchItem] = []
+    seen = set()
+    try:
+        for file in files:
+            upload = await save_upload(
+                file,
+                directory=work_dir,
+                max_bytes=settings.service.max_upload_bytes,
+                chunk_bytes=settings.service.upload_chunk_bytes,
+            )
+            request_id = stable_request_id(file.filename, upload.sha256)
+            if request_id in seen:
+                upload.path.unlink()
+                continue
+            seen.add(request_id)
+            items.append(BatchItem(request_id, upload.path, file.filename, content_hash=upload.sha256))
+
+        # Documents take slots from the same AdmissionController as /extract.
+        # The first record is awaited here, so a saturated service turns the
+        # whole batch away with 429/503 before the stream starts.
+        stream = app.state.batch.run_admitted(items, app.state.admission, skip=set(skip), use_cache=use_cache)
+        try:
+            first = await anext(stream, None)
+        except AdmissionRejected as exc:
+            raise _rejected(exc) from exc
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    async def records() -> AsyncIterator[bytes]:
+        try:
+            if first is not None:
+                yield orjson.dumps(first) + b"\n"
+                async for record in stream:
+                    yield orjson.dumps(record) + b"\n"
+        finally:
+            await stream.aclose()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+
+def get_job_queue() -> JobQueue:
+    jobs = getattr(app.state, "jobs", None)
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+    return jobs
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    priority: int = Query(0, description="Higher runs first; FIFO within a priority"),
+    use_cache: bool = Query(True, description="False recomputes instead of serving a cached result"),
+    jobs: JobQueue = Depends(get_job_queue),
+    settings: Settings = Depends(get_service_settings),
+):
+    # Streamed straight into the queue's upload directory, so submitting is a rename.
+    upload = await save_upload(
+        file,
+        directory=jobs.upload_dir,
+        max_bytes=settings.service.max_upload_bytes,
+        chunk_bytes=settings.service.upload_chunk_bytes,
+    )
+    job = jobs.submit(
+        upload.path, filename=file.filename, priority=priority, use_cache=use_cache, content_hash=upload.sha256
+    )
+    return JobResponse(**job.to_dict())
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return JobResponse(**job.to_dict())
+
+
+@app.get("/jobs/{job_id}/result", response_model=ExtractionResponse)
+def get_job_result(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail={"status": job.status, "error": job.error})
+    return ExtractionResponse(**jobs.store.result(job_id))
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -89,6 +256,11 @@ def health() -> HealthResponse:
     return HealthResponse(status="ok", uptime_s=time.time() - START_TIME)
 
 
+@app.get("/cache/stats")
+def cache_stats() -> dict:
+    return app.state.pipeline.cache_stats()
+
+
 @app.get("/metrics", response_class=PlainTextResponse)
 def metrics():
-    return PlainTextResponse(generate_latest().decode())
+    return PlainTextResponse(render_latest().decode())
@@ -0,0 +1,122 @@
+"""Streaming upload handling.
+
+Uploads are copied to disk in `upload_chunk_bytes` chunks while a sha256 is
+computed over the same bytes, so a 100 MB scan never sits in memory as one
+`bytes` object and the digest is ready to key the result cache. The size
+limit is checked against the declared part size before reading and again
+while streaming; the PDF header is checked on the first bytes instead of
+trusting the filename.
+
+Starlette parses a multipart body, spooling each file part to a temporary
+file, before the endpoint sees any `UploadFile`, so the checks in
+`save_upload` only bound the second copy. `UploadLimitMiddleware` bounds the
+request itself: a declared Content-Length over the route's limit gets 413
+before any body is read, and a body without one (chunked) fails with 413 as
+soon as it passes the limit while being received.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# PDF readers accept the `%PDF-` header anywhere in the first 1024 bytes.
+PDF_MAGIC = b"%PDF-"
+_HEADER_WINDOW = 1024
+# Boundaries, part headers and small form fields around a single file part.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass(frozen=True)
+class SavedUpload:
+    path: Path
+    sha256: str
+    size: int
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies over `limit_for(path)` bytes (None: no limit) before they are parsed."""
+
+    def __init__(self, app: ASGIApp, limit_for: Callable[[str], Optional[int]]) -> None:
+        self.app = app
+        self.limit_for = limit_for
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            detail = f"Request body exceeds {limit} bytes"
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing and rendered as 413.
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def save_upload(
+    upload: UploadFile,
+    directory: Path | None = None,
+    max_bytes: int = 200 * 1024 * 1024,
+    chunk_bytes: int = 1024 * 1024,
+) -> SavedUpload:
+    """Stream `upload` into a new file in `directory` (default: system temp dir).
+
+    Raises 400 for a non-PDF and 413 past `max_bytes`; the partial file is
+    removed in both cases. This bounds the saved copy of one file; the
+    request body as received is bounded by `UploadLimitMiddleware`.
+    """
+    if not upload.filename or not upload.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF uploads are supported")
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(suffix=".pdf", prefix="upload_", dir=directory)
+    path = Path(name)
+    digest = hashlib.sha256()
+    size = 0
+    header = b""
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(chunk_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                if len(header) < _HEADER_WINDOW:
+                    header += chunk[: _HEADER_WINDOW - len(header)]
+                    if len(header) >= _HEADER_WINDOW and PDF_MAGIC not in header:
+                        raise HTTPException(status_code=400, detail="Upload is not a PDF")
+                digest.update(chunk)
+                out.write(chunk)
+        if PDF_MAGIC not in header:
+            raise HTTPException(status_code=400, detail="Upload is not a PDF")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=path, sha256=digest.hexdigest(), size=size)
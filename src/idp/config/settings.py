@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Literal
+from typing import Dict, List, Literal
 
 from pydantic import BaseModel, Field
 
@@ -9,6 +9,70 @@ class OCRSettings(BaseModel):
     tesseract_cmd: str = Field(default="tesseract", description="Path to tesseract binary")
     languages: list[str] = Field(default_factory=lambda: ["eng"], description="Language packs")
     dpi: int = 300
+    adaptive_dpi: bool = Field(
+        default=False, description="Pick each page's DPI from the glyph height on a low-DPI preview"
+    )
+    adaptive_preview_dpi: int = Field(default=100, ge=36, description="DPI of the glyph-measuring preview")
+    adaptive_min_dpi: int = Field(default=150, ge=36)
+    adaptive_max_dpi: int = Field(default=400, ge=36)
+    adaptive_target_glyph_px: float = Field(
+        default=20.0, gt=0, description="Median glyph height in pixels the chosen DPI must reach"
+    )
+    backend: Literal["pytesseract", "tesserocr"] = Field(
+        default="pytesseract", description="CLI subprocess per page, or in-process API handles per thread"
+    )
+    tessdata_path: str | None = Field(default=None, description="tessdata dir for the tesserocr backend")
+    in_memory: bool = Field(default=True, description="Keep pages as arrays; False writes PNGs to a tempdir")
+    workers: int = Field(default=1, ge=1, description="Pages OCR'd concurrently; 1 keeps the sequential path")
+    executor: Literal["thread", "process"] = "thread"
+    max_pending_pages: int | None = Field(
+        default=None, ge=1, description="Bound on submitted-but-unfinished pages (default 2 x workers)"
+    )
+    prefetch_pages: int = Field(
+        default=1, ge=0, description="Pages rendered ahead of OCR on a background thread; 0 disables"
+    )
+    page_timeout_s: float = Field(default=0, ge=0, description="Per-page tesseract timeout; 0 disables")
+    roi_mode: bool = Field(
+        default=False, description="OCR only anchor-bearing text lines at full resolution (idp.ocr.roi)"
+    )
+    roi_lowres_scale: float = Field(default=0.5, gt=0, le=1, description="Scale of the anchor-finding pass")
+    roi_required_fields: Dict[str, List[str]] = Field(
+        default_factory=lambda: {
+            "invoice": ["invoice_number", "invoice_date", "total_amount"],
+            "id_card": ["id_number", "birth_date", "expiry_date"],
+        },
+        description="Per document type; if any is missing the document is redone with full-page OCR",
+    )
+
+
+class PreprocessSettings(BaseModel):
+    deskew_method: Literal["min_area_rect", "projection"] = "min_area_rect"
+    deskew_sample_px: int = Field(default=1024, ge=64, description="Longest side of the skew-estimation copy")
+    deskew_max_angle: float = Field(default=10.0, gt=0, le=45, description="Skew search range in degrees")
+    deskew_min_angle: float = Field(default=0.25, ge=0, description="Skip the rotation below this skew")
+    use_text_layer: bool = True
+    text_layer_min_words: int = Field(default=5, ge=1, description="Words needed to trust a page's text layer")
+    text_layer_min_alnum_ratio: float = Field(
+        default=0.6, ge=0, le=1, description="Share of text-layer words that must contain letters/digits"
+    )
+    text_layer_verify: bool = Field(
+        default=True, description="Check a low-DPI render for ink the text layer does not explain"
+    )
+    text_layer_verify_dpi: int = Field(default=72, ge=36, description="DPI of the text-layer check render")
+    text_layer_max_uncovered: float = Field(
+        default=0.25, ge=0, le=1, description="Share of text-like ink outside layer words that forces OCR"
+    )
+    skip_blank_pages: bool = True
+    blank_sample_px: int = Field(default=512, ge=16, description="Longest side of the paper-tone subsample")
+    blank_ink_delta: int = Field(default=48, ge=1, le=255, description="How much darker than paper counts as ink")
+    blank_min_glyphs: int = Field(default=4, ge=1, description="Glyph-sized ink blobs a page needs to be OCR'd")
+    blank_min_glyph_pt: float = Field(default=2.5, gt=0, description="Smallest blob height (points) counted as a glyph")
+
+
+class ExtractionSettings(BaseModel):
+    mode: Literal["regex", "layout"] = Field(
+        default="regex", description="'layout' links labels to values by token position (idp.models.layout)"
+    )
 
 
 class ValidationSettings(BaseModel):
@@ -20,18 +84,91 @@ class ValidationSettings(BaseModel):
 
 class StorageSettings(BaseModel):
     duckdb_path: Path = Field(default=Path("data/idp.duckdb"))
+    write_mode: Literal["async", "sync"] = Field(
+        default="async", description="'sync' inserts inside the request, as before the background writer"
+    )
+    write_buffer_rows: int = Field(default=50_000, ge=1, description="Ring buffer capacity of the async writer")
+    write_batch_rows: int = Field(default=2_000, ge=1, description="Buffered rows that trigger a flush")
+    write_flush_interval_s: float = Field(default=1.0, gt=0, description="Max age of buffered rows")
+    write_overflow: Literal["block", "drop_oldest", "drop_newest"] = Field(
+        default="block", description="What a full buffer does: wait for the writer, or drop rows (counted)"
+    )
+    write_checkpoint: bool = Field(default=False, description="CHECKPOINT the database after every flush")
+    writer_socket: Path = Field(
+        default=Path("data/analytics.sock"), description="Unix socket of the writer process (idp.serve)"
+    )
+    archive_dir: Path = Field(default=Path("data/archive/extractions"))
+    hot_days: int = Field(default=1, ge=1, description="Days of rows kept in the live DuckDB table")
+    retention_days: int | None = Field(default=None, ge=1, description="Drop partitions older than this")
+    compact_min_files: int = Field(default=2, ge=2, description="Files in a day partition that trigger a merge")
+    maintenance_interval_s: float = Field(
+        default=3600.0, ge=0, description="Archive/compact/retention period in the API process; 0 disables"
+    )
+    top_failures_refresh_s: float = Field(
+        default=0.0, ge=0, description="Re-rank top_failures at most this often; 0 re-ranks on every change"
+    )
+
+
+class CacheSettings(BaseModel):
+    enabled: bool = True
+    memory_entries: int = Field(default=256, ge=0, description="In-process LRU capacity; 0 disables the tier")
+    disk_enabled: bool = True
+    disk_dir: Path = Field(default=Path("data/cache/results"))
+    disk_max_bytes: int = Field(default=512 * 1024 * 1024, ge=0)
+    pages_enabled: bool = True
+    page_entries: int = Field(default=1024, ge=0, description="Distinct pages kept in the page OCR cache")
+    page_max_tokens: int = Field(default=500_000, ge=0, description="Total OCR tokens held by the page cache")
+
+
+class JobSettings(BaseModel):
+    enabled: bool = True
+    workers: int = Field(default=1, ge=1, description="Threads running queued jobs")
+    db_path: Path = Field(default=Path("data/jobs.sqlite"))
+    upload_dir: Path = Field(default=Path("data/jobs/uploads"), description="Uploaded PDFs awaiting a worker")
+    poll_interval_s: float = Field(default=1.0, gt=0, description="Idle workers re-check the queue this often")
+    heartbeat_interval_s: float = Field(default=10.0, gt=0, description="Running jobs' heartbeat refresh interval")
+    stale_after_s: float = Field(
+        default=120.0, gt=0, description="Running jobs without a heartbeat this long are requeued"
+    )
+    retention_s: float = Field(
+        default=7 * 86400, ge=0, description="Done/failed jobs and results are deleted this long after; 0 keeps them"
+    )
 
 
 class ServiceSettings(BaseModel):
     environment: Literal["dev", "staging", "prod"] = "dev"
     log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
     enable_metrics: bool = True
+    workers: int = Field(default=1, ge=1, description="API processes started by idp.serve")
+    metrics_dir: Path = Field(
+        default=Path("data/prometheus"), description="PROMETHEUS_MULTIPROC_DIR used by idp.serve"
+    )
+    pipeline_workers: int = Field(default=2, ge=1, description="Threads running ExtractionPipeline.extract")
+    max_in_flight: int | None = Field(default=None, ge=1, description="Concurrent extractions (default: workers)")
+    max_queue_depth: int = Field(default=8, ge=0, description="Requests allowed to wait for a slot")
+    queue_timeout_s: float = Field(default=30.0, gt=0, description="Max wait for a slot before 503")
+    retry_after_s: int = Field(default=5, ge=1, description="Retry-After hint on 429/503")
+    max_upload_bytes: int = Field(default=200 * 1024 * 1024, ge=1, description="Larger uploads get 413")
+    upload_chunk_bytes: int = Field(default=1024 * 1024, ge=1024, description="Read size when streaming uploads")
+    profile_sample_rate: float = Field(
+        default=0.0, ge=0, le=1, description="Fraction of extractions profiled with cProfile; 0 disables"
+    )
+    profile_dir: Path = Field(default=Path("data/profiles"))
+    batch_workers: int = Field(default=4, ge=1, description="Documents processed concurrently per batch")
+    batch_max_files: int = Field(default=500, ge=1, description="Max PDFs in one POST /extract/batch upload")
+    batch_max_bytes: int = Field(
+        default=2 * 1024 * 1024 * 1024, ge=1, description="Larger POST /extract/batch request bodies get 413"
+    )
 
 
 class Settings(BaseModel):
     ocr: OCRSettings = OCRSettings()
+    preprocess: PreprocessSettings = PreprocessSettings()
+    extraction: ExtractionSettings = ExtractionSettings()
     validation: ValidationSettings = ValidationSettings()
     storage: StorageSettings = StorageSettings()
+    cache: CacheSettings = CacheSettings()
+    jobs: JobSettings = JobSettings()
     service: ServiceSettings = ServiceSettings()
     schema_path: Path = Path("src/idp/config/schema.yaml")
 
@@ -1,3 +1,4 @@
 from idp.models.extractor import ExtractionResult, FieldPrediction, HeuristicExtractor
+from idp.models.layout import LayoutExtractor
 
-__all__ = ["ExtractionResult", "FieldPrediction", "HeuristicExtractor"]
+__all__ = ["ExtractionResult", "FieldPrediction", "HeuristicExtractor", "LayoutExtractor"]
@@ -7,10 +7,13 @@ the v0.2 refactor because it was never actually wired into the pipeline.
 """
 from __future__ import annotations
 
+import hashlib
+import heapq
+import itertools
 import logging
 import re
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional
 
 from idp.ocr.tesseract_engine import OCRResult
 
@@ -62,12 +65,165 @@ _PATTERNS: Dict[str, tuple[str, float]] = {
     ),
 }
 
+# The label each pattern above is anchored on, plus the words `_infer_doc_type`
+# and `_mrz_parse` key on. Region-of-interest OCR (`idp.ocr.roi`) reads a page
+# at low resolution and only OCRs the lines containing one of these properly,
+# so a new pattern needs its anchor here too.
+_ANCHORS: Dict[str, str] = {
+    "invoice_number": r"invoice\s*(?:no|number|#)",
+    "invoice_date": r"date",
+    "due_date": r"due",
+    "subtotal_amount": r"sub[\s\-]?total",
+    "tax_amount": r"\btax\b",
+    "total_amount": r"\btotal",
+    "tax_id": r"tax\s*(?:id|number)",
+    "routing_number": r"routing",
+    "bank_account": r"account",
+    "id_number": r"\bid\s*(?:no|number)",
+    "expiry_date": r"expir",
+    "birth_date": r"birth|\bdob\b",
+    "doc_type": r"invoice|passport|identification|\bform\b|\birs\b|1040",
+    "mrz": r"<<",
+}
+ANCHOR_RE = re.compile("|".join(f"(?:{anchor})" for anchor in _ANCHORS.values()), re.IGNORECASE)
+
+# Literal text every match of each pattern starts with (case-insensitively).
+# `FieldScanner` only tries a pattern where one of these occurs, so a pattern
+# that can start any other way must list that prefix too.
+_PATTERN_PREFIXES: Dict[str, tuple[str, ...]] = {
+    "invoice_number": ("invoice",),
+    "invoice_date": ("invoice", "date"),
+    "due_date": ("due",),
+    "subtotal_amount": ("sub",),
+    "tax_amount": ("tax",),
+    "total_amount": ("total",),
+    "tax_id": ("tax",),
+    "routing_number": ("routing",),
+    "bank_account": ("account",),
+    "id_number": ("id",),
+    "expiry_date": ("expir",),
+    "birth_date": ("date", "dob", "birth"),
+}
+
+# The only characters for which re.IGNORECASE and str.lower() disagree about
+# an ASCII letter. Folding them first also keeps the lowered text the same
+# length as the original (str.lower() turns "İ" into two characters).
+_CASE_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+
 _AMOUNT_FIELDS = {"subtotal_amount", "tax_amount", "total_amount"}
 # Real ICAO MRZ lines are 30, 36, or 44 characters. The previous regex was
 # hardcoded to 30, which silently dropped passport (44) and ID-1 (30) variants
 # living on the same page.
 _MRZ_LINE = re.compile(r"([A-Z0-9<]{30}|[A-Z0-9<]{36}|[A-Z0-9<]{44})")
 
+# `_MRZ_LINE`'s 30-character branch matches wherever a longer one could, so
+# this finds the same lines; without the alternation the regex engine can
+# skip ahead on the character class. The byte table maps MRZ characters to
+# "M" for a quick `find` of a 30-character run before any regex runs.
+_MRZ_RUN = re.compile(r"[A-Z0-9<]{30}")
+_MRZ_BYTES = bytes(
+    ord("M") if chr(i) in "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<" else ord(" ") for i in range(256)
+)
+
+# Fingerprint of the rule set. It is part of the result-cache key, so editing
+# a pattern invalidates every cached extraction.
+PATTERN_VERSION = hashlib.sha256(
+    repr((sorted(_PATTERNS.items()), _MRZ_LINE.pattern, ANCHOR_RE.pattern)).encode()
+).hexdigest()[:16]
+
+
+def _prediction(name: str, match: re.Match, conf: float) -> FieldPrediction:
+    value = match.group(1).strip()
+    if name in _AMOUNT_FIELDS:
+        value = value.replace(",", "")
+    return FieldPrediction(name=name, value=value, confidence=conf)
+
+
+def _mrz_predictions(lines: List[str]) -> List[FieldPrediction]:
+    out: List[FieldPrediction] = []
+    if lines:
+        out.append(FieldPrediction(name="mrz_line1", value=lines[0], confidence=0.7))
+    if len(lines) >= 2:
+        out.append(FieldPrediction(name="mrz_line2", value=lines[1], confidence=0.7))
+    return out
+
+
+def _doc_type(has_word: Callable[[str], bool], has_mrz: Callable[[], bool]) -> str:
+    if has_word("invoice"):
+        return "invoice"
+    if has_word("passport") or has_word("identification") or has_mrz():
+        return "id_card"
+    if has_word("form") or has_word("irs") or has_word("1040"):
+        return "tax_form"
+    return "unknown"
+
+
+def _mrz_lines(text: str, limit: int) -> List[str]:
+    """The first `limit` of `_MRZ_LINE.findall(text)`."""
+    # Non-ASCII characters become "?", one byte each, so offsets still line up.
+    start = text.encode("ascii", "replace").translate(_MRZ_BYTES).find(b"M" * 30)
+    if start == -1:
+        return []
+    return [m.group() for m in itertools.islice(_MRZ_RUN.finditer(text, start), limit)]
+
+
+def _find_all(lowered: str, keyword: str) -> Iterator[int]:
+    start = lowered.find(keyword)
+    while start != -1:
+        yield start
+        start = lowered.find(keyword, start + 1)
+
+
+class FieldScanner:
+    """Anchor-prefiltered field scanner, compiled once per process.
+
+    Produces exactly the predictions of one `re.search` per pattern, without
+    running every pattern over the whole text. The text is lowercased once
+    and each pattern is tried with `match` only at the positions where one
+    of its `_PATTERN_PREFIXES` occurs, found lazily with `str.find`. Because
+    positions are tried in order, the first success is the match `re.search`
+    would have returned. The regex engine only reads the short window after
+    the anchor that the match spans. Patterns whose anchors never occur cost
+    a single failed `find`. The document type comes from the same lowered
+    text. MRZ lines are looked for only past the first run of 30 MRZ
+    characters, and the scan stops after the two lines the extractor reports.
+    """
+
+    def __init__(
+        self,
+        patterns: Dict[str, tuple[str, float]],
+        prefixes: Dict[str, tuple[str, ...]],
+    ) -> None:
+        self._fields = [
+            (name, re.compile(pattern, re.IGNORECASE), conf, prefixes[name])
+            for name, (pattern, conf) in patterns.items()
+        ]
+
+    def scan(self, text: str) -> ExtractionResult:
+        folded = any(ch in text for ch in "İıſ")
+        lowered = text.translate(_CASE_FOLD).lower() if folded else text.lower()
+        fields: List[FieldPrediction] = []
+        for name, regex, conf, prefixes in self._fields:
+            starts = (
+                _find_all(lowered, prefixes[0])
+                if len(prefixes) == 1
+                else heapq.merge(*(_find_all(lowered, prefix) for prefix in prefixes))
+            )
+            for start in starts:
+                match = regex.match(text, start)
+                if match:
+                    fields.append(_prediction(name, match, conf))
+                    break
+        mrz = _mrz_lines(text, 2)
+        fields.extend(_mrz_predictions(mrz))
+        # _infer_doc_type's substring tests are on plain str.lower().
+        doc_lowered = text.lower() if folded else lowered
+        doc_type = _doc_type(lambda word: word in doc_lowered, lambda: bool(mrz))
+        return ExtractionResult(document_type=doc_type, fields=fields)
+
+
+_SCANNER = FieldScanner(_PATTERNS, _PATTERN_PREFIXES)
+
 
 class HeuristicExtractor:
     """Regex-based extractor producing FieldPrediction objects.
@@ -75,10 +231,19 @@ class HeuristicExtractor:
     The extractor takes OCR full text plus the structured token list and runs
     a small set of anchor-based regexes. It is intentionally simple so that the
     eval harness can attribute every error to a single rule.
+
+    `use_scanner=False` runs each pattern over the whole text with
+    `re.search`, the reference behaviour `FieldScanner` reproduces;
+    `scripts/bench_extractor.py` compares the two.
     """
 
+    def __init__(self, use_scanner: bool = True) -> None:
+        self.use_scanner = use_scanner
+
     def extract(self, ocr_result: OCRResult) -> ExtractionResult:
         text = ocr_result.full_text
+        if self.use_scanner:
+            return _SCANNER.scan(text)
         fields = self._regex_parse(text)
         fields.extend(self._mrz_parse(text))
         doc_type = self._infer_doc_type(text)
@@ -88,29 +253,13 @@ class HeuristicExtractor:
         results: List[FieldPrediction] = []
         for name, (pattern, conf) in _PATTERNS.items():
             match = re.search(pattern, text, re.IGNORECASE)
-            if not match:
-                continue
-            value = match.group(1).strip()
-            if name in _AMOUNT_FIELDS:
-                value = value.replace(",", "")
-            results.append(FieldPrediction(name=name, value=value, confidence=conf))
+            if match:
+                results.append(_prediction(name, match, conf))
         return results
 
     def _mrz_parse(self, text: str) -> List[FieldPrediction]:
-        matches = _MRZ_LINE.findall(text)
-        out: List[FieldPrediction] = []
-        if matches:
-            out.append(FieldPrediction(name="mrz_line1", value=matches[0], confidence=0.7))
-        if len(matches) >= 2:
-            out.append(FieldPrediction(name="mrz_line2", value=matches[1], confidence=0.7))
-        return out
+        return _mrz_predictions(_MRZ_LINE.findall(text))
 
     def _infer_doc_type(self, text: str) -> str:
         lowered = text.lower()
-        if "invoice" in lowered:
-            return "invoice"
-        if "passport" in lowered or "identification" in lowered or _MRZ_LINE.search(text):
-            return "id_card"
-        if "form" in lowered or "irs" in lowered or "1040" in lowered:
-            return "tax_form"
-        return "unknown"
+        return _doc_type(lambda word: word in lowered, lambda: bool(_MRZ_LINE.search(text)))
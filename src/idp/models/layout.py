@@ -0,0 +1,187 @@
+"""Layout-aware label→value linking over OCR token boxes.
+
+`HeuristicExtractor` reads flattened text, so it depends on tesseract's
+reading order. A value printed under its label (table headers, boxed forms)
+or a two-column header that interleaves two lines breaks the regexes.
+`LayoutExtractor` uses the token boxes instead. It finds each field's label
+words through `TokenIndex.words`, then takes the first value-shaped token
+to the right on the same line, or failing that directly below the label.
+Queries go through the per-page `TokenGrid`, so a page costs about the
+number of label occurrences rather than the square of its token count
+(`scripts/bench_layout.py`).
+
+Layout links win over regex matches for the same field; fields without a
+link, the MRZ lines and the document type come from the regex pass.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from idp.models.extractor import (
+    _AMOUNT_FIELDS,
+    _PATTERNS,
+    ExtractionResult,
+    FieldPrediction,
+    HeuristicExtractor,
+)
+from idp.ocr.tesseract_engine import OCRResult, OCRToken
+from idp.ocr.token_index import TokenIndex, normalize_word
+
+# Each label is a sequence of words on one line; each word is a set of
+# accepted spellings (after `normalize_word`). Alternatives are tried in
+# order, so longer labels come first.
+Label = Tuple[Tuple[str, ...], ...]
+
+_LABELS: Dict[str, List[Label]] = {
+    "invoice_number": [(("invoice",), ("no", "number", "#"))],
+    "invoice_date": [(("invoice",), ("date",)), (("date",),)],
+    "due_date": [(("due",), ("date",))],
+    "subtotal_amount": [(("subtotal", "sub-total"),), (("sub",), ("total",))],
+    "tax_amount": [(("tax",), ("amount",)), (("tax",),)],
+    "total_amount": [(("total",), ("due", "amount")), (("total",),)],
+    "tax_id": [(("tax",), ("id", "number"))],
+    "routing_number": [(("routing",), ("no", "number"))],
+    "bank_account": [(("account",), ("number", "no"))],
+    "id_number": [(("id",), ("no", "number"))],
+    "expiry_date": [(("expiry", "expires", "expire"),)],
+    "birth_date": [(("date",), ("of",), ("birth",)), (("dob",),), (("birth",), ("date",))],
+}
+
+_DATE = r"([0-9]{4}-[0-9]{2}-[0-9]{2}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{2,4})"
+_AMOUNT = r"\$?([0-9][0-9,]*\.?[0-9]*)"
+# Identifiers must contain a digit: unlike the regexes, a layout link can
+# land on any word next to a label.
+_IDENT = r"([A-Za-z0-9\-]*[0-9][A-Za-z0-9\-]*)"
+
+# Whole-token value shapes; group 1 is the value.
+_VALUES: Dict[str, re.Pattern] = {
+    name: re.compile(pattern)
+    for name, pattern in {
+        "invoice_number": _IDENT,
+        "invoice_date": _DATE,
+        "due_date": _DATE,
+        "subtotal_amount": _AMOUNT,
+        "tax_amount": _AMOUNT,
+        "total_amount": _AMOUNT,
+        "tax_id": r"([0-9A-Za-z\-]{9,15})",
+        "routing_number": r"([0-9]{9})",
+        "bank_account": r"([0-9]{6,20})",
+        "id_number": _IDENT,
+        "expiry_date": _DATE,
+        "birth_date": _DATE,
+    }.items()
+}
+
+# Tokens that may sit between a label and its value: separators and
+# currency symbols or codes.
+_FILLER = re.compile(r"[:\-#$€£]|[A-Z]{3}:?")
+
+# How far below a label its value may start, in label heights.
+_BELOW_LINES = 2
+
+LAYOUT_VERSION = hashlib.sha256(
+    repr((sorted(_LABELS.items()), sorted((k, v.pattern) for k, v in _VALUES.items()), _FILLER.pattern)).encode()
+).hexdigest()[:16]
+
+
+def _union(tokens: List[OCRToken]) -> Tuple[int, int, int, int]:
+    return (
+        min(t.bbox[0] for t in tokens),
+        min(t.bbox[1] for t in tokens),
+        max(t.bbox[2] for t in tokens),
+        max(t.bbox[3] for t in tokens),
+    )
+
+
+class LayoutLinker:
+    """Links labels to values on one document's tokens (see module docstring)."""
+
+    def __init__(self, tokens: Sequence[OCRToken]) -> None:
+        # Materialise `TokenColumns` views once: tokens are keyed by identity.
+        tokens = list(tokens)
+        self.index = TokenIndex(tokens)
+        self._order = {id(token): i for i, token in enumerate(tokens)}
+        # Length of the longest label each token is part of. A label may only
+        # use tokens no longer label claims, so "total" in "Sub Total", "date"
+        # in "Due Date" and "tax" in "Tax ID" are not read as shorter labels.
+        self._claims: Dict[int, int] = {}
+        for labels in _LABELS.values():
+            for label in labels:
+                if len(label) > 1:
+                    for words in self._label_matches(label):
+                        for token in words:
+                            self._claims[id(token)] = max(self._claims.get(id(token), 0), len(label))
+
+    def _label_matches(self, label: Label) -> Iterator[List[OCRToken]]:
+        for first in label[0]:
+            for token in self.index.words.get(first, ()):
+                words = [token]
+                for spellings in label[1:]:
+                    gap = words[-1].bbox[3] - words[-1].bbox[1]
+                    nxt = next(self.index.right_of(words[-1], max_gap=gap), None)
+                    if nxt is None or normalize_word(nxt.text) not in spellings:
+                        break
+                    words.append(nxt)
+                else:
+                    yield words
+
+    def _value(self, name: str, label: List[OCRToken]) -> Optional[Tuple[str, str]]:
+        grid = self.index.pages[label[0].page_num]
+        box = _union(label)
+        pattern = _VALUES[name]
+        neighbours = (
+            ("right", grid.right_of(box)),
+            ("below", grid.below(box, max_gap=_BELOW_LINES * (box[3] - box[1]))),
+        )
+        for direction, tokens in neighbours:
+            # Only the first non-filler token counts: a label's value is its
+            # nearest neighbour, not any matching word further along.
+            for token in tokens:
+                if not _FILLER.fullmatch(token.text):
+                    match = pattern.fullmatch(token.text.rstrip(";,"))
+                    if match:
+                        return match.group(1), direction
+                    break
+        return None
+
+    def link(self, name: str) -> Optional[FieldPrediction]:
+        """The first label of `name`, in OCR token order, that has a value."""
+        candidates = []
+        for label in _LABELS[name]:
+            for words in self._label_matches(label):
+                if all(self._claims.get(id(token), 0) <= len(label) for token in words):
+                    candidates.append(words)
+        candidates.sort(key=lambda words: self._order[id(words[0])])
+        for words in candidates:
+            found = self._value(name, words)
+            if found is not None:
+                value, direction = found
+                if name in _AMOUNT_FIELDS:
+                    value = value.replace(",", "")
+                return FieldPrediction(
+                    name=name,
+                    value=value,
+                    confidence=_PATTERNS[name][1],
+                    source="layout",
+                    extra={"link": direction, "page": words[0].page_num},
+                )
+        return None
+
+
+class LayoutExtractor(HeuristicExtractor):
+    """`HeuristicExtractor` with label→value links from token geometry.
+
+    Selected by `ExtractionSettings.mode = "layout"`.
+    """
+
+    def extract(self, ocr_result: OCRResult) -> ExtractionResult:
+        result = super().extract(ocr_result)
+        if not ocr_result.tokens:
+            return result
+        linker = LayoutLinker(ocr_result.tokens)
+        linked = {name: linker.link(name) for name in _LABELS}
+        fields = [linked.pop(p.name, None) or p for p in result.fields]
+        fields.extend(p for p in linked.values() if p is not None)
+        return ExtractionResult(document_type=result.document_type, fields=fields)
@@ -0,0 +1,107 @@
+"""Per-page OCR result cache keyed by preprocessed pixels.
+
+Boilerplate terms-and-conditions pages, cover sheets and blank pages repeat
+across (and within) documents. `PageOCRCache` maps a hash of the preprocessed
+page — the exact input tesseract would see — plus the OCR engine's
+fingerprint (backend, binary, version, languages) to the page's `OCRResult`,
+so `run_tesseract` only runs once per distinct page and engine.
+
+The cache is an LRU bounded both by entry count and by the total number of
+tokens held. Tokens are stored as read-only `TokenColumns` and shared between
+the cache and its callers; each caller gets its own metadata dict.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+import numpy as np
+
+from idp.config import get_settings
+from idp.config.settings import CacheSettings
+from idp.ocr.tesseract_engine import OCRResult, as_columns, engine_fingerprint
+from idp.services.metrics import PAGE_CACHE_HITS, PAGE_CACHE_MISSES
+
+
+def copy_ocr_result(result: OCRResult) -> OCRResult:
+    return OCRResult(
+        tokens=as_columns(result.tokens),
+        full_text=result.full_text,
+        metadata=dict(result.metadata),
+    )
+
+
+class PageOCRCache:
+    def __init__(self, max_entries: int = 1024, max_tokens: int = 500_000, salt: str = "") -> None:
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.salt = salt
+        self._entries: "OrderedDict[str, OCRResult]" = OrderedDict()
+        self._tokens = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_settings(cls, settings: CacheSettings | None = None) -> "PageOCRCache":
+        app_settings = get_settings()
+        cache = settings or app_settings.cache
+        return cls(
+            max_entries=cache.page_entries,
+            max_tokens=cache.page_max_tokens,
+            salt=engine_fingerprint(app_settings.ocr),
+        )
+
+    def key(self, image) -> str:
+        digest = hashlib.sha256(self.salt.encode())
+        if isinstance(image, np.ndarray):
+            digest.update(repr(image.shape).encode())
+            digest.update(np.ascontiguousarray(image).data)
+        else:
+            # cv2 writes identical pixels to identical bytes, so hashing the
+            # PNG is as good as hashing the pixels in the on-disk mode.
+            digest.update(Path(image).read_bytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[OCRResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+        if result is None:
+            PAGE_CACHE_MISSES.inc()
+            return None
+        PAGE_CACHE_HITS.inc()
+        return copy_ocr_result(result)
+
+    def put(self, key: str, result: OCRResult) -> None:
+        size = len(result.tokens)
+        if self.max_entries <= 0 or size > self.max_tokens:
+            return
+        stored = copy_ocr_result(result)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._tokens -= len(previous.tokens)
+            self._entries[key] = stored
+            self._tokens += size
+            while len(self._entries) > self.max_entries or self._tokens > self.max_tokens:
+                _, evicted = self._entries.popitem(last=False)
+                self._tokens -= len(evicted.tokens)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "tokens": self._tokens,
+                "max_tokens": self.max_tokens,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -0,0 +1,325 @@
+"""Page-parallel OCR.
+
+`run_tesseract` handles one page per call and spends almost all of its time in
+the tesseract child process, so the pages of a multi-page document can be
+OCR'd concurrently. `ParallelOCREngine` fans pages out to a thread or process
+pool through a bounded submission window and stitches the per-page results
+back together in page order, producing exactly the `OCRResult` the sequential
+loop would have built. An optional `PageOCRCache` short-circuits pages whose
+pixels have been OCR'd before. `BlankPage` and `TextLayerPage` markers from
+the preprocessor resolve to results without touching tesseract.
+
+`prefetch` overlaps page rendering with OCR: it drains a page iterator on a
+background thread into a bounded queue, so the next page is being rendered
+and preprocessed while the current one is in tesseract.
+"""
+from __future__ import annotations
+
+import contextvars
+import queue
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from threading import Event, Lock, Thread
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, TypeVar, Union
+
+from idp.config import get_settings
+from idp.config.settings import OCRSettings
+from idp.ocr import tesserocr_backend
+from idp.ocr.page_cache import PageOCRCache, copy_ocr_result
+from idp.ocr.preprocess import BlankPage, TextLayerPage
+from idp.ocr.tesseract_engine import OCRResult, TokenColumns, as_columns, run_tesseract
+from idp.services.metrics import BLANK_PAGES_SKIPPED, PAGES_BY_SOURCE
+
+PageFn = Callable[..., OCRResult]
+T = TypeVar("T")
+
+_END = object()
+
+
+class _Raised:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def prefetch(items: Iterable[T], depth: int) -> Iterator[T]:
+    """Yield from `items`, producing up to `depth` items ahead on a background thread.
+
+    `depth <= 0` disables the producer thread. Exceptions raised by the
+    producer are re-raised in the consumer; closing the generator early stops
+    the producer after the item it is currently working on.
+    """
+    if depth <= 0:
+        yield from items
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as exc:  # handed to the consumer
+            put(_Raised(exc))
+
+    # The producer runs in a copy of the caller's context so per-page stage
+    # spans and metric labels attach to the current request.
+    producer = Thread(
+        target=contextvars.copy_context().run, args=(produce,), name="idp-page-prefetch", daemon=True
+    )
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def blank_page_result() -> OCRResult:
+    """Result for a page the preprocessor classified as blank; tesseract never runs."""
+    BLANK_PAGES_SKIPPED.inc()
+    return OCRResult(tokens=[], full_text="", metadata={"blank": True, "source": "blank"})
+
+
+def _precomputed_result(image) -> Optional[OCRResult]:
+    """Results for pages that never reach tesseract (blank or text-layer pages)."""
+    if isinstance(image, BlankPage):
+        return blank_page_result()
+    if isinstance(image, TextLayerPage):
+        return image.result
+    return None
+
+
+def _count_sources(page_results: Iterable[OCRResult]) -> Iterator[OCRResult]:
+    """Count each page in `idp_pages_total` under the source its result reports."""
+    for page_result in page_results:
+        PAGES_BY_SOURCE.labels(page_result.metadata.get("source", "ocr")).inc()
+        yield page_result
+
+
+def merge_page_results(page_results: Iterable[OCRResult]) -> OCRResult:
+    """Concatenate per-page results, renumbering tokens 1..N in iteration order."""
+    columns: List[TokenColumns] = []
+    full_text_parts: List[str] = []
+    blank_pages: List[int] = []
+    page_sources: List[str] = []
+    roi_coverage: List[Optional[float]] = []
+    for page_num, page_result in enumerate(page_results, start=1):
+        page_sources.append(page_result.metadata.get("source", "ocr"))
+        roi_coverage.append(page_result.metadata.get("roi_coverage"))
+        if page_result.metadata.get("blank"):
+            blank_pages.append(page_num)
+        columns.append(as_columns(page_result.tokens).with_page(page_num))
+        full_text_parts.append(page_result.full_text)
+    tokens = TokenColumns.concat(columns)
+    metadata: Dict = {
+        "pages": len(page_sources),
+        "blank_pages": blank_pages,
+        "page_sources": page_sources,
+        "roi_coverage": roi_coverage,
+    }
+    metadata["avg_confidence"] = tokens.mean_confidence()
+    return OCRResult(tokens=tokens, full_text="\n".join(full_text_parts), metadata=metadata)
+
+
+class ParallelOCREngine:
+    """OCR a sequence of page images with up to `workers` pages in flight.
+
+    `images` may be any iterable, including a generator: the engine pulls the
+    next page only when the submission window has room, so at most
+    `max_pending` pages are queued or running at any time. With `workers == 1`
+    pages are processed inline on the caller's thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        executor: Literal["thread", "process"] = "thread",
+        max_pending: Optional[int] = None,
+        page_timeout_s: float = 0,
+        page_fn: PageFn = run_tesseract,
+        page_cache: Optional[PageOCRCache] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.executor_kind = executor
+        self.max_pending = max(max_pending or 2 * self.workers, self.workers)
+        self.page_timeout_s = page_timeout_s
+        # A partial over a module-level function stays picklable for the
+        # process pool.
+        self._page_fn = partial(page_fn, timeout=page_timeout_s)
+        self.page_cache = page_cache
+        self._pool: Optional[Executor] = None
+        self._pool_lock = Lock()
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: OCRSettings | None = None,
+        page_fn: PageFn = run_tesseract,
+        page_cache: Optional[PageOCRCache] = None,
+    ):
+        ocr = settings or get_settings().ocr
+        return cls(
+            workers=ocr.workers,
+            executor=ocr.executor,
+            max_pending=ocr.max_pending_pages,
+            page_timeout_s=ocr.page_timeout_s,
+            page_fn=page_fn,
+            page_cache=page_cache,
+        )
+
+    def _executor(self) -> Executor:
+        with self._pool_lock:
+            if self._pool is None:
+                if self.executor_kind == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def run(
+        self,
+        images: Iterable,
+        on_page: Optional[Callable[[int], None]] = None,
+        page_fn: Optional[PageFn] = None,
+    ) -> OCRResult:
+        """OCR `images` in order; `on_page(n)` is called once the first n pages are done.
+
+        `page_fn` replaces the engine's per-page function for this run (e.g.
+        region-of-interest OCR). The page cache only holds full-page results,
+        so it is bypassed then.
+        """
+        cache = self.page_cache
+        if page_fn is None:
+            page_fn = self._page_fn
+        else:
+            page_fn, cache = partial(page_fn, timeout=self.page_timeout_s), None
+        if self.workers == 1:
+            # Inline runs create tesserocr handles on the caller's thread;
+            # release those left by callers that have since exited.
+            tesserocr_backend.end_exited()
+            results = self._run_sequential(images, on_page, page_fn, cache)
+        else:
+            results = self._run_parallel(images, on_page, page_fn, cache)
+        return merge_page_results(_count_sources(results))
+
+    def _run_sequential(
+        self,
+        images: Iterable,
+        on_page: Optional[Callable[[int], None]],
+        page_fn: PageFn,
+        cache: Optional[PageOCRCache],
+    ) -> Iterator[OCRResult]:
+        for done, image in enumerate(images, start=1):
+            result = self._ocr_page(image, page_fn, cache)
+            if on_page is not None:
+                on_page(done)
+            yield result
+
+    @staticmethod
+    def _ocr_page(image, page_fn: PageFn, cache: Optional[PageOCRCache]) -> OCRResult:
+        precomputed = _precomputed_result(image)
+        if precomputed is not None:
+            return precomputed
+        if cache is None:
+            return page_fn(image)
+        key = cache.key(image)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        result = page_fn(image)
+        cache.put(key, result)
+        return result
+
+    def _run_parallel(
+        self,
+        images: Iterable,
+        on_page: Optional[Callable[[int], None]],
+        page_fn: PageFn,
+        cache: Optional[PageOCRCache],
+    ) -> List[OCRResult]:
+        pool = self._executor()
+        # Each window slot holds (cache key, future-or-result, shared). Identical
+        # pages already in flight share one future instead of being OCR'd twice;
+        # the sharing slots take a copy of the result's metadata.
+        window: Deque[Tuple[Optional[str], Union[Future, OCRResult], bool]] = deque()
+        in_flight: Dict[str, Future] = {}
+        results: List[OCRResult] = []
+
+        def drain_one() -> None:
+            key, pending, shared = window.popleft()
+            if isinstance(pending, Future):
+                result = pending.result()
+                if shared:
+                    result = copy_ocr_result(result)
+                elif key is not None and in_flight.pop(key, None) is not None:
+                    cache.put(key, result)
+            else:
+                result = pending
+            results.append(result)
+            if on_page is not None:
+                on_page(len(results))
+
+        try:
+            for image in images:
+                if len(window) >= self.max_pending:
+                    drain_one()
+                precomputed = _precomputed_result(image)
+                if precomputed is not None:
+                    window.append((None, precomputed, False))
+                    continue
+                key = cache.key(image) if cache is not None else None
+                if key is not None:
+                    cached = cache.get(key)
+                    if cached is not None:
+                        window.append((key, cached, False))
+                        continue
+                    if key in in_flight:
+                        window.append((key, in_flight[key], True))
+                        continue
+                future = self._submit(pool, page_fn, image)
+                if key is not None:
+                    in_flight[key] = future
+                window.append((key, future, False))
+            while window:
+                drain_one()
+        except BaseException:
+            for _, pending, _ in window:
+                if isinstance(pending, Future):
+                    pending.cancel()
+            raise
+        return results
+
+    def _submit(self, pool: Executor, page_fn: PageFn, image) -> Future:
+        if self.executor_kind == "thread":
+            # Each page runs in its own copy of the caller's context (tracing
+            # spans, stage labels); a Context can't be entered by two threads.
+            return pool.submit(contextvars.copy_context().run, page_fn, image)
+        return pool.submit(page_fn, image)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+        # Only threads that have exited (this pool's workers, now joined, and
+        # finished inline callers): live ones may be mid-Recognize.
+        tesserocr_backend.end_exited()
@@ -1,20 +1,47 @@
 """PDF → preprocessed page image conversion.
 
-All intermediate files live inside a caller-managed `TemporaryDirectory`. The
-previous implementation wrote PNGs into the user's upload directory and never
-cleaned them up; the new version returns paths inside `work_dir` and lets the
-caller decide when to delete them.
+Pages are rendered one at a time (`PageStream`) so peak memory does not grow
+with page count. Pages with a usable embedded text layer are only rendered at
+`text_layer_verify_dpi`, to check the layer accounts for the page's ink. With
+`adaptive_dpi`, each page is first rendered as a small preview, the median
+glyph height on the preview picks the lowest DPI that reaches
+`adaptive_target_glyph_px`, and only then is the page rendered for OCR; blank
+pages are caught on the preview and never rendered at full size. By default
+pages also stay in memory: pdf2image hands over PIL pages, OpenCV works on the
+NumPy view of each one, and the preprocessed grayscale arrays are passed
+straight to OCR. Set `PreprocessConfig.in_memory = False` to fall back to the
+on-disk path, where every intermediate PNG lives inside a caller-managed
+`TemporaryDirectory` and the caller decides when to delete it.
 """
 from __future__ import annotations
 
 import hashlib
+import logging
+import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Union
 
 import cv2
 import numpy as np
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from idp.ocr.tesseract_engine import OCRResult
+from idp.ocr.text_layer import extract_text_layer, is_usable, uncovered_ink_ratio
+from idp.services.metrics import RENDER_DPI
+from idp.services.profiling import stage
+
+logger = logging.getLogger(__name__)
+
+# Ink points kept for projection-profile skew estimation; enough for a stable
+# histogram while keeping each angle sweep to a few milliseconds.
+_SKEW_MAX_POINTS = 10_000
+
+# Adaptive DPI: fewer character-sized components than this on the preview
+# means there is too little text to measure, and the page keeps `dpi`. The
+# chosen DPI is rounded up to a multiple of `_DPI_STEP`.
+_MIN_GLYPHS = 20
+_DPI_STEP = 25
 
 
 @dataclass
@@ -24,37 +51,206 @@ class PreprocessConfig:
     denoise: bool = True
     deskew: bool = True
     max_pages: int | None = None
+    in_memory: bool = True
+    # "min_area_rect" fits a rectangle around every non-white full-resolution
+    # pixel; "projection" estimates the angle on a downsampled binarized copy
+    # and skips the rotation below `deskew_min_angle` degrees.
+    deskew_method: Literal["min_area_rect", "projection"] = "min_area_rect"
+    deskew_sample_px: int = 1024
+    deskew_max_angle: float = 10.0
+    deskew_min_angle: float = 0.25
+    # Born-digital fast path: pages whose embedded text layer has at least
+    # `text_layer_min_words` words, `text_layer_min_alnum_ratio` of them
+    # alphanumeric, skip OCR and are only rendered at low DPI for the check
+    # below.
+    use_text_layer: bool = True
+    text_layer_min_words: int = 5
+    text_layer_min_alnum_ratio: float = 0.6
+    # Hybrid-scan guard: a usable layer is still rejected (and the page OCR'd)
+    # when more than `text_layer_max_uncovered` of the text-sized ink blobs on
+    # a `text_layer_verify_dpi` render lie outside its word boxes.
+    text_layer_verify: bool = True
+    text_layer_verify_dpi: int = 72
+    text_layer_max_uncovered: float = 0.25
+    # Blank-page classifier, run at render resolution before any other step.
+    # Ink is any pixel at least `blank_ink_delta` darker than the paper tone
+    # (the median of a ~`blank_sample_px` subsample). A page is blank when
+    # fewer than `blank_min_glyphs` ink blobs are at least
+    # `blank_min_glyph_pt` points tall: one short line of small print keeps
+    # the page, dust specks and scanner noise do not.
+    skip_blank: bool = True
+    blank_sample_px: int = 512
+    blank_ink_delta: int = 48
+    blank_min_glyphs: int = 4
+    blank_min_glyph_pt: float = 2.5
+    # Adaptive DPI: render a `adaptive_preview_dpi` preview, then render for
+    # OCR at the lowest DPI in [adaptive_min_dpi, adaptive_max_dpi] where the
+    # median glyph height reaches `adaptive_target_glyph_px` (~x-height of
+    # 10pt text at 300 DPI, where Tesseract accuracy levels off). Pages with
+    # too little text to measure keep `dpi`.
+    adaptive_dpi: bool = False
+    adaptive_preview_dpi: int = 100
+    adaptive_min_dpi: int = 150
+    adaptive_max_dpi: int = 400
+    adaptive_target_glyph_px: float = 20.0
+
+
+@dataclass(frozen=True)
+class BlankPage:
+    """Placeholder yielded for a page classified as blank; OCR is skipped."""
+
+    page_num: int
+
+
+@dataclass(frozen=True)
+class TextLayerPage:
+    """A page served from the PDF's embedded text layer; OCR is skipped."""
+
+    page_num: int
+    result: OCRResult
+
+
+# A preprocessed page is a grayscale uint8 array (in-memory mode), the path of
+# a PNG inside `work_dir` (on-disk fallback), or a `BlankPage` /
+# `TextLayerPage` marker.
+PageImage = Union[Path, np.ndarray, BlankPage, TextLayerPage]
 
 
 @dataclass
 class PreprocessResult:
-    images: List[Path]
+    images: List[PageImage]
     metadata: dict
 
 
+class PageStream:
+    """Render and preprocess a PDF one page at a time.
+
+    Iterating yields one `PageImage` per page, rendering each page with its own
+    `first_page`/`last_page` call so only the page being worked on is held in
+    memory, and pages past `PreprocessConfig.max_pages` are never rendered.
+    The document checksum and the DPI each page was rendered at (`page_dpi`;
+    text-layer pages have none) are accumulated as pages go by and are
+    available from `metadata` once iteration finishes.
+    """
+
+    def __init__(self, pdf_path: Path, work_dir: Path, config: PreprocessConfig | None = None) -> None:
+        self.pdf_path = pdf_path
+        self.work_dir = work_dir
+        self.config = config or PreprocessConfig()
+        total = int(pdfinfo_from_path(str(pdf_path))["Pages"])
+        if self.config.max_pages is not None:
+            total = min(total, self.config.max_pages)
+        self.page_count = total
+        self._digest = hashlib.sha256()
+        self._rendered = 0
+        self.blank_pages: List[int] = []
+        self.text_layer_pages: List[int] = []
+        self.page_dpi: Dict[int, int] = {}
+
+    def _rasterize(self, page_num: int, dpi: int) -> np.ndarray:
+        (pil_image,) = convert_from_path(str(self.pdf_path), dpi=dpi, first_page=page_num, last_page=page_num)
+        if pil_image.mode not in ("RGB", "L"):
+            pil_image = pil_image.convert("RGB")
+        return np.asarray(pil_image)
+
+    def _render(self, page_num: int, dpi: int) -> np.ndarray:
+        page = self._rasterize(page_num, dpi)
+        self.page_dpi[page_num] = dpi
+        return page
+
+    def _layer_explains_page(self, page_num: int, layer: OCRResult) -> bool:
+        cfg = self.config
+        if not cfg.text_layer_verify:
+            return True
+        with stage("text_layer_verify", per_page=True):
+            preview = self._rasterize(page_num, cfg.text_layer_verify_dpi)
+            uncovered = uncovered_ink_ratio(
+                layer, preview, cfg.text_layer_verify_dpi / cfg.dpi, ink_delta=cfg.blank_ink_delta
+            )
+        if uncovered > cfg.text_layer_max_uncovered:
+            logger.info(
+                "page %d: %.0f%% of the ink is outside the text layer, OCR'ing it", page_num, 100 * uncovered
+            )
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[PageImage]:
+        cfg = self.config
+        if not cfg.in_memory:
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+        text_layer = {}
+        if cfg.use_text_layer and self.page_count:
+            with stage("text_layer"):
+                text_layer = extract_text_layer(self.pdf_path, cfg.dpi, 1, self.page_count)
+        for page_num in range(1, self.page_count + 1):
+            layer = text_layer.get(page_num)
+            if (
+                layer is not None
+                and is_usable(layer, cfg.text_layer_min_words, cfg.text_layer_min_alnum_ratio)
+                and self._layer_explains_page(page_num, layer)
+            ):
+                self._digest.update(b"text:" + layer.full_text.encode())
+                self._rendered += 1
+                self.text_layer_pages.append(page_num)
+                yield TextLayerPage(page_num, layer)
+                continue
+            dpi = cfg.dpi
+            if cfg.adaptive_dpi:
+                with stage("preview", per_page=True):
+                    page = self._render(page_num, cfg.adaptive_preview_dpi)
+                with stage("choose_dpi", per_page=True):
+                    dpi = choose_dpi(page, cfg)
+            else:
+                with stage("render", per_page=True):
+                    page = self._render(page_num, dpi)
+            self._rendered += 1
+            with stage("blank_check", per_page=True):
+                blank = cfg.skip_blank and is_blank_page(page, cfg, self.page_dpi[page_num])
+            if blank:
+                self._digest.update(b"blank")
+                self.blank_pages.append(page_num)
+                yield BlankPage(page_num)
+                continue
+            if cfg.adaptive_dpi:
+                del page
+                with stage("render", per_page=True):
+                    page = self._render(page_num, dpi)
+            RENDER_DPI.observe(dpi)
+            gray = preprocess_array(page, cfg)
+            del page
+            _update_digest(self._digest, gray)
+            if cfg.in_memory:
+                yield gray
+            else:
+                out_path = self.work_dir / f"{self.pdf_path.stem}_page{page_num - 1}.png"
+                cv2.imwrite(str(out_path), gray)
+                yield out_path
+
+    @property
+    def metadata(self) -> dict:
+        return {
+            "page_count": self._rendered,
+            "checksum": self._digest.hexdigest(),
+            "blank_pages": list(self.blank_pages),
+            "text_layer_pages": list(self.text_layer_pages),
+            "page_dpi": dict(self.page_dpi),
+        }
+
+
 def preprocess_pdf(
     pdf_path: Path,
     work_dir: Path,
     config: PreprocessConfig | None = None,
 ) -> PreprocessResult:
-    """Render every page of `pdf_path` to a preprocessed PNG inside `work_dir`."""
-    cfg = config or PreprocessConfig()
-    work_dir.mkdir(parents=True, exist_ok=True)
-    pages = convert_from_path(str(pdf_path), dpi=cfg.dpi)
-
-    image_paths: List[Path] = []
-    for idx, pil_image in enumerate(pages):
-        if cfg.max_pages is not None and idx >= cfg.max_pages:
-            break
-        out_path = work_dir / f"{pdf_path.stem}_page{idx}.png"
-        pil_image.save(out_path, format="PNG")
-        preprocess_image(out_path, cfg)
-        image_paths.append(out_path)
-
-    return PreprocessResult(
-        images=image_paths,
-        metadata={"page_count": len(image_paths), "checksum": checksum(image_paths)},
-    )
+    """Render and preprocess every page of `pdf_path`.
+
+    In-memory mode returns grayscale arrays; otherwise each page is written as
+    a PNG inside `work_dir` and its path is returned. Use `PageStream` directly
+    to process pages without materialising the whole document.
+    """
+    stream = PageStream(pdf_path, work_dir, config)
+    images: List[PageImage] = list(stream)
+    return PreprocessResult(images=images, metadata=stream.metadata)
 
 
 def preprocess_image(image_path: Path, config: PreprocessConfig) -> Path:
@@ -62,44 +258,183 @@ def preprocess_image(image_path: Path, config: PreprocessConfig) -> Path:
     image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
     if image is None:
         raise FileNotFoundError(image_path)
+    gray = preprocess_array(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), config)
+    cv2.imwrite(str(image_path), gray)
+    return image_path
+
+
+def is_blank_page(image: np.ndarray, config: PreprocessConfig, dpi: int | None = None) -> bool:
+    """Pre-OCR check on a raw RGB/grayscale page rendered at `dpi` (default `config.dpi`).
+
+    Counts glyph-sized ink blobs at full resolution, because downsampling
+    washes out a line of small print. Only bands of rows that contain ink
+    are labelled, and the first text line usually settles it.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    step = max(1, -(-max(gray.shape) // config.blank_sample_px))
+    paper = int(np.median(gray[::step, ::step]))
+    if paper - config.blank_ink_delta <= 0:
+        return False  # dark page: nothing reads as ink against it, so let OCR decide
+    _, ink = cv2.threshold(gray, paper - config.blank_ink_delta - 1, 1, cv2.THRESH_BINARY_INV)
+    rows = np.flatnonzero(ink.max(axis=1))
+    if rows.size == 0:
+        return True
+    min_height = max(2, round(config.blank_min_glyph_pt / 72 * (dpi or config.dpi)))
+    breaks = np.flatnonzero(np.diff(rows) > 1)
+    tops, bottoms = rows[np.r_[0, breaks + 1]], rows[np.r_[breaks, rows.size - 1]] + 1
+    glyphs = 0
+    for top, bottom in zip(tops.tolist(), bottoms.tolist()):
+        if bottom - top < min_height:
+            continue
+        _, _, stats, _ = cv2.connectedComponentsWithStats(ink[top:bottom], connectivity=8)
+        glyphs += int(np.count_nonzero(stats[1:, cv2.CC_STAT_HEIGHT] >= min_height))
+        if glyphs >= config.blank_min_glyphs:
+            return False
+    return True
+
+
+def estimate_glyph_height(image: np.ndarray) -> Optional[float]:
+    """Median height in pixels of the character-sized ink blobs on a page.
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    Works on a low-DPI preview: neighbouring glyphs that merge into one blob
+    keep their height. Specks, rules and blobs taller than a twentieth of the
+    page are ignored. Returns None when too few glyphs remain to trust.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    keep = (heights >= 3) & (heights <= gray.shape[0] // 20) & (widths <= 15 * heights)
+    if np.count_nonzero(keep) < _MIN_GLYPHS:
+        return None
+    return float(np.median(heights[keep]))
+
+
+def choose_dpi(preview: np.ndarray, config: PreprocessConfig) -> int:
+    """Lowest DPI (within the configured bounds) at which glyphs reach the target height."""
+    glyph_px = estimate_glyph_height(preview)
+    if glyph_px is None:
+        return config.dpi
+    dpi = config.adaptive_target_glyph_px * config.adaptive_preview_dpi / glyph_px
+    dpi = int(math.ceil(dpi / _DPI_STEP) * _DPI_STEP)
+    return max(config.adaptive_min_dpi, min(config.adaptive_max_dpi, dpi))
+
+
+def preprocess_array(image: np.ndarray, config: PreprocessConfig) -> np.ndarray:
+    """Preprocess an RGB or grayscale page array, returning a grayscale uint8 array."""
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
     if config.denoise:
-        gray = cv2.medianBlur(gray, 3)
+        with stage("denoise", per_page=True):
+            gray = cv2.medianBlur(gray, 3)
     if config.deskew:
-        gray = _deskew(gray)
+        with stage("deskew", per_page=True):
+            if config.deskew_method == "projection":
+                gray = _deskew_projection(gray, config)
+            else:
+                gray = _deskew(gray)
     if config.binarize:
-        gray = cv2.adaptiveThreshold(
-            gray,
-            maxValue=255,
-            adaptiveMethod=cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            thresholdType=cv2.THRESH_BINARY,
-            blockSize=31,
-            C=5,
-        )
-
-    cv2.imwrite(str(image_path), gray)
-    return image_path
+        with stage("threshold", per_page=True):
+            gray = cv2.adaptiveThreshold(
+                gray,
+                maxValue=255,
+                adaptiveMethod=cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                thresholdType=cv2.THRESH_BINARY,
+                blockSize=31,
+                C=5,
+            )
+    return gray
 
 
 def _deskew(gray: np.ndarray) -> np.ndarray:
+    skew = estimate_skew_min_area_rect(gray)
+    if skew is None:
+        return gray
+    return _rotate(gray, -skew)
+
+
+def estimate_skew_min_area_rect(gray: np.ndarray) -> float | None:
+    """Skew in degrees from the min-area rectangle around every non-white pixel."""
     coords = np.column_stack(np.where(gray < 255))
     if coords.size == 0:
-        return gray
+        return None
     rect = cv2.minAreaRect(coords)
     angle = rect[-1]
     if angle < -45:
         angle = -(90 + angle)
     else:
         angle = -angle
+    return -angle
+
+
+def _rotate(gray: np.ndarray, angle: float) -> np.ndarray:
     h, w = gray.shape[:2]
-    center = (w // 2, h // 2)
-    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
     return cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
 
 
+def _deskew_projection(gray: np.ndarray, config: PreprocessConfig) -> np.ndarray:
+    angle = estimate_skew_projection(gray, config)
+    if abs(angle) < config.deskew_min_angle:
+        return gray
+    return _rotate(gray, -angle)
+
+
+def estimate_skew_projection(gray: np.ndarray, config: PreprocessConfig) -> float:
+    """Estimate text skew in degrees (cv2 rotation convention) from projection profiles.
+
+    Works on a downsampled, Otsu-binarized copy: the ink pixel coordinates are
+    projected onto the page's vertical axis at each candidate angle, and the
+    angle whose row histogram is sharpest (largest sum of squares, i.e. text
+    lines collapse into narrow peaks) wins. A coarse sweep over
+    ±`deskew_max_angle` is refined around the best candidate.
+    """
+    h, w = gray.shape[:2]
+    scale = min(1.0, config.deskew_sample_px / max(h, w))
+    small = gray
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    ys, xs = np.nonzero(ink)
+    if ys.size < 32:
+        return 0.0
+    if ys.size > _SKEW_MAX_POINTS:
+        step = ys.size // _SKEW_MAX_POINTS + 1
+        ys, xs = ys[::step], xs[::step]
+    xs = xs.astype(np.float64) - small.shape[1] / 2
+    ys = ys.astype(np.float64) - small.shape[0] / 2
+
+    def sharpness(angles: np.ndarray) -> np.ndarray:
+        theta = np.deg2rad(angles)[:, None]
+        rows = np.rint(np.sin(theta) * xs + np.cos(theta) * ys).astype(np.int64)
+        rows -= rows.min(axis=1, keepdims=True)
+        width = int(rows.max()) + 1
+        offsets = (np.arange(len(angles)) * width)[:, None]
+        hist = np.bincount((rows + offsets).ravel(), minlength=width * len(angles))
+        return (hist.reshape(len(angles), width).astype(np.float64) ** 2).sum(axis=1)
+
+    max_angle = config.deskew_max_angle
+    coarse = np.arange(-max_angle, max_angle + 1e-9, 0.5)
+    best = float(coarse[np.argmax(sharpness(coarse))])
+    fine = np.arange(best - 0.5, best + 0.5 + 1e-9, 0.05)
+    return float(fine[np.argmax(sharpness(fine))])
+
+
 def checksum(paths: Iterable[Path]) -> str:
     digest = hashlib.sha256()
     for path in sorted(paths):
         digest.update(Path(path).read_bytes())
     return digest.hexdigest()
+
+
+def checksum_arrays(arrays: Iterable[np.ndarray]) -> str:
+    """Digest of preprocessed page pixels, in page order, without touching disk."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        _update_digest(digest, array)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, array: np.ndarray) -> None:
+    digest.update(repr(array.shape).encode())
+    digest.update(np.ascontiguousarray(array).data)
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import json
+import subprocess
+from collections.abc import Sequence as SequenceABC
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Sequence, Union, overload
 
+import numpy as np
 import pytesseract
 from pytesseract import Output
 
 from idp.config import get_settings
+from idp.config.settings import OCRSettings
+from idp.ocr import tesserocr_backend
+from idp.services.profiling import stage
 
 
 @dataclass
@@ -19,51 +26,265 @@ class OCRToken:
     page_num: int
 
 
+class TokenColumns(SequenceABC):
+    """Struct-of-arrays storage for a result's tokens.
+
+    A dense 100-page scan has hundreds of thousands of words. As `OCRToken`
+    objects each one is a dataclass plus a bbox tuple for the garbage
+    collector to track. Here a result holds one text buffer with
+    `(start, end)` offsets per word and NumPy arrays for boxes, confidences
+    and page numbers. The arrays are read-only: renumbering pages or
+    shifting boxes builds new columns instead of mutating shared ones, so
+    cached results can be handed out without copying.
+
+    It is a `Sequence[OCRToken]`. Indexing or iterating builds `OCRToken`
+    views on demand, so code written against token lists keeps working.
+    Setting attributes on a view does not change the columns.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        offsets: np.ndarray,
+        bboxes: np.ndarray,
+        confidences: np.ndarray,
+        page_nums: np.ndarray,
+    ) -> None:
+        self.text = text
+        self.offsets = _frozen(offsets, np.int64, (-1, 2))
+        self.bboxes = _frozen(bboxes, np.int32, (-1, 4))
+        self.confidences = _frozen(confidences, np.float64, (-1,))
+        self.page_nums = _frozen(page_nums, np.int32, (-1,))
+
+    @classmethod
+    def from_words(
+        cls, words: Sequence[str], bboxes: np.ndarray, confidences: np.ndarray, page_nums: np.ndarray
+    ) -> "TokenColumns":
+        """Columns for `words`, stored as `" ".join(words)` plus offsets."""
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        ends = np.cumsum(lengths + 1) - 1
+        return cls(" ".join(words), np.stack([ends - lengths, ends], axis=1), bboxes, confidences, page_nums)
+
+    @classmethod
+    def from_tokens(cls, tokens: Sequence[OCRToken]) -> "TokenColumns":
+        return cls.from_words(
+            [t.text for t in tokens],
+            np.array([t.bbox for t in tokens], dtype=np.int32).reshape(-1, 4),
+            np.array([t.confidence for t in tokens], dtype=np.float64),
+            np.array([t.page_num for t in tokens], dtype=np.int32),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["TokenColumns"]) -> "TokenColumns":
+        """One set of columns holding `parts` in order; the text buffers are joined with spaces."""
+        if not parts:
+            return EMPTY_TOKENS
+        shifts = np.cumsum([0] + [len(part.text) + 1 for part in parts[:-1]])
+        return cls(
+            " ".join(part.text for part in parts),
+            np.concatenate([part.offsets + shift for part, shift in zip(parts, shifts)]),
+            np.concatenate([part.bboxes for part in parts]),
+            np.concatenate([part.confidences for part in parts]),
+            np.concatenate([part.page_nums for part in parts]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidences)
+
+    @overload
+    def __getitem__(self, index: int) -> OCRToken: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "TokenColumns": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TokenColumns(
+                self.text, self.offsets[index], self.bboxes[index], self.confidences[index], self.page_nums[index]
+            )
+        start, end = self.offsets[index]
+        return OCRToken(
+            text=self.text[start:end],
+            confidence=float(self.confidences[index]),
+            bbox=tuple(self.bboxes[index].tolist()),
+            page_num=int(self.page_nums[index]),
+        )
+
+    def __iter__(self) -> Iterator[OCRToken]:
+        text = self.text
+        for (start, end), conf, bbox, page_num in zip(
+            self.offsets.tolist(), self.confidences.tolist(), self.bboxes.tolist(), self.page_nums.tolist()
+        ):
+            yield OCRToken(text=text[start:end], confidence=conf, bbox=tuple(bbox), page_num=page_num)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TokenColumns):
+            return (
+                self.texts() == other.texts()
+                and np.array_equal(self.bboxes, other.bboxes)
+                and np.array_equal(self.confidences, other.confidences)
+                and np.array_equal(self.page_nums, other.page_nums)
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TokenColumns({len(self)} tokens)"
+
+    def texts(self) -> List[str]:
+        text = self.text
+        return [text[start:end] for start, end in self.offsets.tolist()]
+
+    def mean_confidence(self) -> float:
+        return float(self.confidences.mean()) if len(self) else 0.0
+
+    def with_page(self, page_num: int) -> "TokenColumns":
+        """The same tokens, all on `page_num`; only the page column is new."""
+        pages = np.full(len(self), page_num, dtype=np.int32)
+        return TokenColumns(self.text, self.offsets, self.bboxes, self.confidences, pages)
+
+    def shifted(self, dx: int, dy: int) -> "TokenColumns":
+        """The same tokens with every box moved by `(dx, dy)`."""
+        shift = np.array([dx, dy, dx, dy], dtype=np.int32)
+        return TokenColumns(self.text, self.offsets, self.bboxes + shift, self.confidences, self.page_nums)
+
+
+def _frozen(values, dtype, shape: tuple) -> np.ndarray:
+    array = np.asarray(values, dtype=dtype).reshape(shape)
+    array.flags.writeable = False
+    return array
+
+
+EMPTY_TOKENS = TokenColumns("", np.empty((0, 2)), np.empty((0, 4)), np.empty(0), np.empty(0))
+
+
+def as_columns(tokens: Sequence[OCRToken]) -> TokenColumns:
+    """`tokens` as `TokenColumns`, converting a plain token list if needed."""
+    return tokens if isinstance(tokens, TokenColumns) else TokenColumns.from_tokens(tokens)
+
+
 @dataclass
 class OCRResult:
-    tokens: List[OCRToken]
+    # `TokenColumns` from every producer in this package; plain lists of
+    # `OCRToken` are still accepted wherever results are consumed.
+    tokens: Sequence[OCRToken]
     full_text: str
     metadata: Dict
 
 
-def run_tesseract(image_path: Path, lang: str | None = None) -> OCRResult:
+class OCRTimeoutError(TimeoutError):
+    """Raised when a single page exceeds `OCRSettings.page_timeout_s`."""
+
+
+def engine_fingerprint(ocr: OCRSettings) -> str:
+    """Identity of the engine `run_tesseract` uses under `ocr`.
+
+    Backend, binary (or tessdata dir), tesseract version and languages: the
+    things that change the tokens for the same pixels. Cached OCR output is
+    only reused under the same fingerprint.
+    """
+    source = ocr.tessdata_path if ocr.backend == "tesserocr" else ocr.tesseract_cmd
+    version = _engine_version(ocr.backend, ocr.tesseract_cmd)
+    return "|".join([ocr.backend, str(source), version, "+".join(ocr.languages)])
+
+
+@lru_cache(maxsize=8)
+def _engine_version(backend: str, tesseract_cmd: str) -> str:
+    try:
+        if backend == "tesserocr":
+            return tesserocr_backend.version()
+        out = subprocess.run([tesseract_cmd, "--version"], capture_output=True, text=True, timeout=30)
+    except (OSError, ImportError, subprocess.SubprocessError):
+        return "unknown"
+    # Older releases print the version to stderr.
+    lines = (out.stdout or out.stderr).splitlines()
+    return lines[0].strip() if lines else "unknown"
+
+
+def run_tesseract(
+    image: Union[Path, str, np.ndarray], lang: str | None = None, timeout: float | None = None
+) -> OCRResult:
+    """OCR one page given as an image path or an in-memory grayscale/RGB array.
+
+    `OCRSettings.backend` picks the engine: "pytesseract" runs the tesseract
+    CLI per page, "tesserocr" reuses an in-process API handle per thread.
+    Both produce identical tokens.
+    """
+    with stage("tesseract", per_page=True):
+        return _run_tesseract(image, lang, timeout)
+
+
+def _run_tesseract(image: Union[Path, str, np.ndarray], lang: str | None, timeout: float | None) -> OCRResult:
     settings = get_settings()
-    pytesseract.pytesseract.tesseract_cmd = settings.ocr.tesseract_cmd
     lang = lang or "+".join(settings.ocr.languages)
-    data = pytesseract.image_to_data(str(image_path), lang=lang, output_type=Output.DICT)
-    tokens: List[OCRToken] = []
-    text_parts: List[str] = []
-    for i in range(len(data["text"])):
-        word = data["text"][i].strip()
-        if not word:
-            continue
-        conf = float(data["conf"][i]) / 100.0
-        bbox = (
-            int(data["left"][i]),
-            int(data["top"][i]),
-            int(data["left"][i] + data["width"][i]),
-            int(data["top"][i] + data["height"][i]),
+    if timeout is None:
+        timeout = settings.ocr.page_timeout_s
+    source = image if isinstance(image, (str, Path)) else "in-memory page"
+    if settings.ocr.backend == "tesserocr":
+        try:
+            data = tesserocr_backend.image_to_data(
+                image, lang=lang, timeout=timeout, tessdata_path=settings.ocr.tessdata_path
+            )
+        except TimeoutError as exc:
+            raise OCRTimeoutError(f"OCR of {source} exceeded {timeout}s") from exc
+        return result_from_data(data)
+
+    pytesseract.pytesseract.tesseract_cmd = settings.ocr.tesseract_cmd
+    try:
+        # pytesseract kills the tesseract child once `timeout` elapses, so a
+        # stuck page never pins an OCR worker. 0 disables the limit.
+        data = pytesseract.image_to_data(
+            str(image) if isinstance(image, (str, Path)) else image,
+            lang=lang,
+            output_type=Output.DICT,
+            timeout=timeout,
         )
-        page_num = int(data.get("page_num", [1] * len(data["text"]))[i])
-        tokens.append(OCRToken(text=word, confidence=conf, bbox=bbox, page_num=page_num))
-        text_parts.append(word)
+    except RuntimeError as exc:
+        if "timeout" in str(exc).lower():
+            raise OCRTimeoutError(f"OCR of {source} exceeded {timeout}s") from exc
+        raise
+    return result_from_data(data)
+
+
+def result_from_data(data: Dict[str, list]) -> OCRResult:
+    """Build an `OCRResult` from `image_to_data`-style column lists.
+
+    The columns are converted with NumPy in one pass; only the word strings
+    are handled one by one. `full_text` is the token text buffer itself.
+    """
+    words = [word.strip() for word in data["text"]]
+    keep = np.fromiter((bool(word) for word in words), dtype=bool, count=len(words))
+    left, top, width, height = (
+        np.asarray(data[key], dtype=np.int64)[keep] for key in ("left", "top", "width", "height")
+    )
+    page_nums = np.asarray(data["page_num"], dtype=np.int32)[keep] if "page_num" in data else np.ones(len(left))
+    tokens = TokenColumns.from_words(
+        [word for word in words if word],
+        np.stack([left, top, left + width, top + height], axis=1),
+        np.asarray(data["conf"], dtype=np.float64)[keep] / 100.0,
+        page_nums,
+    )
     metadata = {
-        "avg_confidence": sum(t.confidence for t in tokens) / max(len(tokens), 1),
+        "avg_confidence": tokens.mean_confidence(),
         "token_count": len(tokens),
     }
-    return OCRResult(tokens=tokens, full_text=" ".join(text_parts), metadata=metadata)
+    return OCRResult(tokens=tokens, full_text=tokens.text, metadata=metadata)
 
 
 def serialize_ocr_result(result: OCRResult, output_path: Path) -> None:
+    tokens = as_columns(result.tokens)
     payload = {
         "tokens": [
             {
-                "text": t.text,
-                "confidence": t.confidence,
-                "bbox": t.bbox,
-                "page_num": t.page_num,
+                "text": text,
+                "confidence": conf,
+                "bbox": bbox,
+                "page_num": page_num,
             }
-            for t in result.tokens
+            for text, conf, bbox, page_num in zip(
+                tokens.texts(), tokens.confidences.tolist(), tokens.bboxes.tolist(), tokens.page_nums.tolist()
+            )
         ],
         "full_text": result.full_text,
         "metadata": result.metadata,
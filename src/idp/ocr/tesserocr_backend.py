@@ -0,0 +1,132 @@
+"""In-process Tesseract backend built on tesserocr.
+
+`pytesseract` forks a `tesseract` process per page, which reloads the language
+model every time and exchanges the image and results through temp files. This
+backend keeps one long-lived `PyTessBaseAPI` handle per worker thread and
+language set, so models are loaded once per thread and pages are handed over
+as in-memory images.
+
+A handle is only ever used by the thread that created it, so once that
+thread has exited its handles can be ended safely. `end_exited` does that for
+every such thread: `ParallelOCREngine` calls it on `close` (after its pool
+threads are joined) and before each inline `workers=1` run, which covers the
+admission, job and batch threads that OCR inline and are gone once their
+executors shut down. `end_all` ends every handle in the process and is only
+safe when no thread can be OCR'ing, e.g. at process exit or between tests.
+
+Results go through the same TSV renderer and the same `file_to_dict` parser
+that `pytesseract.image_to_data` uses, so the `OCRToken`s are identical to the
+subprocess path. tesserocr is optional: install it with the `tesserocr` extra.
+"""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+from PIL import Image
+from pytesseract.pytesseract import file_to_dict
+
+try:  # pragma: no cover - exercised only where tesserocr is installed
+    import tesserocr
+except ImportError:  # pragma: no cover
+    tesserocr = None
+
+# Header of tesseract's TSV renderer; `GetTSVText` returns the rows only.
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+_local = threading.local()
+_registry: Dict[threading.Thread, List] = {}
+_registry_lock = threading.Lock()
+_generation = 0
+
+
+def available() -> bool:
+    return tesserocr is not None
+
+
+def version() -> str:
+    """First line of the linked tesseract library's version string."""
+    if tesserocr is None:
+        raise ImportError("tesserocr is not installed")
+    return tesserocr.tesseract_version().splitlines()[0].strip()
+
+
+def _api(lang: str, tessdata_path: str | None):
+    if tesserocr is None:
+        raise ImportError(
+            "OCRSettings.backend='tesserocr' requires the tesserocr package "
+            "(pip install 'intelligent-document-understanding[tesserocr]')"
+        )
+    if getattr(_local, "generation", None) != _generation:
+        _local.generation = _generation
+        _local.apis = {}
+    apis: Dict = _local.apis
+    api = apis.get(lang)
+    if api is None:
+        kwargs = {"lang": lang}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        apis[lang] = api
+        with _registry_lock:
+            _registry.setdefault(threading.current_thread(), []).append(api)
+    return api
+
+
+def image_to_data(
+    image: Union[Path, str, np.ndarray, Image.Image],
+    lang: str,
+    timeout: float = 0,
+    tessdata_path: str | None = None,
+) -> Dict[str, list]:
+    """Drop-in for `pytesseract.image_to_data(..., output_type=Output.DICT)`.
+
+    Raises `TimeoutError` when recognition takes longer than `timeout` seconds
+    (0 disables the limit).
+    """
+    if isinstance(image, (str, Path)):
+        pil_image = Image.open(image)
+    elif isinstance(image, np.ndarray):
+        pil_image = Image.fromarray(image)
+    else:
+        pil_image = image
+
+    api = _api(lang, tessdata_path)
+    api.SetImage(pil_image)
+    if not api.Recognize(int(timeout * 1000)):
+        api.Clear()
+        raise TimeoutError(f"tesseract recognition exceeded {timeout}s")
+    tsv = api.GetTSVText(0)
+    api.Clear()
+    return file_to_dict(f"{TSV_HEADER}\n{tsv}", "\t", -1)
+
+
+def end_threads(threads: Iterable[threading.Thread]) -> None:
+    """Release the API handles created by `threads`, which must have exited."""
+    with _registry_lock:
+        apis = [api for thread in threads for api in _registry.pop(thread, ())]
+    for api in apis:
+        api.End()
+
+
+def end_exited() -> None:
+    """Release the API handles of every thread that has exited since creating them."""
+    with _registry_lock:
+        exited = [thread for thread in _registry if not thread.is_alive()]
+    end_threads(exited)
+
+
+def end_all() -> None:
+    """Release every API handle in the process; live threads lazily create fresh ones.
+
+    Ends handles other threads may be using, so call it only when none is OCR'ing.
+    """
+    global _generation
+    with _registry_lock:
+        _generation += 1
+        apis = [api for owned in _registry.values() for api in owned]
+        _registry.clear()
+    for api in apis:
+        api.End()
@@ -0,0 +1,124 @@
+"""Spatial index over OCR token boxes.
+
+Linking a label to its value means asking, for one token, which tokens sit
+to its right on the same line or directly beneath it. Comparing every token
+with every other one is O(n²) per page, which hurts on dense pages (tables,
+terms and conditions) with thousands of words.
+
+`TokenGrid` buckets one page's tokens into square cells about two text lines
+tall. A query only visits the cells along its row (or column), in order, and
+yields neighbours nearest first, so a caller that stops at the first useful
+token touches a handful of cells whatever the page size. `TokenIndex` holds
+one grid per page of an `OCRResult`, plus a lookup from normalised word to
+tokens for finding labels without a scan.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from idp.ocr.tesseract_engine import OCRToken
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+def normalize_word(text: str) -> str:
+    """Lowercase and drop the trailing/leading ":" and "." OCR leaves on labels."""
+    return text.lower().strip(":.")
+
+
+class TokenGrid:
+    """Uniform grid over the tokens of a single page.
+
+    `cell` defaults to twice the median token height. Each token is stored in
+    every cell its box overlaps.
+    """
+
+    def __init__(self, tokens: Sequence[OCRToken], cell: Optional[int] = None) -> None:
+        self.tokens = list(tokens)
+        if cell is None:
+            heights = sorted(t.bbox[3] - t.bbox[1] for t in self.tokens)
+            cell = 2 * heights[len(heights) // 2] if heights else 32
+        self.cell = max(4, int(cell))
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self.cols = self.rows = 0
+        for i, token in enumerate(self.tokens):
+            x0, y0, x1, y1 = token.bbox
+            c0, r0, c1, r1 = self._span(x0, y0, x1, y1)
+            self.cols, self.rows = max(self.cols, c1 + 1), max(self.rows, r1 + 1)
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    self._cells.setdefault((c, r), []).append(i)
+
+    def _span(self, x0: int, y0: int, x1: int, y1: int) -> Box:
+        cell = self.cell
+        return x0 // cell, y0 // cell, max(x0, x1 - 1) // cell, max(y0, y1 - 1) // cell
+
+    def right_of(self, box: Box, max_gap: Optional[int] = None) -> Iterator[OCRToken]:
+        """Tokens on the same line as `box` and to its right, nearest first.
+
+        Same line means the boxes overlap vertically by at least half the
+        shorter height. A token may start a quarter of `box`'s height before
+        its right edge, as touching OCR boxes often do.
+        """
+        x0, y0, x1, y1 = box
+        start = max(x0 + 1, x1 - (y1 - y0) // 4)
+        stop = x1 + max_gap if max_gap is not None else None
+        r0, r1 = self._span(x0, y0, x1, y1)[1::2]
+        for c in range(max(0, start // self.cell), self.cols):
+            if stop is not None and c * self.cell > stop:
+                return
+            found = {
+                i
+                for r in range(r0, r1 + 1)
+                for i in self._cells.get((c, r), ())
+                if self.tokens[i].bbox[0] // self.cell == c
+            }
+            hits = []
+            for i in found:
+                tx0, ty0, _, ty1 = self.tokens[i].bbox
+                overlap = min(y1, ty1) - max(y0, ty0)
+                if tx0 >= start and (stop is None or tx0 <= stop) and 2 * overlap >= min(y1 - y0, ty1 - ty0):
+                    hits.append((tx0, i))
+            for _, i in sorted(hits):
+                yield self.tokens[i]
+
+    def below(self, box: Box, max_gap: Optional[int] = None) -> Iterator[OCRToken]:
+        """Tokens directly beneath `box` (overlapping its x-span), nearest first."""
+        x0, y0, x1, y1 = box
+        start = max(y0 + 1, y1 - (y1 - y0) // 4)
+        stop = y1 + max_gap if max_gap is not None else None
+        c0, c1 = self._span(x0, y0, x1, y1)[0::2]
+        for r in range(max(0, start // self.cell), self.rows):
+            if stop is not None and r * self.cell > stop:
+                return
+            found = {
+                i
+                for c in range(c0, c1 + 1)
+                for i in self._cells.get((c, r), ())
+                if self.tokens[i].bbox[1] // self.cell == r
+            }
+            hits = []
+            for i in found:
+                tx0, ty0, tx1, _ = self.tokens[i].bbox
+                if ty0 >= start and (stop is None or ty0 <= stop) and min(x1, tx1) > max(x0, tx0):
+                    hits.append((ty0, tx0, i))
+            for *_, i in sorted(hits):
+                yield self.tokens[i]
+
+
+class TokenIndex:
+    """Per-page `TokenGrid`s and a word lookup for a document's tokens."""
+
+    def __init__(self, tokens: Sequence[OCRToken]) -> None:
+        by_page: Dict[int, List[OCRToken]] = {}
+        self.words: Dict[str, List[OCRToken]] = {}
+        for token in tokens:
+            by_page.setdefault(token.page_num, []).append(token)
+            self.words.setdefault(normalize_word(token.text), []).append(token)
+        self.pages = {page: TokenGrid(page_tokens) for page, page_tokens in by_page.items()}
+
+    def right_of(self, token: OCRToken, max_gap: Optional[int] = None) -> Iterator[OCRToken]:
+        return self.pages[token.page_num].right_of(token.bbox, max_gap)
+
+    def below(self, token: OCRToken, max_gap: Optional[int] = None) -> Iterator[OCRToken]:
+        return self.pages[token.page_num].below(token.bbox, max_gap)
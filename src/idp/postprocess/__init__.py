@@ -1,3 +1,3 @@
-from . import analytics, normalizers, validators
+from . import analytics, normalizers, partitions, validators
 
-__all__ = ["analytics", "normalizers", "validators"]
+__all__ = ["analytics", "normalizers", "partitions", "validators"]
@@ -4,19 +4,74 @@ A single connection is opened per process via `get_connection()`; the schema
 is created once at startup with `init_schema()`. The previous implementation
 opened a fresh connection (and re-ran CREATE TABLE) on every request, which
 serialized concurrent extractions behind DuckDB's file lock.
+
+Rows are written by a background `AnalyticsWriter`: `persist_run` only
+appends to an in-memory ring buffer, and a writer thread inserts the buffer
+in bulk once `write_batch_rows` rows are waiting (or the buffer is full, if
+it is smaller) or `write_flush_interval_s` has passed. `close_connection()` drains the buffer before closing, so a clean
+shutdown loses nothing; rows still buffered when the process dies are lost.
+`StorageSettings.write_mode = "sync"` restores the per-request insert.
+
+`top_failures` is served from `FailureCounts`, per-field counters, instead
+of a `GROUP BY` over the whole table per request. The `field_failures`
+summary table is updated in the same transaction as every insert and seeds
+the counters at startup; it is rebuilt from `extractions` once if it is
+empty while the fact table is not. The counters are bumped right after that
+transaction commits, so rows dropped on the way (buffer overflow, a failed
+flush, an unreachable writer) count in neither, and the two never diverge.
+
+`maintain_storage` rolls rows older than `hot_days` into daily Parquet
+partitions (see `idp.postprocess.partitions`); query `extractions_all` to see
+live and archived rows together.
+
+With several API processes, only the writer process started by
+`idp.serve` (`run_writer`) opens the database; `persist_run` and
+`aggregate_failures` in the workers go to it over the socket described in
+`idp.postprocess.analytics_ipc`.
 """
 from __future__ import annotations
 
+import logging
+import os
+import signal
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
 from pathlib import Path
-from threading import Lock
-from typing import Dict, Optional
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 import duckdb
 
 from idp.config import get_settings
+from idp.postprocess import partitions
+from idp.postprocess.analytics_ipc import WRITER_ENV, AnalyticsClient, AnalyticsServer, writer_address
+from idp.services.metrics import ANALYTICS_BUFFERED_ROWS, ANALYTICS_ROWS_DROPPED
+from idp.utils.logging import configure_logging
+
+try:  # pragma: no cover - exercised only where pyarrow is installed
+    import pyarrow
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
 
 _conn: Optional[duckdb.DuckDBPyConnection] = None
 _lock = Lock()
+_writer: Optional["AnalyticsWriter"] = None
+_writer_lock = Lock()
+_failures: Optional["FailureCounts"] = None
+_failures_lock = Lock()
+_client: Optional[AnalyticsClient] = None
+_client_lock = Lock()
+_maintenance_stop: Optional[Event] = None
+_maintenance_thread: Optional[Thread] = None
+
+_COLUMNS = ("request_id", "doc_type", "field_name", "value", "confidence", "valid", "created_at")
+# Rows per multi-row INSERT when pyarrow is unavailable (7 parameters each).
+_VALUES_CHUNK = 500
+
+Row = Tuple[str, str, str, str, float, bool, datetime]
 
 _SCHEMA = """
 CREATE TABLE IF NOT EXISTS extractions (
@@ -26,7 +81,14 @@ CREATE TABLE IF NOT EXISTS extractions (
     value VARCHAR,
     confidence DOUBLE,
     valid BOOLEAN,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+)
+"""
+
+_SUMMARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS field_failures (
+    field_name VARCHAR PRIMARY KEY,
+    failures BIGINT
 )
 """
 
@@ -40,25 +102,391 @@ def get_connection() -> duckdb.DuckDBPyConnection:
             db_path.parent.mkdir(parents=True, exist_ok=True)
             _conn = duckdb.connect(str(db_path))
             _conn.execute(_SCHEMA)
+            _conn.execute(_SUMMARY_SCHEMA)
+            partitions.create_unified_view(_conn, settings.storage.archive_dir)
         return _conn
 
 
 def init_schema() -> None:
-    """Idempotently ensure the table exists. Call once on startup."""
+    """Idempotently ensure the tables exist and load failure counters. Call once on startup."""
     get_connection()
+    _get_failures()
 
 
 def close_connection() -> None:
-    global _conn
+    """Drain the background writer, then close the shared connection (or the writer client)."""
+    global _conn, _writer, _failures, _client
+    stop_storage_maintenance()
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+    with _failures_lock:
+        _failures = None
     with _lock:
         if _conn is not None:
             _conn.close()
             _conn = None
 
 
-def persist_run(run_summary: Dict) -> None:
+def maintain_storage() -> Dict[str, list]:
+    """Archive old rows to daily Parquet partitions, compact them, apply retention."""
+    storage = get_settings().storage
+    con = get_connection()
+    with _lock:
+        archived = partitions.archive_rows(con, storage.archive_dir, storage.hot_days)
+    compacted = partitions.compact_partitions(storage.archive_dir, storage.compact_min_files)
+    removed = partitions.apply_retention(storage.archive_dir, storage.retention_days)
+    with _lock:
+        partitions.create_unified_view(con, storage.archive_dir)
+    if archived or compacted or removed:
+        logger.info(
+            "storage maintenance: archived=%s compacted=%s removed=%s", archived, compacted, removed
+        )
+    return {"archived": archived, "compacted": compacted, "removed": removed}
+
+
+def start_storage_maintenance() -> None:
+    """Run `maintain_storage` every `maintenance_interval_s` on a daemon thread."""
+    global _maintenance_stop, _maintenance_thread
+    interval = get_settings().storage.maintenance_interval_s
+    if not interval or _maintenance_thread is not None:
+        return
+    stop = Event()
+
+    def loop() -> None:
+        while not stop.wait(interval):
+            try:
+                maintain_storage()
+            except Exception:
+                logger.exception("storage maintenance failed")
+
+    _maintenance_stop = stop
+    _maintenance_thread = Thread(target=loop, name="idp-storage-maintenance", daemon=True)
+    _maintenance_thread.start()
+
+
+def stop_storage_maintenance() -> None:
+    global _maintenance_stop, _maintenance_thread
+    if _maintenance_thread is None:
+        return
+    _maintenance_stop.set()
+    _maintenance_thread.join()
+    _maintenance_stop = _maintenance_thread = None
+
+
+def insert_rows(rows: List[Row]) -> None:
+    """Bulk-insert extraction rows in one transaction.
+
+    With pyarrow installed the rows are appended as a single Arrow table;
+    otherwise they go in as multi-row `INSERT ... VALUES` statements, which
+    DuckDB executes far faster than `executemany`.
+    """
+    if not rows:
+        return
     con = get_connection()
-    rows = [
+    with _lock:
+        con.begin()
+        try:
+            if pyarrow is not None:
+                table = pyarrow.table({name: list(col) for name, col in zip(_COLUMNS, zip(*rows))})
+                con.register("_extraction_rows", table)
+                try:
+                    con.execute("INSERT INTO extractions SELECT * FROM _extraction_rows")
+                finally:
+                    con.unregister("_extraction_rows")
+            else:
+                for start in range(0, len(rows), _VALUES_CHUNK):
+                    chunk = rows[start : start + _VALUES_CHUNK]
+                    placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(chunk))
+                    params = [value for row in chunk for value in row]
+                    con.execute(f"INSERT INTO extractions VALUES {placeholders}", params)
+            deltas = failure_deltas(rows)
+            _add_summary_failures(con, deltas)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        # Counters loaded before this commit lack these rows; ones loaded
+        # later read them from field_failures. `_get_failures` loads under
+        # `_lock`, so it is one or the other.
+        if _failures is not None:
+            _failures.record(deltas)
+        if get_settings().storage.write_checkpoint:
+            con.execute("CHECKPOINT")
+
+
+def failure_deltas(rows: List[Row]) -> Dict[str, int]:
+    deltas: Counter[str] = Counter()
+    for row in rows:
+        if not row[5]:
+            deltas[row[2]] += 1
+    return dict(deltas)
+
+
+def _add_summary_failures(con: duckdb.DuckDBPyConnection, deltas: Dict[str, int]) -> None:
+    if not deltas:
+        return
+    placeholders = ", ".join(["(?, ?)"] * len(deltas))
+    params = [value for item in deltas.items() for value in item]
+    con.execute(
+        f"""
+        INSERT INTO field_failures VALUES {placeholders}
+        ON CONFLICT (field_name) DO UPDATE SET failures = failures + excluded.failures
+        """,
+        params,
+    )
+
+
+class FailureCounts:
+    """In-process per-field failure counters behind `aggregate_failures`.
+
+    With `refresh_s > 0` the ranked list is recomputed at most that often and
+    requests in between get the cached snapshot.
+    """
+
+    def __init__(self, initial: Optional[Dict[str, int]] = None, refresh_s: float = 0.0) -> None:
+        self.refresh_s = refresh_s
+        self._counts: Dict[str, int] = dict(initial or {})
+        self._lock = Lock()
+        self._ranked: List[Tuple[str, int]] = []
+        self._ranked_at: Optional[float] = None
+
+    @classmethod
+    def load(cls, con: duckdb.DuckDBPyConnection, refresh_s: float = 0.0) -> "FailureCounts":
+        """Seed from `field_failures`, rebuilding it from `extractions` if it was never populated.
+
+        The caller holds `_lock`.
+        """
+        rows = con.execute("SELECT field_name, failures FROM field_failures").fetchall()
+        if not rows:
+            rows = con.execute(
+                "SELECT field_name, COUNT(*) FROM extractions WHERE valid = FALSE GROUP BY field_name"
+            ).fetchall()
+            if rows:
+                logger.info("rebuilding field_failures summary for %d fields", len(rows))
+                _add_summary_failures(con, dict(rows))
+        return cls(dict(rows), refresh_s=refresh_s)
+
+    def record(self, deltas: Dict[str, int]) -> None:
+        if not deltas:
+            return
+        with self._lock:
+            for field_name, count in deltas.items():
+                self._counts[field_name] = self._counts.get(field_name, 0) + count
+            if not self.refresh_s:
+                self._ranked_at = None
+
+    def top(self, limit: int = 20) -> List[dict]:
+        with self._lock:
+            now = time.monotonic()
+            if self._ranked_at is None or (self.refresh_s and now - self._ranked_at >= self.refresh_s):
+                self._ranked = sorted(
+                    ((name, count) for name, count in self._counts.items() if count > 0),
+                    key=lambda item: (-item[1], item[0]),
+                )
+                self._ranked_at = now
+            ranked = self._ranked[:limit]
+        return [{"field": name, "failures": count} for name, count in ranked]
+
+
+def _get_failures() -> FailureCounts:
+    global _failures
+    with _failures_lock:
+        if _failures is None:
+            con = get_connection()
+            refresh_s = get_settings().storage.top_failures_refresh_s
+            # Loaded and published under `_lock`, atomically with respect to
+            # inserts, which record their deltas only into loaded counters.
+            with _lock:
+                _failures = FailureCounts.load(con, refresh_s=refresh_s)
+        return _failures
+
+
+class AnalyticsWriter:
+    """Ring buffer plus one writer thread that flushes it in bulk.
+
+    `submit` never touches the database. When the buffer is full, `overflow`
+    decides whether the caller waits (`block`), the oldest buffered rows are
+    discarded (`drop_oldest`), or the incoming rows are (`drop_newest`);
+    dropped rows are counted in `idp_analytics_rows_dropped_total`. A
+    submitter still blocked when `close` is called gives up: the rows it
+    has not buffered yet are counted as dropped with reason `closed`.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[Row]], None] = insert_rows,
+        capacity: int = 50_000,
+        batch_rows: int = 2_000,
+        flush_interval_s: float = 1.0,
+        overflow: str = "block",
+    ) -> None:
+        if overflow not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.write_fn = write_fn
+        self.capacity = capacity
+        self.batch_rows = batch_rows
+        # A buffer smaller than a batch is flushed as soon as it fills up.
+        self._flush_at = min(batch_rows, capacity)
+        self.flush_interval_s = flush_interval_s
+        self.overflow = overflow
+        self.dropped = 0
+        self._buffer: Deque[Row] = deque()
+        self._cond = Condition()
+        self._write_lock = Lock()
+        self._closed = False
+        self._thread = Thread(target=self._run, name="idp-analytics-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls) -> "AnalyticsWriter":
+        storage = get_settings().storage
+        return cls(
+            capacity=storage.write_buffer_rows,
+            batch_rows=storage.write_batch_rows,
+            flush_interval_s=storage.write_flush_interval_s,
+            overflow=storage.write_overflow,
+        )
+
+    def submit(self, rows: List[Row]) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("analytics writer is closed")
+            pending = deque(rows)
+            while pending:
+                free = self.capacity - len(self._buffer)
+                if free <= 0:
+                    if self.overflow == "block":
+                        self._cond.notify_all()
+                        self._cond.wait()
+                        if self._closed:
+                            self._drop(len(pending), "closed")
+                            break
+                        continue
+                    if self.overflow == "drop_newest":
+                        self._drop(len(pending), "overflow")
+                        break
+                    evict = min(len(pending), self.capacity)
+                    for _ in range(evict):
+                        self._buffer.popleft()
+                    self._drop(evict, "overflow")
+                    free = evict
+                for _ in range(min(free, len(pending))):
+                    self._buffer.append(pending.popleft())
+            ANALYTICS_BUFFERED_ROWS.set(len(self._buffer))
+            if len(self._buffer) >= self._flush_at:
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Write everything buffered so far before returning."""
+        with self._write_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                self._write(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+    def _take(self) -> List[Row]:
+        with self._cond:
+            batch = list(self._buffer)
+            self._buffer.clear()
+            ANALYTICS_BUFFERED_ROWS.set(0)
+            self._cond.notify_all()
+        return batch
+
+    def _write(self, batch: List[Row]) -> None:
+        try:
+            self.write_fn(batch)
+        except Exception:
+            logger.exception("analytics flush of %d rows failed", len(batch))
+            with self._cond:
+                self._drop(len(batch), "error")
+
+    def _drop(self, count: int, reason: str) -> None:
+        self.dropped += count
+        ANALYTICS_ROWS_DROPPED.labels(reason).inc(count)
+
+    def _run(self) -> None:
+        while True:
+            deadline = time.monotonic() + self.flush_interval_s
+            with self._cond:
+                while not self._closed and len(self._buffer) < self._flush_at:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+
+
+def _get_writer() -> AnalyticsWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AnalyticsWriter.from_settings()
+        return _writer
+
+
+def _get_client(address: str) -> AnalyticsClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AnalyticsClient(address)
+        return _client
+
+
+def store_rows(rows: List[Row]) -> None:
+    """Write rows in the process that owns the database; failures count once stored."""
+    if get_settings().storage.write_mode == "sync":
+        insert_rows(rows)
+    else:
+        _get_writer().submit(rows)
+
+
+def run_writer(address: str, ready: Optional[Any] = None) -> None:
+    """Body of the analytics writer process in multi-process serving.
+
+    Owns the DuckDB file: stores rows sent by the API workers, answers their
+    `top_failures` queries and runs storage maintenance. `ready` (an Event)
+    is set once the socket accepts connections. SIGTERM drains the buffer
+    and exits; SIGINT is ignored so that Ctrl-C stops the workers first and
+    their last rows still arrive.
+    """
+    os.environ.pop(WRITER_ENV, None)  # this process writes; it is not a client
+    configure_logging(get_settings().service.log_level)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_schema()
+    start_storage_maintenance()
+    server = AnalyticsServer(address, on_rows=store_rows, on_top=lambda limit: _get_failures().top(limit))
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    logger.info("analytics writer listening on %s", address)
+    if ready is not None:
+        ready.set()
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        close_connection()
+
+
+def persist_run(run_summary: Dict) -> None:
+    # Naive UTC, stamped once per run: every worker process agrees, and all
+    # rows of a run share one created_at.
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows: List[Row] = [
         (
             run_summary["request_id"],
             doc["doc_type"],
@@ -66,35 +494,31 @@ def persist_run(run_summary: Dict) -> None:
             str(field_payload.get("value")),
             float(field_payload.get("confidence", 0.0)),
             bool(field_payload.get("valid", False)),
+            created_at,
         )
         for doc in run_summary["documents"]
         for field_name, field_payload in doc["fields"].items()
     ]
     if not rows:
         return
-    with _lock:
-        con.executemany(
-            "INSERT INTO extractions VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-            rows,
-        )
+    address = writer_address()
+    if address is not None:
+        _get_client(address).submit(rows)
+    else:
+        store_rows(rows)
 
 
 def aggregate_failures(limit: int = 20) -> list[dict]:
+    """Top failing fields from the in-process counters; O(fields), no table scan.
+
+    Counters cover stored rows only; rows still in the async write buffer
+    count once flushed (within `write_flush_interval_s`). In a worker
+    process the writer process answers, with counts from all workers.
+    """
+    address = writer_address()
+    if address is not None:
+        return _get_client(address).top(limit)
     settings = get_settings()
-    if not Path(settings.storage.duckdb_path).exists():
+    if _failures is None and not Path(settings.storage.duckdb_path).exists():
         return []
-    con = get_connection()
-    with _lock:
-        res = con.execute(
-            """
-            SELECT field_name, COUNT(*) AS failures
-            FROM extractions
-            WHERE valid = FALSE
-            GROUP BY field_name
-            HAVING COUNT(*) > 0
-            ORDER BY failures DESC
-            LIMIT ?
-            """,
-            [limit],
-        ).fetchall()
-    return [{"field": row[0], "failures": row[1]} for row in res]
+    return _get_failures().top(limit)
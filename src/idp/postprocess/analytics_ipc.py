@@ -0,0 +1,183 @@
+"""Local IPC between API worker processes and the analytics writer process.
+
+DuckDB allows one writing process per database file, so with several API
+processes (`idp.serve --workers N`) only a dedicated writer process
+opens `StorageSettings.duckdb_path`. Workers find it through the
+`IDP_ANALYTICS_WRITER` environment variable, which the launcher sets to the
+writer's Unix socket. When it is set, `analytics.persist_run` sends rows to
+the writer with an `AnalyticsClient` instead of writing them, and
+`aggregate_failures` asks the writer for its counters, so `top_failures`
+covers every worker.
+
+Messages are pickled `(kind, payload)` tuples over
+`multiprocessing.connection`:
+
+* `("rows", rows)`: one request's extraction rows; no reply. The writer
+  buffers them in its `AnalyticsWriter` like a single-process server does.
+* `("top", limit)`: replied to with the writer's `top_failures` list.
+  Messages on one connection are handled in order, so a worker's own rows
+  are counted before its `top` request is answered.
+
+The socket is created mode 0600; only processes of the same user can send
+rows. If the writer is unreachable, rows are dropped and counted in
+`idp_analytics_rows_dropped_total{reason="writer_unavailable"}`; the
+request itself never fails because of analytics.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from threading import Lock, Thread, current_thread
+from typing import Callable, List, Optional, Set
+
+from idp.services.metrics import ANALYTICS_ROWS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+WRITER_ENV = "IDP_ANALYTICS_WRITER"
+
+_FAMILY = "AF_UNIX"
+
+
+def writer_address() -> Optional[str]:
+    """Socket of the writer process when running as one of several workers, else None."""
+    return os.environ.get(WRITER_ENV) or None
+
+
+class AnalyticsClient:
+    """Worker-side connection to the writer; safe to share across threads.
+
+    Connects lazily and reconnects once per call after a broken connection,
+    so a restarted writer is picked up without restarting the workers.
+    """
+
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.dropped = 0
+        self._conn: Optional[Connection] = None
+        self._lock = Lock()
+
+    def submit(self, rows: List[tuple]) -> bool:
+        """Send rows to the writer; False (rows dropped) if it cannot be reached."""
+        try:
+            self._call(("rows", rows), reply=False)
+        except (OSError, EOFError) as exc:
+            logger.warning("analytics writer %s unavailable, dropping %d rows: %s", self.address, len(rows), exc)
+            self.dropped += len(rows)
+            ANALYTICS_ROWS_DROPPED.labels("writer_unavailable").inc(len(rows))
+            return False
+        return True
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """The writer's `top_failures`; empty if it cannot be reached."""
+        try:
+            return self._call(("top", limit), reply=True)
+        except (OSError, EOFError) as exc:
+            logger.warning("analytics writer %s unavailable: %s", self.address, exc)
+            return []
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _call(self, message: tuple, reply: bool):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, family=_FAMILY)
+                    self._conn.send(message)
+                    return self._conn.recv() if reply else None
+                except (OSError, EOFError):
+                    self._reset()
+                    if attempt:
+                        raise
+
+    def _reset(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+
+class AnalyticsServer:
+    """Writer-side listener: one thread per worker connection.
+
+    `on_rows` and `on_top` do the actual work (`analytics.run_writer` passes
+    `store_rows` and the failure counters). `serve_forever` blocks until
+    `shutdown` is called, from another thread or a signal handler.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        on_rows: Callable[[List[tuple]], None],
+        on_top: Callable[[int], List[dict]],
+    ) -> None:
+        self.address = address
+        self.on_rows = on_rows
+        self.on_top = on_top
+        Path(address).parent.mkdir(parents=True, exist_ok=True)
+        Path(address).unlink(missing_ok=True)  # left behind by a writer that was killed
+        self._listener = Listener(address, family=_FAMILY)
+        os.chmod(address, 0o600)
+        self._stopping = False
+        self._threads: Set[Thread] = set()
+        self._lock = Lock()
+
+    def serve_forever(self) -> None:
+        while True:
+            conn = self._listener.accept()
+            if self._stopping:
+                conn.close()
+                return
+            thread = Thread(target=self._handle, args=(conn,), name="idp-analytics-conn", daemon=True)
+            with self._lock:
+                self._threads.add(thread)
+            thread.start()
+
+    def shutdown(self) -> None:
+        """Make `serve_forever` return; connections already open are still served."""
+        self._stopping = True
+        try:
+            Client(self.address, family=_FAMILY).close()  # wakes the blocked accept()
+        except OSError:
+            pass
+
+    def close(self, timeout_s: float = 5.0) -> None:
+        """Stop listening and wait for connected workers to disconnect."""
+        self._listener.close()
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join(timeout_s)
+            if thread.is_alive():
+                logger.warning("analytics connection still open at writer shutdown")
+
+    def _handle(self, conn: Connection) -> None:
+        try:
+            while True:
+                kind, payload = conn.recv()
+                try:
+                    if kind == "rows":
+                        self.on_rows(payload)
+                    elif kind == "top":
+                        conn.send(self.on_top(payload))
+                    else:
+                        logger.warning("ignoring unknown analytics message %r", kind)
+                except (OSError, EOFError):
+                    raise
+                except Exception:
+                    logger.exception("analytics %s message failed", kind)
+                    if kind == "top":
+                        conn.send([])
+        except (OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self._threads.discard(current_thread())
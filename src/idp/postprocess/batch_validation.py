@@ -0,0 +1,211 @@
+"""Batch re-validation over columnar field data.
+
+`validators.validate_fields` checks one document's dict at a time, which is
+fine inside a request but far too slow to re-validate millions of stored
+rows after a rule change. `validate_columns` applies the same rules to whole
+columns of documents:
+
+* Each column is factorised, so every distinct value is regex-matched or
+  normalised once per batch. Normalised amounts and dates are also memoised
+  across batches.
+* Amounts become object arrays of `Decimal` and dates `datetime64` arrays.
+  The totals and date-order rules then run as NumPy operations over every
+  document at once, with the same `Decimal` arithmetic as the per-document
+  path.
+* Only failing documents get messages, built with the helpers
+  `validate_fields` uses. Each document's `ValidationSummary` is identical
+  to what `validate_fields` returns for it.
+
+`FieldColumns.from_dicts` takes field dicts as the pipeline builds them.
+`iter_stored_columns` pivots the long-format `extractions` table (one row
+per field) in DuckDB and streams documents in batches. The
+`scripts/revalidate.py` backfill and `scripts/bench_validation.py` are built
+on these.
+"""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import duckdb
+import numpy as np
+
+from idp.config import get_settings
+from idp.postprocess.normalizers import normalize_amount, normalize_date
+from idp.postprocess.validators import (
+    _COMPILED_RULES,
+    ValidationSummary,
+    due_date_message,
+    expiry_message,
+    regex_message,
+    total_message,
+)
+
+_AMOUNT_FIELDS = ("subtotal_amount", "tax_amount", "total_amount")
+_DATE_FIELDS = ("invoice_date", "due_date", "expiry_date", "birth_date")
+# Every field a rule reads.
+FIELDS: Tuple[str, ...] = (*_COMPILED_RULES, *_AMOUNT_FIELDS, *_DATE_FIELDS)
+
+# Tables `iter_stored_columns` may read; both have the `extractions` columns.
+_TABLES = ("extractions", "extractions_all")
+
+_amount = lru_cache(maxsize=1 << 16)(normalize_amount)
+_date = lru_cache(maxsize=1 << 16)(normalize_date)
+
+
+@dataclass
+class FieldColumns:
+    """Field values of many documents, one object array per field in `FIELDS`.
+
+    `values[name][i]` is document `i`'s value, or None when it lacks the field.
+    """
+
+    ids: List[Any]
+    values: Dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_dicts(cls, docs: Sequence[Dict[str, Any]], ids: Optional[Sequence[Any]] = None) -> "FieldColumns":
+        return cls(
+            ids=list(ids) if ids is not None else list(range(len(docs))),
+            values={name: _objects(map(dict.get, docs, itertools.repeat(name)), len(docs)) for name in FIELDS},
+        )
+
+
+def _objects(values: Iterable, count: int) -> np.ndarray:
+    return np.fromiter(values, dtype=object, count=count)
+
+
+def _factorize(column: np.ndarray) -> Tuple[np.ndarray, List[Any]]:
+    """Codes into the column's distinct values (first-seen order), and those values."""
+    values = column.tolist()
+    uniques = list(dict.fromkeys(values))
+    if all(value is None or type(value) is str for value in uniques):
+        index = {value: i for i, value in enumerate(uniques)}
+        return np.fromiter(map(index.__getitem__, values), dtype=np.int64, count=len(values)), uniques
+    # Mixed types: 1, 1.0 and True are equal dict keys but validate
+    # differently, so key on the type as well.
+    typed: Dict[Tuple[type, Any], int] = {}
+    codes = np.fromiter(
+        (typed.setdefault((type(v), v), len(typed)) for v in values), dtype=np.int64, count=len(values)
+    )
+    return codes, [value for _, value in typed]
+
+
+def _amounts(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalised `Decimal`s (object array) and a mask of documents that have one."""
+    codes, uniques = _factorize(column)
+    normalized = [_amount(value) for value in uniques]
+    present = np.fromiter((value is not None for value in normalized), dtype=bool, count=len(normalized))
+    return _objects(normalized, len(normalized))[codes], present[codes]
+
+
+def _dates(column: np.ndarray) -> np.ndarray:
+    """Normalised dates as `datetime64[us]`; NaT (never compares true) where missing or unparsable."""
+    codes, uniques = _factorize(column)
+    parsed = [_date(value) for value in uniques]
+    stamps = np.array([np.datetime64("NaT") if d is None else np.datetime64(d, "us") for d in parsed])
+    return stamps.astype("datetime64[us]")[codes]
+
+
+def validate_columns(columns: FieldColumns) -> List[ValidationSummary]:
+    """`validate_fields` for every document in `columns`, in order."""
+    tolerance = Decimal(get_settings().validation.total_tolerance)
+    summaries = [ValidationSummary(errors=[], warnings=[]) for _ in range(len(columns))]
+    values = columns.values
+
+    # Messages are appended in `validate_fields` order: regex rules, totals,
+    # expiry (errors); due date (warning).
+    for name, rule in _COMPILED_RULES.items():
+        column = values[name]
+        codes, uniques = _factorize(column)
+        failed = np.fromiter(
+            (bool(value) and not rule.match(str(value)) for value in uniques), dtype=bool, count=len(uniques)
+        )
+        for i in np.flatnonzero(failed[codes]).tolist():
+            summaries[i].errors.append(regex_message(name, column[i]))
+
+    (subtotal, has_subtotal), (tax, has_tax), (total, has_total) = (
+        _amounts(values[name]) for name in _AMOUNT_FIELDS
+    )
+    rows = np.flatnonzero(has_subtotal & has_tax & has_total)
+    if rows.size:
+        diff = np.abs((subtotal[rows] + tax[rows]) - total[rows])
+        failed = (diff > tolerance).astype(bool)
+        for i, d in zip(rows[failed].tolist(), diff[failed]):
+            summaries[i].errors.append(total_message(subtotal[i], tax[i], total[i], d))
+
+    invoice_date, due_date, expiry, birth = (_dates(values[name]) for name in _DATE_FIELDS)
+    for i in np.flatnonzero(expiry < birth).tolist():
+        summaries[i].errors.append(expiry_message())
+    for i in np.flatnonzero(invoice_date > due_date).tolist():
+        summaries[i].warnings.append(due_date_message())
+    return summaries
+
+
+def validate_batch(docs: Sequence[Dict[str, Any]]) -> List[ValidationSummary]:
+    """`validate_fields` over a list of field dicts, vectorised."""
+    return validate_columns(FieldColumns.from_dicts(docs))
+
+
+def iter_stored_columns(
+    con: duckdb.DuckDBPyConnection,
+    table: str = "extractions",
+    since: Optional[datetime] = None,
+    batch_docs: int = 100_000,
+) -> Iterator[FieldColumns]:
+    """Stored documents as `FieldColumns` batches, pivoted to one row per request.
+
+    A request_id can be stored more than once (a re-run, or a re-upload of
+    the same file under `stable_request_id`); only its latest run, the rows
+    sharing the highest `created_at`, is read, so runs are never mixed.
+    `persist_run` stores values with `str()`, so SQL NULL and the literal
+    "None" both read back as a missing field, as they were at request time.
+    """
+    if table not in _TABLES:
+        raise ValueError(f"table must be one of {_TABLES}, got {table!r}")
+    pivots = ", ".join(
+        f"max(NULLIF(value, 'None')) FILTER (WHERE field_name = '{name}') AS \"{name}\"" for name in FIELDS
+    )
+    where = "WHERE created_at >= ?" if since is not None else ""
+    cursor = con.cursor()
+    try:
+        cursor.execute(
+            f"""
+            WITH rows AS (SELECT request_id, field_name, value, created_at FROM {table} {where}),
+            latest AS (SELECT request_id, max(created_at) AS created_at FROM rows GROUP BY request_id)
+            SELECT request_id, {pivots}
+            FROM rows JOIN latest USING (request_id, created_at)
+            GROUP BY request_id ORDER BY request_id
+            """,
+            [since] if since is not None else [],
+        )
+        while True:
+            rows = cursor.fetchmany(batch_docs)
+            if not rows:
+                return
+            yield FieldColumns(
+                ids=[row[0] for row in rows],
+                values={
+                    name: _objects((row[k] for row in rows), len(rows)) for k, name in enumerate(FIELDS, start=1)
+                },
+            )
+    finally:
+        cursor.close()
+
+
+def revalidate_stored(
+    con: duckdb.DuckDBPyConnection,
+    table: str = "extractions",
+    since: Optional[datetime] = None,
+    batch_docs: int = 100_000,
+) -> Iterator[Tuple[str, ValidationSummary]]:
+    """`(request_id, ValidationSummary)` for every stored document, in request_id order."""
+    for columns in iter_stored_columns(con, table=table, since=since, batch_docs=batch_docs):
+        yield from zip(columns.ids, validate_columns(columns))
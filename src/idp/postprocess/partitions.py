@@ -0,0 +1,143 @@
+"""Daily Parquet partitions for the `extractions` table.
+
+The live DuckDB table only keeps the last `StorageSettings.hot_days` days.
+Older rows are copied into Hive-style day directories
+(`<archive_dir>/date=YYYY-MM-DD/part-<ns>.parquet`) and deleted from the live
+table, so `data/idp.duckdb` stays small. `compact_partitions` merges the
+small files that repeated archiving leaves in a day directory,
+`apply_retention` drops day directories past `retention_days`, and the
+`extractions_all` view unions the live table with every partition under a
+`date` column. Filtering that view on `date` prunes partitions by directory
+name, so queries over recent windows never open older files.
+
+A partition file is published (renamed into place) before its rows are
+deleted from the live table: a crash in between duplicates a day's rows in
+the view rather than losing them.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+VIEW_NAME = "extractions_all"
+
+
+def partition_dir(root: Path, day: date) -> Path:
+    return root / f"date={day.isoformat()}"
+
+
+def _partition_days(root: Path) -> Dict[date, Path]:
+    days: Dict[date, Path] = {}
+    if not root.exists():
+        return days
+    for path in root.iterdir():
+        if path.is_dir() and path.name.startswith("date="):
+            try:
+                days[date.fromisoformat(path.name[len("date="):])] = path
+            except ValueError:
+                logger.warning("ignoring unexpected partition directory %s", path)
+    return days
+
+
+def _sql_path(path: Path) -> str:
+    return str(path).replace("'", "''")
+
+
+def _new_part_path(directory: Path) -> Path:
+    return directory / f"part-{time.time_ns()}.parquet"
+
+
+def archive_rows(
+    con: duckdb.DuckDBPyConnection,
+    root: Path,
+    hot_days: int,
+    today: Optional[date] = None,
+) -> List[date]:
+    """Move live rows older than `hot_days` days into one Parquet file per day."""
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=hot_days - 1)
+    days = [
+        row[0]
+        for row in con.execute(
+            "SELECT DISTINCT CAST(created_at AS DATE) AS day FROM extractions "
+            "WHERE created_at < CAST(? AS DATE) ORDER BY day",
+            [cutoff],
+        ).fetchall()
+    ]
+    for day in days:
+        directory = partition_dir(root, day)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = _new_part_path(directory)
+        tmp = target.with_suffix(".parquet.tmp")
+        con.execute(
+            f"COPY (SELECT * FROM extractions WHERE CAST(created_at AS DATE) = ?) "
+            f"TO '{_sql_path(tmp)}' (FORMAT parquet)",
+            [day],
+        )
+        os.replace(tmp, target)
+        con.execute("DELETE FROM extractions WHERE CAST(created_at AS DATE) = ?", [day])
+    if days:
+        con.execute("CHECKPOINT")
+    return days
+
+
+def compact_partitions(root: Path, min_files: int = 2) -> List[date]:
+    """Merge each day directory holding `min_files` or more files into a single file."""
+    compacted: List[date] = []
+    scratch = duckdb.connect()
+    try:
+        for day, directory in sorted(_partition_days(root).items()):
+            parts = sorted(directory.glob("part-*.parquet"))
+            if len(parts) < min_files:
+                continue
+            target = _new_part_path(directory)
+            tmp = target.with_suffix(".parquet.tmp")
+            files = ", ".join(f"'{_sql_path(p)}'" for p in parts)
+            scratch.execute(
+                f"COPY (SELECT * FROM read_parquet([{files}], hive_partitioning = false) "
+                f"ORDER BY created_at) TO '{_sql_path(tmp)}' (FORMAT parquet)"
+            )
+            os.replace(tmp, target)
+            for part in parts:
+                part.unlink()
+            compacted.append(day)
+    finally:
+        scratch.close()
+    return compacted
+
+
+def apply_retention(root: Path, retention_days: Optional[int], today: Optional[date] = None) -> List[date]:
+    """Delete partitions older than `retention_days`; None keeps everything."""
+    if retention_days is None:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    oldest_kept = today - timedelta(days=retention_days - 1)
+    removed = []
+    for day, directory in sorted(_partition_days(root).items()):
+        if day < oldest_kept:
+            shutil.rmtree(directory)
+            removed.append(day)
+    return removed
+
+
+def create_unified_view(con: duckdb.DuckDBPyConnection, root: Path) -> None:
+    """(Re)define `extractions_all` over the live table plus every partition."""
+    live = "SELECT *, CAST(created_at AS DATE) AS date FROM extractions"
+    if any(directory.glob("part-*.parquet") for directory in _partition_days(root).values()):
+        pattern = _sql_path(root.resolve() / "date=*" / "part-*.parquet")
+        archived = (
+            f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, "
+            f"hive_types = {{'date': DATE}})"
+        )
+        con.execute(f"CREATE OR REPLACE VIEW {VIEW_NAME} AS {live} UNION ALL BY NAME {archived}")
+    else:
+        con.execute(f"CREATE OR REPLACE VIEW {VIEW_NAME} AS {live}")
@@ -33,18 +33,38 @@ _REGEX_RULES = {
     "bank_account": r"^[0-9]{6,20}$",
     "id_number": r"^[0-9A-Za-z\-]+$",
 }
+_COMPILED_RULES = {field_name: re.compile(pattern) for field_name, pattern in _REGEX_RULES.items()}
+
+
+# Message builders shared with the batch validator (`idp.postprocess.batch_validation`),
+# which must report exactly what `validate_fields` would.
+def regex_message(field_name: str, value) -> ValidationMessage:
+    return ValidationMessage(field=field_name, message=f"Regex validation failed for value {value!r}")
+
+
+def total_message(subtotal: Decimal, tax: Decimal, total: Decimal, diff: Decimal) -> ValidationMessage:
+    return ValidationMessage(
+        field="total_amount",
+        message=f"subtotal ({subtotal}) + tax ({tax}) != total ({total}); diff={diff}",
+    )
+
+
+def due_date_message() -> ValidationMessage:
+    return ValidationMessage(field="due_date", message="Due date earlier than invoice date", level="warning")
+
+
+def expiry_message() -> ValidationMessage:
+    return ValidationMessage(field="expiry_date", message="Expiry date earlier than birth date")
 
 
 def regex_validations(fields: Dict[str, str]) -> List[ValidationMessage]:
     messages: List[ValidationMessage] = []
-    for field_name, pattern in _REGEX_RULES.items():
+    for field_name, rule in _COMPILED_RULES.items():
         value = fields.get(field_name)
         if not value:
             continue
-        if not re.match(pattern, str(value)):
-            messages.append(
-                ValidationMessage(field=field_name, message=f"Regex validation failed for value {value!r}")
-            )
+        if not rule.match(str(value)):
+            messages.append(regex_message(field_name, value))
     return messages
 
 
@@ -59,28 +79,17 @@ def cross_field_checks(fields: Dict[str, str]) -> List[ValidationMessage]:
     if subtotal is not None and tax is not None and total is not None:
         diff = abs((subtotal + tax) - total)
         if diff > tolerance:
-            messages.append(
-                ValidationMessage(
-                    field="total_amount",
-                    message=f"subtotal ({subtotal}) + tax ({tax}) != total ({total}); diff={diff}",
-                )
-            )
+            messages.append(total_message(subtotal, tax, total, diff))
 
     invoice_date = normalize_date(fields.get("invoice_date"))
     due_date = normalize_date(fields.get("due_date"))
     if invoice_date and due_date and invoice_date > due_date:
-        messages.append(
-            ValidationMessage(
-                field="due_date",
-                message="Due date earlier than invoice date",
-                level="warning",
-            )
-        )
+        messages.append(due_date_message())
 
     expiry = normalize_date(fields.get("expiry_date"))
     birth = normalize_date(fields.get("birth_date"))
     if expiry and birth and expiry < birth:
-        messages.append(ValidationMessage(field="expiry_date", message="Expiry date earlier than birth date"))
+        messages.append(expiry_message())
     return messages
 
 
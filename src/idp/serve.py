@@ -0,0 +1,92 @@
+"""Multi-process serving: N uvicorn workers plus one analytics writer process.
+
+A single uvicorn process runs all Python-level pipeline work on one core.
+Several uvicorn workers cannot each open `data/idp.duckdb` for writing, and
+each would keep its own Prometheus counters. This launcher:
+
+1. empties `ServiceSettings.metrics_dir` and exports it as
+   `PROMETHEUS_MULTIPROC_DIR`, so every process records metrics there and
+   `/metrics` on any worker reports the sum (see `idp.services.metrics`);
+2. requeues jobs a crashed deployment left `running`, once;
+3. starts the writer process (`analytics.run_writer`), which alone opens the
+   DuckDB file, and waits until its socket accepts connections;
+4. exports the socket as `IDP_ANALYTICS_WRITER` and runs uvicorn with
+   `--workers N`; the workers send their analytics rows to the writer
+   (see `idp.postprocess.analytics_ipc`);
+5. after uvicorn exits (Ctrl-C / SIGTERM), stops the writer, which flushes
+   buffered rows first.
+
+Run from repo root:
+
+    python -m idp.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+from pathlib import Path
+
+from idp.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_WRITER_START_TIMEOUT_S = 60.0
+_WRITER_STOP_TIMEOUT_S = 30.0
+
+
+def _reset_metrics_dir(path: Path) -> None:
+    # Files from a previous run would be summed into the new one.
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=settings.service.workers)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket", type=Path, default=settings.storage.writer_socket)
+    parser.add_argument("--metrics-dir", type=Path, default=settings.service.metrics_dir)
+    args = parser.parse_args()
+
+    metrics_dir = args.metrics_dir.resolve()
+    _reset_metrics_dir(metrics_dir)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(metrics_dir)
+
+    # Imported only now: prometheus_client picks its value storage at import.
+    import uvicorn
+
+    from idp.postprocess.analytics import run_writer
+    from idp.postprocess.analytics_ipc import WRITER_ENV
+    from idp.services.jobs import JobStore
+    from idp.utils.logging import configure_logging
+
+    configure_logging()
+    if settings.jobs.enabled:
+        JobStore(settings.jobs.db_path).close()
+
+    address = str(args.socket.resolve())
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    writer = ctx.Process(target=run_writer, args=(address, ready), name="idp-analytics-writer")
+    writer.start()
+    try:
+        if not ready.wait(_WRITER_START_TIMEOUT_S) or not writer.is_alive():
+            raise SystemExit(f"analytics writer did not start (exit code {writer.exitcode})")
+        os.environ[WRITER_ENV] = address
+        uvicorn.run("idp.api.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        writer.terminate()
+        writer.join(_WRITER_STOP_TIMEOUT_S)
+        if writer.is_alive():
+            logger.error("analytics writer did not stop; killing it, buffered rows are lost")
+            writer.kill()
+            writer.join()
+
+
+if __name__ == "__main__":
+    main()
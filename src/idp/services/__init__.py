@@ -1,3 +1,11 @@
-from .pipeline import ExtractionPipeline
-
 __all__ = ["ExtractionPipeline"]
+
+
+def __getattr__(name: str):
+    # Imported lazily so lower layers (e.g. `idp.ocr`) can use
+    # `idp.services.metrics` without pulling in the whole pipeline.
+    if name == "ExtractionPipeline":
+        from .pipeline import ExtractionPipeline
+
+        return ExtractionPipeline
+    raise AttributeError(name)
@@ -0,0 +1,124 @@
+"""Admission control for running the synchronous pipeline off the event loop.
+
+`ExtractionPipeline.extract` renders, runs OpenCV/Tesseract and writes to
+DuckDB, all of it blocking. `AdmissionController` runs it on a dedicated
+thread pool so the event loop stays free for `/health` and `/metrics`, and
+bounds the work the service accepts: at most `max_in_flight` extractions run
+at once and at most `max_queue_depth` wait for a slot. Anything beyond that is
+rejected immediately with 429; a request that waits longer than
+`queue_timeout_s` for a slot is rejected with 503. Both carry a Retry-After
+hint.
+
+A slot is held until the extraction itself returns, even if the caller is
+cancelled first (a batch stream whose client went away), so abandoned work
+still counts against `max_in_flight`.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from idp.config import get_settings
+from idp.config.settings import ServiceSettings
+from idp.services.metrics import (
+    ADMISSION_REJECTED,
+    PIPELINE_IN_FLIGHT,
+    PIPELINE_QUEUE_DEPTH,
+    PIPELINE_QUEUE_WAIT,
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after_s: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        workers: int = 2,
+        max_in_flight: int | None = None,
+        max_queue_depth: int = 8,
+        queue_timeout_s: float = 30.0,
+        retry_after_s: int = 5,
+    ) -> None:
+        self.max_in_flight = max_in_flight or workers
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout_s = queue_timeout_s
+        self.retry_after_s = retry_after_s
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="idp-pipeline")
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._waiting = 0
+
+    @classmethod
+    def from_settings(cls, settings: ServiceSettings | None = None) -> "AdmissionController":
+        service = settings or get_settings().service
+        return cls(
+            workers=service.pipeline_workers,
+            max_in_flight=service.max_in_flight,
+            max_queue_depth=service.max_queue_depth,
+            queue_timeout_s=service.queue_timeout_s,
+            retry_after_s=service.retry_after_s,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` on the pipeline executor once a slot is free."""
+        await self._acquire()
+        PIPELINE_IN_FLIGHT.inc()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Released when the call finishes, not when the awaiting task does: a
+        # cancelled wait does not stop a running thread.
+        future.add_done_callback(lambda _: self._release_from(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        PIPELINE_IN_FLIGHT.dec()
+        self._slots.release()
+
+    def _release_from(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # loop already closed at shutdown
+
+    async def _acquire(self) -> None:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            PIPELINE_QUEUE_WAIT.observe(0.0)
+            return
+        if self._waiting >= self.max_queue_depth:
+            ADMISSION_REJECTED.labels("429").inc()
+            raise AdmissionRejected(429, "Extraction queue is full", self.retry_after_s)
+
+        self._waiting += 1
+        PIPELINE_QUEUE_DEPTH.set(self._waiting)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError as exc:
+            ADMISSION_REJECTED.labels("503").inc()
+            raise AdmissionRejected(
+                503, "Timed out waiting for an extraction slot", self.retry_after_s
+            ) from exc
+        finally:
+            self._waiting -= 1
+            PIPELINE_QUEUE_DEPTH.set(self._waiting)
+            PIPELINE_QUEUE_WAIT.observe((time.perf_counter() - start) * 1000)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
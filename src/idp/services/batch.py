@@ -0,0 +1,202 @@
+"""Batch extraction over many PDFs with NDJSON output.
+
+`BatchRunner` feeds documents from a directory, a manifest or an upload into
+one shared `ExtractionPipeline`. Up to `workers` documents run at once; their
+pages all go through the pipeline's OCR engine, so a single page pool is kept
+busy across document boundaries. Results are yielded in completion order as
+one JSON-serialisable record per document, which `scripts/batch_extract.py`
+and `POST /extract/batch` write out as NDJSON.
+
+`POST /extract/batch` uses `run_admitted` instead, which sends every
+document through the service's `AdmissionController`, so a batch competes
+for the same bounded pipeline slots as `/extract` rather than bringing a
+pool of its own.
+
+Every item carries a stable request ID (derived from its path unless the
+manifest gives one), and that ID is used as the pipeline's `request_id`.
+Passing the IDs already present in an earlier output as `skip` resumes an
+interrupted batch without redoing finished documents.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+
+from idp.config import get_settings
+from idp.services.admission import AdmissionController, AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+_ID_NAMESPACE = uuid.UUID("6f1c1e0a-3b8e-4d55-9a6e-0c2f4e7d9b31")
+
+
+def stable_request_id(*parts: str) -> str:
+    """Deterministic request ID, so a rerun of the same batch maps to the same IDs."""
+    return str(uuid.uuid5(_ID_NAMESPACE, "\x1f".join(parts)))
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    request_id: str
+    path: Path
+    source: str
+    content_hash: Optional[str] = None
+
+
+def items_from_directory(directory: Path, recursive: bool = True) -> List[BatchItem]:
+    pattern = "**/*" if recursive else "*"
+    paths = sorted(p for p in directory.glob(pattern) if p.is_file() and p.suffix.lower() == ".pdf")
+    return [
+        BatchItem(stable_request_id(str(p.resolve())), p, str(p.relative_to(directory))) for p in paths
+    ]
+
+
+def items_from_manifest(manifest: Path) -> List[BatchItem]:
+    """Read a manifest: one PDF path per line, or JSON lines with `path` and optional `request_id`.
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    items: List[BatchItem] = []
+    for line in manifest.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            entry = json.loads(line)
+            raw_path, request_id = entry["path"], entry.get("request_id")
+        else:
+            raw_path, request_id = line, None
+        path = Path(raw_path)
+        if not path.is_absolute():
+            path = manifest.parent / path
+        items.append(BatchItem(request_id or stable_request_id(str(path.resolve())), path, raw_path))
+    return items
+
+
+def completed_request_ids(ndjson_path: Path) -> Set[str]:
+    """Request IDs with a successful record in an earlier NDJSON output."""
+    done: Set[str] = set()
+    if not ndjson_path.exists():
+        return done
+    with ndjson_path.open() as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            if record.get("status") == "ok":
+                done.add(record["request_id"])
+    return done
+
+
+class BatchRunner:
+    def __init__(self, pipeline, workers: int = 4, max_pending: Optional[int] = None) -> None:
+        self.pipeline = pipeline
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+
+    @classmethod
+    def from_settings(cls, pipeline) -> "BatchRunner":
+        return cls(pipeline, workers=get_settings().service.batch_workers)
+
+    def _extract(self, item: BatchItem, use_cache: bool) -> Dict:
+        try:
+            result = self.pipeline.extract(
+                item.path, use_cache=use_cache, content_hash=item.content_hash, request_id=item.request_id
+            )
+        except Exception as exc:
+            logger.exception("batch item %s failed", item.source)
+            return {"request_id": item.request_id, "source": item.source, "status": "error", "error": str(exc)}
+        return {"request_id": item.request_id, "source": item.source, "status": "ok", "result": result}
+
+    def run(
+        self,
+        items: Iterable[BatchItem],
+        skip: Optional[Set[str]] = None,
+        use_cache: bool = True,
+    ) -> Iterator[Dict]:
+        """Yield one record per item as it finishes; items in `skip` are not run."""
+        skip = skip or set()
+        pending: Set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="idp-batch") as pool:
+            try:
+                yield from self._schedule(pool, items, skip, use_cache, pending)
+            finally:
+                # Consumer went away (e.g. client disconnect): drop queued work.
+                for future in pending:
+                    future.cancel()
+
+    def _schedule(self, pool, items, skip, use_cache, pending: Set[Future]) -> Iterator[Dict]:
+        for item in items:
+            if item.request_id in skip:
+                continue
+            if len(pending) >= self.max_pending:
+                yield from self._drain_one(pending)
+            pending.add(pool.submit(self._extract, item, use_cache))
+        while pending:
+            yield from self._drain_one(pending)
+
+    async def run_admitted(
+        self,
+        items: Iterable[BatchItem],
+        admission: AdmissionController,
+        skip: Optional[Set[str]] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[Dict]:
+        """Like `run`, but each document takes a slot from `admission`.
+
+        At most `min(workers, admission.max_in_flight)` documents are
+        submitted at once, so a batch never queues behind its own documents.
+        If the controller rejects a document before any record has been
+        yielded, `AdmissionRejected` propagates and the caller can turn the
+        whole batch away; after that a rejected document becomes a
+        `rejected` record, which a resend of the batch retries.
+        """
+        skip = skip or set()
+        todo = (item for item in items if item.request_id not in skip)
+        window = min(self.workers, admission.max_in_flight)
+        pending: Dict[asyncio.Task, BatchItem] = {}
+        yielded = False
+        try:
+            while True:
+                for item in todo:
+                    pending[asyncio.create_task(admission.run(self._extract, item, use_cache))] = item
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    item = pending.pop(task)
+                    try:
+                        record = task.result()
+                    except AdmissionRejected as exc:
+                        if not yielded:
+                            raise
+                        record = {
+                            "request_id": item.request_id,
+                            "source": item.source,
+                            "status": "rejected",
+                            "error": exc.reason,
+                            "retry_after_s": exc.retry_after_s,
+                        }
+                    yield record
+                    yielded = True
+        finally:
+            # Rejected early or the client went away. Running documents keep
+            # their slot until they finish; queued ones are dropped.
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _drain_one(pending: Set[Future]) -> Iterator[Dict]:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            yield future.result()
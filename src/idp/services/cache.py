@@ -0,0 +1,190 @@
+"""Content-addressed cache of extraction results.
+
+The same PDF reaches the service many times (client retries, duplicate uploads
+from ERP connectors, reprocessing). `ResultCache` stores the per-document part
+of a pipeline response under a key derived from the uploaded bytes plus a
+fingerprint of everything that influences the output — preprocessing config,
+OCR engine (backend, binary, version, languages) and DPI, extractor rule set
+and validation settings — so a config, engine or rule change never serves a
+stale result.
+
+Two tiers: a bounded in-process LRU and an on-disk directory evicted oldest
+first once it exceeds `disk_max_bytes`. Entries are stored as orjson bytes so
+callers always get a private copy.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Dict, Optional
+
+import orjson
+
+from idp.config import get_settings
+from idp.config.settings import CacheSettings, Settings
+from idp.models.extractor import PATTERN_VERSION
+from idp.models.layout import LAYOUT_VERSION
+from idp.ocr.preprocess import PreprocessConfig
+from idp.ocr.tesseract_engine import engine_fingerprint
+from idp.services.metrics import RESULT_CACHE_HITS, RESULT_CACHE_MISSES
+
+_CHUNK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_fingerprint(settings: Settings, preprocess: PreprocessConfig) -> str:
+    payload = {
+        "preprocess": asdict(preprocess),
+        "engine": engine_fingerprint(settings.ocr),
+        "dpi": settings.ocr.dpi,
+        "roi": settings.ocr.roi_mode and (settings.ocr.roi_lowres_scale, settings.ocr.roi_required_fields),
+        "patterns": PATTERN_VERSION,
+        "layout": settings.extraction.mode == "layout" and LAYOUT_VERSION,
+        "validation": settings.validation.model_dump(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def cache_key(content_hash: str, fingerprint: str) -> str:
+    return hashlib.sha256(f"{content_hash}:{fingerprint}".encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        memory_entries: int = 256,
+        disk_dir: Optional[Path] = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ) -> None:
+        self.memory_entries = memory_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = Lock()
+        self._disk_bytes = 0
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+        if self.disk_dir is not None and self.disk_dir.exists():
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*/*.json"))
+
+    @classmethod
+    def from_settings(cls, settings: CacheSettings | None = None) -> "ResultCache":
+        cache = settings or get_settings().cache
+        return cls(
+            memory_entries=cache.memory_entries,
+            disk_dir=cache.disk_dir if cache.disk_enabled else None,
+            disk_max_bytes=cache.disk_max_bytes,
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+        if blob is not None:
+            RESULT_CACHE_HITS.labels("memory").inc()
+            return orjson.loads(blob)
+
+        blob = self._disk_get(key)
+        if blob is not None:
+            self._memory_put(key, blob)
+            with self._lock:
+                self._hits["disk"] += 1
+            RESULT_CACHE_HITS.labels("disk").inc()
+            return orjson.loads(blob)
+
+        with self._lock:
+            self._misses += 1
+        RESULT_CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: str, value: Dict) -> None:
+        blob = orjson.dumps(value)
+        self._memory_put(key, blob)
+        self._disk_put(key, blob)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.memory_entries,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir is not None else 0,
+                "hits": dict(self._hits),
+                "misses": self._misses,
+            }
+
+    def _memory_put(self, key: str, blob: bytes) -> None:
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = blob
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Bump mtime so eviction approximates LRU rather than FIFO.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return blob
+
+    def _disk_put(self, key: str, blob: bytes) -> None:
+        if self.disk_dir is None or len(blob) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        previous = path.stat().st_size if path.exists() else 0
+        tmp_path = path.with_suffix(f".{os.getpid()}.{get_ident()}.tmp")
+        tmp_path.write_bytes(blob)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += len(blob) - previous
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        assert self.disk_dir is not None
+        entries = []
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
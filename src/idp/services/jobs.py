@@ -0,0 +1,354 @@
+"""Persistent job queue for extractions that outlive an HTTP request.
+
+`POST /jobs` stores the upload under `JobSettings.upload_dir`, records a
+`queued` row in a local SQLite database and returns the job ID at once.
+`JobQueue` worker threads claim the highest-priority queued job (oldest
+first within a priority), run it through the shared `ExtractionPipeline`
+and store the response as the job result. The pipeline's progress callback
+updates `pages_done` / `pages_total` as OCR finishes pages, so `GET
+/jobs/{id}` can report progress while the job runs.
+
+Jobs survive restarts: anything left `running` by a crash is put back in the
+queue when the store opens. Several API processes can share the database
+(claims are a single `UPDATE ... RETURNING`); there the launcher recovers
+once before starting them and the workers open the store with
+`recover=False`, so a worker starting late cannot requeue a sibling's jobs.
+
+Each store claims jobs under its own owner ID, and the queue's maintenance
+thread refreshes `heartbeat_at` on the jobs it is running every
+`JobSettings.heartbeat_interval_s`. A `running` job whose heartbeat is older
+than `stale_after_s` belongs to a worker that died (e.g. one uvicorn
+restarted after a crash) and is requeued by whichever queue notices first;
+if its old owner does come back, its late result is ignored. The same
+thread deletes `done` and `failed` jobs, results included, `retention_s`
+after they finished.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional
+
+import orjson
+
+from idp.config import get_settings
+from idp.config.settings import JobSettings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    pdf_path TEXT NOT NULL,
+    filename TEXT,
+    use_cache INTEGER NOT NULL DEFAULT 1,
+    content_hash TEXT,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result BLOB,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, seq);
+"""
+
+# Columns added after the first release; ALTERed into older databases.
+_ADDED_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL"}
+
+_COLUMNS = (
+    "id, status, priority, pdf_path, filename, use_cache, content_hash, pages_done, pages_total, "
+    "created_at, started_at, finished_at, error"
+)
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    priority: int
+    pdf_path: str
+    filename: Optional[str]
+    use_cache: bool
+    content_hash: Optional[str]
+    pages_done: int
+    pages_total: Optional[int]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    error: Optional[str]
+
+    def to_dict(self) -> Dict:
+        payload = asdict(self)
+        del payload["pdf_path"], payload["content_hash"]
+        payload["progress"] = {"pages_done": payload.pop("pages_done"), "pages_total": payload.pop("pages_total")}
+        return payload
+
+
+class JobStore:
+    """SQLite-backed job table; safe to share across threads."""
+
+    def __init__(self, db_path: Path, recover: bool = True) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in _ADDED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self._lock = Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if recover:
+            self.recover()
+
+    def recover(self) -> int:
+        """Requeue jobs left `running` by a process that died; returns how many."""
+        recovered = self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL WHERE status = 'running'"
+        )
+        if recovered.rowcount:
+            logger.info("requeued %d jobs interrupted by a restart", recovered.rowcount)
+        return recovered.rowcount
+
+    def heartbeat(self) -> None:
+        """Mark this store's running jobs as alive."""
+        self._execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?", (time.time(), self.owner)
+        )
+
+    def requeue_stale(self, stale_after_s: float) -> int:
+        """Requeue running jobs whose owner has not sent a heartbeat for `stale_after_s`."""
+        requeued = self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (time.time() - stale_after_s,),
+        )
+        if requeued.rowcount:
+            logger.warning("requeued %d jobs whose worker stopped sending heartbeats", requeued.rowcount)
+        return requeued.rowcount
+
+    def purge(self, retention_s: float) -> int:
+        """Delete done and failed jobs, with their results, that finished over `retention_s` ago."""
+        purged = self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - retention_s,),
+        )
+        return purged.rowcount
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def add(
+        self,
+        job_id: str,
+        pdf_path: Path,
+        filename: Optional[str],
+        priority: int,
+        use_cache: bool,
+        content_hash: Optional[str] = None,
+    ) -> Job:
+        self._execute(
+            "INSERT INTO jobs (id, status, priority, pdf_path, filename, use_cache, content_hash, created_at) "
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, priority, str(pdf_path), filename, int(use_cache), content_hash, time.time()),
+        )
+        return self.get(job_id)
+
+    def claim(self) -> Optional[Job]:
+        """Mark the next queued job running and return it."""
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                UPDATE jobs SET status = 'running', started_at = ?1, heartbeat_at = ?1, owner = ?2
+                WHERE seq = (
+                    SELECT seq FROM jobs WHERE status = 'queued' ORDER BY priority DESC, seq LIMIT 1
+                )
+                RETURNING {_COLUMNS}
+                """,
+                (time.time(), self.owner),
+            ).fetchone()
+        return _job(row) if row else None
+
+    # Updates to a running job only apply while this store still owns it; a
+    # job requeued as stale may already be running elsewhere. `finish` and
+    # `fail` return whether the update applied.
+
+    def progress(self, job_id: str, pages_done: int, pages_total: int) -> None:
+        self._execute(
+            "UPDATE jobs SET pages_done = ?, pages_total = ? WHERE id = ? AND owner = ?",
+            (pages_done, pages_total, job_id, self.owner),
+        )
+
+    def finish(self, job_id: str, result: Dict) -> bool:
+        return self._execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, result = ? WHERE id = ? AND owner = ?",
+            (time.time(), orjson.dumps(result), job_id, self.owner),
+        ).rowcount == 1
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ? AND owner = ?",
+            (time.time(), error, job_id, self.owner),
+        ).rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _job(row: tuple) -> Job:
+    job = Job(*row)
+    job.use_cache = bool(job.use_cache)
+    return job
+
+
+class JobQueue:
+    def __init__(
+        self,
+        store: JobStore,
+        pipeline,
+        upload_dir: Path,
+        workers: int = 1,
+        poll_interval_s: float = 1.0,
+        heartbeat_interval_s: float = 10.0,
+        stale_after_s: float = 120.0,
+        retention_s: float = 7 * 86400,
+    ) -> None:
+        self.store = store
+        self.pipeline = pipeline
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.poll_interval_s = poll_interval_s
+        self.heartbeat_interval_s = heartbeat_interval_s
+        self.stale_after_s = stale_after_s
+        self.retention_s = retention_s
+        self._wake = Event()
+        self._stop = Event()
+        self._threads: List[Thread] = []
+
+    @classmethod
+    def from_settings(cls, pipeline, settings: JobSettings | None = None, recover: bool = True) -> "JobQueue":
+        jobs = settings or get_settings().jobs
+        return cls(
+            JobStore(jobs.db_path, recover=recover),
+            pipeline,
+            upload_dir=jobs.upload_dir,
+            workers=jobs.workers,
+            poll_interval_s=jobs.poll_interval_s,
+            heartbeat_interval_s=jobs.heartbeat_interval_s,
+            stale_after_s=jobs.stale_after_s,
+            retention_s=jobs.retention_s,
+        )
+
+    def start(self) -> None:
+        thread = Thread(target=self._maintain, name="idp-job-maintenance", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        for i in range(self.workers):
+            thread = Thread(target=self._work, name=f"idp-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def maintain(self) -> None:
+        """One maintenance tick: heartbeat, requeue stale jobs, purge expired ones."""
+        self.store.heartbeat()
+        if self.store.requeue_stale(self.stale_after_s):
+            self._wake.set()
+        if self.retention_s:
+            purged = self.store.purge(self.retention_s)
+            if purged:
+                logger.info("purged %d finished jobs past retention", purged)
+
+    def submit(
+        self,
+        source: Path,
+        filename: Optional[str] = None,
+        priority: int = 0,
+        use_cache: bool = True,
+        content_hash: Optional[str] = None,
+    ) -> Job:
+        """Queue the PDF at `source`; the file is moved into `upload_dir` and owned by the queue."""
+        job_id = str(uuid.uuid4())
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        pdf_path = self.upload_dir / f"{job_id}.pdf"
+        shutil.move(str(source), pdf_path)
+        job = self.store.add(job_id, pdf_path, filename, priority, use_cache, content_hash)
+        self._wake.set()
+        return job
+
+    def run_one(self) -> bool:
+        """Claim and run one job on the calling thread; False when the queue is empty."""
+        job = self.store.claim()
+        if job is None:
+            return False
+        pdf_path = Path(job.pdf_path)
+        try:
+            result = self.pipeline.extract(
+                pdf_path,
+                use_cache=job.use_cache,
+                content_hash=job.content_hash,
+                request_id=job.id,
+                progress=lambda done, total: self.store.progress(job.id, done, total),
+            )
+        except Exception as exc:
+            logger.exception("job %s failed", job.id)
+            settled = self.store.fail(job.id, str(exc))
+        else:
+            settled = self.store.finish(job.id, result)
+        if settled:
+            pdf_path.unlink(missing_ok=True)
+        else:
+            # Requeued as stale meanwhile; the upload belongs to its new run.
+            logger.warning("job %s was requeued while running here; result discarded", job.id)
+        return True
+
+    def _maintain(self) -> None:
+        while True:
+            try:
+                self.maintain()
+            except sqlite3.Error:
+                logger.exception("job maintenance failed")
+            if self._stop.wait(self.heartbeat_interval_s):
+                return
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            if self.run_one():
+                continue
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+
+    def shutdown(self) -> None:
+        """Stop the workers after their current job; queued jobs stay in the store."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        self.store.close()
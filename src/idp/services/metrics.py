@@ -1,6 +1,18 @@
+"""Prometheus metrics.
+
+Each API process keeps its own values. Under `idp.serve --workers N`
+the launcher sets `PROMETHEUS_MULTIPROC_DIR`, prometheus_client writes
+values to per-process files there, and `render_latest` merges all of them,
+so `/metrics` on any worker reports the whole deployment. Gauges declare a
+`multiprocess_mode`; it is ignored in a single process.
+"""
 from __future__ import annotations
 
-from prometheus_client import Counter, Histogram
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+MULTIPROC_ENV = "PROMETHEUS_MULTIPROC_DIR"
 
 EXTRACTION_LATENCY = Histogram(
     "idp_extraction_latency_ms",
@@ -19,3 +31,116 @@ DOCUMENT_PROCESSED = Counter(
     "Documents processed",
     labelnames=("doc_type",),
 )
+
+PIPELINE_QUEUE_DEPTH = Gauge(
+    "idp_pipeline_queue_depth",
+    "Extraction requests waiting for a pipeline slot",
+    multiprocess_mode="livesum",
+)
+
+PIPELINE_IN_FLIGHT = Gauge(
+    "idp_pipeline_in_flight",
+    "Extraction requests currently running on the pipeline executor",
+    multiprocess_mode="livesum",
+)
+
+PIPELINE_QUEUE_WAIT = Histogram(
+    "idp_pipeline_queue_wait_ms",
+    "Time a request waited for a pipeline slot",
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+)
+
+ADMISSION_REJECTED = Counter(
+    "idp_admission_rejected_total",
+    "Extraction requests rejected by admission control",
+    labelnames=("status",),
+)
+
+RESULT_CACHE_HITS = Counter(
+    "idp_result_cache_hits_total",
+    "Extraction results served from the content-addressed cache",
+    labelnames=("tier",),
+)
+
+RESULT_CACHE_MISSES = Counter(
+    "idp_result_cache_misses_total",
+    "Extraction result cache lookups that found nothing",
+)
+
+PAGE_CACHE_HITS = Counter(
+    "idp_page_ocr_cache_hits_total",
+    "Pages whose OCR result was served from the page cache",
+)
+
+PAGE_CACHE_MISSES = Counter(
+    "idp_page_ocr_cache_misses_total",
+    "Pages that had to be OCR'd",
+)
+
+BLANK_PAGES_SKIPPED = Counter(
+    "idp_blank_pages_skipped_total",
+    "Pages classified as blank and never sent to OCR",
+)
+
+PAGES_BY_SOURCE = Counter(
+    "idp_pages_total",
+    "Pages processed, by where their tokens came from",
+    labelnames=("source",),
+)
+
+RENDER_DPI = Histogram(
+    "idp_render_dpi",
+    "DPI each OCR'd page was rendered at (varies per page with adaptive DPI)",
+    buckets=(100, 150, 200, 250, 300, 350, 400, 600),
+)
+
+ROI_COVERAGE = Histogram(
+    "idp_roi_coverage_ratio",
+    "Share of a page's pixels OCR'd at full resolution in region-of-interest mode",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0),
+)
+
+ROI_FALLBACKS = Counter(
+    "idp_roi_fallbacks_total",
+    "Full-page OCR passes in region-of-interest mode (per page, or per document for missing fields)",
+    labelnames=("reason",),
+)
+
+ANALYTICS_BUFFERED_ROWS = Gauge(
+    "idp_analytics_buffered_rows",
+    "Extraction rows waiting in the analytics write buffer",
+    multiprocess_mode="livesum",
+)
+
+ANALYTICS_ROWS_DROPPED = Counter(
+    "idp_analytics_rows_dropped_total",
+    "Extraction rows discarded by the analytics writer",
+    labelnames=("reason",),
+)
+
+STAGE_LATENCY = Histogram(
+    "idp_stage_latency_ms",
+    "Latency of one pipeline stage; per-page stages observe once per page",
+    labelnames=("stage", "pages", "dpi"),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+)
+
+PROFILES_WRITTEN = Counter(
+    "idp_profiles_written_total",
+    "Sampled request profiles written to ServiceSettings.profile_dir",
+)
+
+
+def render_latest() -> bytes:
+    """Exposition text for `/metrics`, summed across processes in multi-process mode."""
+    if not os.environ.get(MULTIPROC_ENV):
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid: int | None = None) -> None:
+    """Drop this process's live gauges from the multi-process directory on shutdown."""
+    if os.environ.get(MULTIPROC_ENV):
+        multiprocess.mark_process_dead(pid if pid is not None else os.getpid())
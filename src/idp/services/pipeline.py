@@ -3,89 +3,218 @@ from __future__ import annotations
 import tempfile
 import time
 import uuid
+from contextlib import closing
+from functools import partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Optional
 
 from idp.config import get_settings
 from idp.models.extractor import HeuristicExtractor
-from idp.ocr.preprocess import PreprocessConfig, preprocess_pdf
-from idp.ocr.tesseract_engine import OCRResult, OCRToken, run_tesseract
+from idp.models.layout import LayoutExtractor
+from idp.ocr.page_cache import PageOCRCache
+from idp.ocr.parallel import ParallelOCREngine, prefetch
+from idp.ocr.preprocess import PageImage, PageStream, PreprocessConfig
+from idp.ocr.roi import missing_required, roi_ocr_page
+from idp.ocr.tesseract_engine import OCRResult
 from idp.postprocess import validators
 from idp.postprocess.analytics import aggregate_failures, persist_run
-from idp.services.metrics import DOCUMENT_PROCESSED, EXTRACTION_LATENCY, VALIDATION_FAILURES
+from idp.services.cache import ResultCache, cache_key, file_digest, pipeline_fingerprint
+from idp.services.metrics import DOCUMENT_PROCESSED, EXTRACTION_LATENCY, ROI_FALLBACKS, VALIDATION_FAILURES
+from idp.services.profiling import RequestProfiler, stage, stage_labels
 from idp.utils.logging import traced
 
+# progress(pages_done, pages_total)
+ProgressFn = Callable[[int, int], None]
+
 
 class ExtractionPipeline:
     def __init__(self) -> None:
         self.settings = get_settings()
-        self.extractor = HeuristicExtractor()
-
-    def _run_ocr(self, image_paths: List[Path]) -> OCRResult:
-        tokens: List[OCRToken] = []
-        full_text_parts: List[str] = []
-        metadata: Dict = {"pages": len(image_paths)}
-        for idx, image in enumerate(image_paths, start=1):
-            page_result = run_tesseract(image)
-            for token in page_result.tokens:
-                token.page_num = idx
-                tokens.append(token)
-            full_text_parts.append(page_result.full_text)
-        metadata["avg_confidence"] = (
-            sum(t.confidence for t in tokens) / len(tokens) if tokens else 0.0
+        self.extractor = (
+            LayoutExtractor() if self.settings.extraction.mode == "layout" else HeuristicExtractor()
+        )
+        self.page_cache: Optional[PageOCRCache] = (
+            PageOCRCache.from_settings(self.settings.cache) if self.settings.cache.pages_enabled else None
         )
-        return OCRResult(tokens=tokens, full_text="\n".join(full_text_parts), metadata=metadata)
+        self.ocr_engine = ParallelOCREngine.from_settings(self.settings.ocr, page_cache=self.page_cache)
+        self.result_cache: Optional[ResultCache] = (
+            ResultCache.from_settings(self.settings.cache) if self.settings.cache.enabled else None
+        )
+        self.profiler = RequestProfiler.from_settings()
 
-    def extract(self, pdf_path: Path) -> Dict:
-        request_id = str(uuid.uuid4())
-        with traced("extraction"):
-            start = time.perf_counter()
+    def _run_ocr(
+        self,
+        images: Iterable[PageImage],
+        on_page: Optional[Callable[[int], None]] = None,
+        roi: bool = False,
+    ) -> OCRResult:
+        page_fn = partial(roi_ocr_page, lowres_scale=self.settings.ocr.roi_lowres_scale) if roi else None
+        return self.ocr_engine.run(images, on_page=on_page, page_fn=page_fn)
 
-            # Hold every intermediate artifact inside a single tempdir so the OS
-            # cleans up regardless of how the request exits.
-            with tempfile.TemporaryDirectory(prefix="idp_") as tmp:
-                work_dir = Path(tmp)
-                preprocess_result = preprocess_pdf(
-                    pdf_path, work_dir, PreprocessConfig(dpi=self.settings.ocr.dpi)
-                )
-                ocr_result = self._run_ocr(preprocess_result.images)
-
-            extraction_result = self.extractor.extract(ocr_result)
-            fields = {
-                pred.name: {"value": pred.value, "confidence": pred.confidence}
-                for pred in extraction_result.fields
-            }
-            validation = validators.validate_fields(
-                {k: v.get("value") for k, v in fields.items()}
+    def close(self) -> None:
+        self.ocr_engine.close()
+
+    def cache_stats(self) -> Dict:
+        return {
+            "results": self.result_cache.stats() if self.result_cache is not None else None,
+            "pages": self.page_cache.stats() if self.page_cache is not None else None,
+        }
+
+    def _preprocess_config(self) -> PreprocessConfig:
+        pre = self.settings.preprocess
+        return PreprocessConfig(
+            dpi=self.settings.ocr.dpi,
+            in_memory=self.settings.ocr.in_memory,
+            adaptive_dpi=self.settings.ocr.adaptive_dpi,
+            adaptive_preview_dpi=self.settings.ocr.adaptive_preview_dpi,
+            adaptive_min_dpi=self.settings.ocr.adaptive_min_dpi,
+            adaptive_max_dpi=self.settings.ocr.adaptive_max_dpi,
+            adaptive_target_glyph_px=self.settings.ocr.adaptive_target_glyph_px,
+            deskew_method=pre.deskew_method,
+            deskew_sample_px=pre.deskew_sample_px,
+            deskew_max_angle=pre.deskew_max_angle,
+            deskew_min_angle=pre.deskew_min_angle,
+            use_text_layer=pre.use_text_layer,
+            text_layer_min_words=pre.text_layer_min_words,
+            text_layer_min_alnum_ratio=pre.text_layer_min_alnum_ratio,
+            text_layer_verify=pre.text_layer_verify,
+            text_layer_verify_dpi=pre.text_layer_verify_dpi,
+            text_layer_max_uncovered=pre.text_layer_max_uncovered,
+            skip_blank=pre.skip_blank_pages,
+            blank_sample_px=pre.blank_sample_px,
+            blank_ink_delta=pre.blank_ink_delta,
+            blank_min_glyphs=pre.blank_min_glyphs,
+            blank_min_glyph_pt=pre.blank_min_glyph_pt,
+        )
+
+    def _cache_key(self, pdf_path: Path, content_hash: Optional[str]) -> str:
+        return cache_key(
+            content_hash or file_digest(pdf_path),
+            pipeline_fingerprint(self.settings, self._preprocess_config()),
+        )
+
+    def _process(self, pdf_path: Path, progress: Optional[ProgressFn] = None) -> Dict:
+        """Run preprocess → OCR → extract → validate; the cacheable part of a response."""
+        # Pages are rendered one at a time and streamed into OCR; at most
+        # `prefetch_pages` + `max_pending_pages` pages are alive at once.
+        # In the on-disk fallback every intermediate artifact lives in a
+        # single tempdir so the OS cleans up however the request exits.
+        cfg = self._preprocess_config()
+        with tempfile.TemporaryDirectory(prefix="idp_") as tmp:
+            with stage("page_count"):
+                pages = PageStream(pdf_path, Path(tmp), cfg)
+            with stage_labels(pages.page_count, cfg.dpi):
+                on_page = None
+                if progress is not None:
+                    total = pages.page_count
+                    progress(0, total)
+                    on_page = lambda done: progress(done, total)  # noqa: E731
+                roi = self.settings.ocr.roi_mode
+                with stage("ocr"), closing(prefetch(pages, self.settings.ocr.prefetch_pages)) as page_iter:
+                    ocr_result = self._run_ocr(page_iter, on_page=on_page, roi=roi)
+                with stage("extract"):
+                    extraction_result = self.extractor.extract(ocr_result)
+                if roi and missing_required(extraction_result, self.settings.ocr.roi_required_fields):
+                    # ROI OCR skipped something the extractor needed: redo the
+                    # document with full-page OCR.
+                    ROI_FALLBACKS.labels("missing_fields").inc()
+                    pages = PageStream(pdf_path, Path(tmp) / "full", cfg)
+                    with stage("ocr_full"), closing(prefetch(pages, self.settings.ocr.prefetch_pages)) as page_iter:
+                        ocr_result = self._run_ocr(page_iter)
+                    with stage("extract"):
+                        extraction_result = self.extractor.extract(ocr_result)
+                fields = {
+                    pred.name: {"value": pred.value, "confidence": pred.confidence}
+                    for pred in extraction_result.fields
+                }
+                with stage("validate"):
+                    validation = validators.validate_fields(
+                        {k: v.get("value") for k, v in fields.items()}
+                    )
+        page_entries = []
+        sources = ocr_result.metadata.get("page_sources", [])
+        coverages = ocr_result.metadata.get("roi_coverage", [None] * len(sources))
+        for page_num, (source, coverage) in enumerate(zip(sources, coverages), start=1):
+            entry = {"page": page_num, "source": source, "dpi": pages.page_dpi.get(page_num)}
+            if coverage is not None:
+                entry["roi_coverage"] = coverage
+            page_entries.append(entry)
+        for field_name in fields:
+            fields[field_name]["valid"] = all(
+                err.field != field_name for err in validation.errors
             )
-            for err in validation.errors:
-                VALIDATION_FAILURES.labels(err.field).inc()
-            for field_name in fields:
-                fields[field_name]["valid"] = all(
-                    err.field != field_name for err in validation.errors
-                )
-            DOCUMENT_PROCESSED.labels(extraction_result.document_type).inc()
+        return {
+            "documents": [
+                {
+                    "doc_type": extraction_result.document_type,
+                    "fields": fields,
+                    "validation_summary": {
+                        "errors": [err.__dict__ for err in validation.errors],
+                        "warnings": [warn.__dict__ for warn in validation.warnings],
+                    },
+                }
+            ],
+            "ocr_avg_confidence": ocr_result.metadata.get("avg_confidence", 0.0),
+            "pages": page_entries,
+        }
+
+    def extract(
+        self,
+        pdf_path: Path,
+        use_cache: bool = True,
+        content_hash: Optional[str] = None,
+        request_id: Optional[str] = None,
+        progress: Optional[ProgressFn] = None,
+    ) -> Dict:
+        """Extract fields from `pdf_path`.
+
+        `use_cache=False` skips the cache lookup and recomputes; the fresh
+        result still replaces the cached entry. `content_hash` is the sha256 of
+        the PDF bytes when the caller already has it. `request_id` defaults to
+        a random UUID; batch runs pass stable IDs so they can resume.
+        `progress(pages_done, pages_total)` is called as OCR finishes pages.
+        """
+        request_id = request_id or str(uuid.uuid4())
+        with self.profiler.maybe_profile(request_id), traced("extraction"):
+            start = time.perf_counter()
+
+            processed = None
+            key = None
+            if self.result_cache is not None:
+                with stage("cache_lookup"):
+                    key = self._cache_key(pdf_path, content_hash)
+                    if use_cache:
+                        processed = self.result_cache.get(key)
+            cache_hit = processed is not None
+            if processed is None:
+                processed = self._process(pdf_path, progress=progress)
+                if key is not None:
+                    self.result_cache.put(key, processed)
+            elif progress is not None:
+                page_count = len(processed.get("pages", []))
+                progress(page_count, page_count)
+
+            for doc in processed["documents"]:
+                for err in doc["validation_summary"]["errors"]:
+                    VALIDATION_FAILURES.labels(err["field"]).inc()
+                DOCUMENT_PROCESSED.labels(doc["doc_type"]).inc()
             elapsed_ms = (time.perf_counter() - start) * 1000
             EXTRACTION_LATENCY.observe(elapsed_ms)
 
             response = {
                 "request_id": request_id,
-                "documents": [
-                    {
-                        "doc_type": extraction_result.document_type,
-                        "fields": fields,
-                        "validation_summary": {
-                            "errors": [err.__dict__ for err in validation.errors],
-                            "warnings": [warn.__dict__ for warn in validation.warnings],
-                        },
-                    }
-                ],
+                "documents": processed["documents"],
                 "metrics": {
                     "processing_time_ms": elapsed_ms,
-                    "ocr_avg_confidence": ocr_result.metadata.get("avg_confidence", 0.0),
+                    "ocr_avg_confidence": processed["ocr_avg_confidence"],
+                    "pages": processed.get("pages", []),
+                    "cache_hit": cache_hit,
                 },
                 "analytics": {},
             }
-            persist_run(response)
-            response["analytics"]["top_failures"] = aggregate_failures()
+            with stage_labels(len(response["metrics"]["pages"]), self.settings.ocr.dpi):
+                with stage("persist"):
+                    persist_run(response)
+                with stage("aggregate"):
+                    response["analytics"]["top_failures"] = aggregate_failures()
             return response
@@ -0,0 +1,132 @@
+"""Per-stage latency metrics and sampled request profiles.
+
+`stage(name)` times a block into `idp_stage_latency_ms{stage, pages, dpi}`
+and opens a nested `traced` span for it. The `pages` and `dpi` labels are
+bucketed (`page_bucket`, `dpi_bucket`) so they stay at a handful of values,
+and are set once per document with `stage_labels(...)`; stages further down
+(including per-page ones on prefetch and OCR threads, which run in a copy of
+the caller's context) pick them up from a context variable. Outside a
+document they read `unknown`.
+
+`RequestProfiler` runs `cProfile` for a sampled fraction of requests
+(`ServiceSettings.profile_sample_rate`) and writes one `.prof` file per
+profiled request to `profile_dir`, readable with `pstats` or snakeviz.
+cProfile only sees the calling thread; work on the OCR pool shows up as
+time waiting on futures. At most one request per process is profiled at a
+time (Python 3.12+ refuses a second active profiler), so a sampled request
+that overlaps one already being profiled simply runs unprofiled. Profiler
+and file errors are logged and never fail the request.
+"""
+from __future__ import annotations
+
+import cProfile
+import logging
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+
+from idp.config import get_settings
+from idp.services.metrics import PROFILES_WRITTEN, STAGE_LATENCY
+from idp.utils.logging import traced
+
+_PAGE_BUCKETS = ((1, "1"), (5, "2-5"), (20, "6-20"), (100, "21-100"))
+_DPI_BUCKETS = ((150, "<=150"), (300, "151-300"))
+
+logger = logging.getLogger(__name__)
+
+# Held while a request is profiled; one cProfile at a time per process.
+_profiling = Lock()
+
+_labels: ContextVar[Tuple[str, str]] = ContextVar("idp_stage_labels", default=("unknown", "unknown"))
+
+
+def page_bucket(pages: Optional[int]) -> str:
+    if pages is None:
+        return "unknown"
+    for limit, label in _PAGE_BUCKETS:
+        if pages <= limit:
+            return label
+    return ">100"
+
+
+def dpi_bucket(dpi: Optional[int]) -> str:
+    if dpi is None:
+        return "unknown"
+    for limit, label in _DPI_BUCKETS:
+        if dpi <= limit:
+            return label
+    return ">300"
+
+
+@contextmanager
+def stage_labels(pages: Optional[int], dpi: Optional[int]) -> Iterator[None]:
+    token = _labels.set((page_bucket(pages), dpi_bucket(dpi)))
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+@contextmanager
+def stage(name: str, per_page: bool = False) -> Iterator[None]:
+    """Time a pipeline stage; per-page stages log their span at DEBUG."""
+    pages, dpi = _labels.get()
+    start = time.perf_counter()
+    try:
+        with traced(name, level="debug" if per_page else "info"):
+            yield
+    finally:
+        STAGE_LATENCY.labels(name, pages, dpi).observe((time.perf_counter() - start) * 1000)
+
+
+class RequestProfiler:
+    def __init__(self, sample_rate: float = 0.0, profile_dir: Path = Path("data/profiles")) -> None:
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+
+    @classmethod
+    def from_settings(cls) -> "RequestProfiler":
+        service = get_settings().service
+        return cls(sample_rate=service.profile_sample_rate, profile_dir=service.profile_dir)
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def _profile(self, request_id: str) -> Iterator[None]:
+        if not _profiling.acquire(blocking=False):
+            yield  # another request is being profiled
+            return
+        try:
+            profiler: Optional[cProfile.Profile] = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as exc:  # another profiling tool is active
+                logger.warning("not profiling request %s: %s", request_id, exc)
+                profiler = None
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    self._dump(profiler, request_id)
+        finally:
+            _profiling.release()
+
+    def _dump(self, profiler: cProfile.Profile, request_id: str) -> None:
+        path = self.profile_dir / f"{time.strftime('%Y%m%dT%H%M%S')}_{request_id}.prof"
+        try:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(path))
+        except Exception:
+            logger.exception("could not write profile %s", path)
+            return
+        PROFILES_WRITTEN.inc()
+
+    def maybe_profile(self, request_id: str):
+        """Context manager that profiles this request if it is sampled."""
+        return self._profile(request_id) if self.sampled() else nullcontext()
@@ -5,12 +5,20 @@ import sys
 import time
 import uuid
 from contextlib import contextmanager
-from typing import Iterator
+from contextvars import ContextVar
+from typing import Iterator, Optional
 
 import structlog
 
+# Spans below this level are tracked for nesting but not logged. Without it,
+# structlog's default (unconfigured) logger would print per-page DEBUG spans
+# from scripts and tests.
+_min_level = logging.INFO
+
 
 def configure_logging(level: str = "INFO") -> None:
+    global _min_level
+    _min_level = getattr(logging, level, logging.INFO)
     logging.basicConfig(stream=sys.stdout, level=level)
     structlog.configure(
         processors=[
@@ -28,17 +36,41 @@ def get_logger(name: str = __name__):
     return structlog.get_logger(name)
 
 
+def _no_log(*args, **kwargs) -> None:
+    pass
+
+
+_current_span: ContextVar[Optional[dict]] = ContextVar("idp_current_span", default=None)
+
+
 @contextmanager
-def traced(name: str) -> Iterator[dict]:
-    trace_id = str(uuid.uuid4())
+def traced(name: str, level: str = "info") -> Iterator[dict]:
+    """Log a span around a block; spans opened inside it share its `trace_id`.
+
+    Nesting follows `contextvars`, so worker threads started with a copied
+    context (see `idp.ocr.parallel`) attach their spans to the caller's.
+    Per-page spans use `level="debug"` to stay out of INFO logs.
+    """
+    parent = _current_span.get()
+    span = {
+        "trace_id": parent["trace_id"] if parent else str(uuid.uuid4()),
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+    }
+    token = _current_span.set(span)
     start = time.perf_counter()
-    logger = get_logger("tracer").bind(trace_id=trace_id, span=name)
-    logger.info("start")
+    logger = get_logger("tracer").bind(span=name, **span)
+    if getattr(logging, level.upper()) >= _min_level:
+        log = getattr(logger, level)
+    else:
+        log = _no_log
+    log("start")
     try:
-        yield {"trace_id": trace_id}
+        yield span
     except Exception as exc:
         logger.exception("error", error=str(exc))
         raise
     finally:
+        _current_span.reset(token)
         elapsed_ms = (time.perf_counter() - start) * 1000
-        logger.info("end", elapsed_ms=elapsed_ms)
+        log("end", elapsed_ms=elapsed_ms)
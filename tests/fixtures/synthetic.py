@@ -150,3 +150,28 @@ def generate_dataset(out_dir: Path, n_invoices: int = 20, n_ids: int = 10) -> Li
     for i in range(n_ids):
         samples.append(make_id_card(out_dir / f"id_{i:03d}.png", seed=1000 + i))
     return samples
+
+
+def letter_page(source: Path, dpi: int) -> Image.Image:
+    """Paste a rendered sample onto a white letter-size page at `dpi`."""
+    page = Image.new("RGB", (int(8.5 * dpi), int(11 * dpi)), color=(255, 255, 255))
+    sample = Image.open(source).convert("RGB")
+    scale = page.width * 0.8 / sample.width
+    sample = sample.resize((int(sample.width * scale), int(sample.height * scale)))
+    page.paste(sample, (int(page.width * 0.1), int(page.height * 0.05)))
+    return page
+
+
+def make_multipage_pdf(out_path: Path, pages: int = 3, dpi: int = 200, seed: int = 0) -> List[SyntheticSample]:
+    """Write a scanned-style (image-only, no text layer) PDF of `pages` invoices.
+
+    Each page is a different invoice on a letter-size raster at `dpi`; the
+    returned samples give the ground truth per page.
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    samples = [
+        make_invoice(out_path.parent / f"{out_path.stem}_p{i:03d}.png", seed=seed + i) for i in range(pages)
+    ]
+    rasters = [letter_page(sample.image_path, dpi) for sample in samples]
+    rasters[0].save(out_path, format="PDF", save_all=True, append_images=rasters[1:], resolution=float(dpi))
+    return samples
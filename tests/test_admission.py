@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+from idp.services.admission import AdmissionController, AdmissionRejected
+
+
+def test_admission_rejects_when_queue_full():
+    release = threading.Event()
+    controller = AdmissionController(workers=1, max_queue_depth=1, queue_timeout_s=5, retry_after_s=7)
+
+    async def scenario():
+        running = asyncio.create_task(controller.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(controller.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert controller.queue_depth == 1
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.run(lambda: "rejected")
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.retry_after_s == 7
+
+        release.set()
+        assert await running is True
+        assert await queued == "queued"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        controller.shutdown()
+
+
+def test_admission_times_out_waiting_for_slot():
+    release = threading.Event()
+    controller = AdmissionController(workers=1, max_queue_depth=4, queue_timeout_s=0.05)
+
+    async def scenario():
+        running = asyncio.create_task(controller.run(release.wait, 5))
+        await asyncio.sleep(0.02)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.run(lambda: None)
+        assert excinfo.value.status_code == 503
+        release.set()
+        await running
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        controller.shutdown()
+
+
+def test_cancelled_caller_keeps_its_slot_until_the_work_finishes():
+    release = threading.Event()
+    controller = AdmissionController(workers=1, max_queue_depth=0)
+
+    async def scenario():
+        running = asyncio.create_task(controller.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        await asyncio.sleep(0.05)
+        # The thread is still busy, so the slot is too.
+        with pytest.raises(AdmissionRejected):
+            await controller.run(lambda: None)
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await controller.run(lambda: "free") == "free"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        controller.shutdown()
@@ -0,0 +1,214 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import duckdb
+import pytest
+
+import idp.postprocess.analytics as analytics
+from idp.config.settings import Settings, StorageSettings
+from idp.postprocess.analytics import AnalyticsWriter
+
+
+class _Sink:
+    def __init__(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def __call__(self, rows):
+        self.batches.append(list(rows))
+        self.flushed.set()
+
+
+def _rows(n, start=0):
+    return [(f"r{i}", "invoice", "total", str(i), 0.9, True, None) for i in range(start, start + n)]
+
+
+def test_writer_flushes_on_batch_size_and_close():
+    sink = _Sink()
+    writer = AnalyticsWriter(write_fn=sink, capacity=100, batch_rows=10, flush_interval_s=60)
+    writer.submit(_rows(4))
+    writer.submit(_rows(6, start=4))
+    assert sink.flushed.wait(2)
+    writer.submit(_rows(3, start=10))
+    writer.close()
+
+    written = [row[0] for batch in sink.batches for row in batch]
+    assert written == [f"r{i}" for i in range(13)]
+
+
+def test_writer_flushes_on_interval():
+    sink = _Sink()
+    writer = AnalyticsWriter(write_fn=sink, capacity=100, batch_rows=50, flush_interval_s=0.05)
+    try:
+        writer.submit(_rows(2))
+        assert sink.flushed.wait(2)
+    finally:
+        writer.close()
+    assert len(sink.batches[0]) == 2
+
+
+def test_writer_overflow_policies_count_dropped_rows():
+    gate = threading.Event()
+
+    def stalled(rows):
+        gate.wait(2)
+
+    newest = AnalyticsWriter(write_fn=stalled, capacity=5, batch_rows=100, flush_interval_s=60, overflow="drop_newest")
+    oldest = AnalyticsWriter(write_fn=stalled, capacity=5, batch_rows=100, flush_interval_s=60, overflow="drop_oldest")
+    for writer in (newest, oldest):
+        writer.submit(_rows(4))
+        writer.submit(_rows(3, start=4))
+    assert [row[0] for row in newest._buffer] == ["r0", "r1", "r2", "r3", "r4"]
+    assert [row[0] for row in oldest._buffer] == ["r2", "r3", "r4", "r5", "r6"]
+    assert newest.dropped == oldest.dropped == 2
+    gate.set()
+    newest.close()
+    oldest.close()
+
+
+def test_buffer_smaller_than_a_batch_is_flushed_when_full():
+    sink = _Sink()
+    writer = AnalyticsWriter(write_fn=sink, capacity=5, batch_rows=100, flush_interval_s=60)
+    submitter = threading.Thread(target=writer.submit, args=(_rows(12),))
+    submitter.start()
+    submitter.join(5)  # would wait out the 60 s interval per batch otherwise
+
+    assert not submitter.is_alive()
+    writer.close()
+    assert [row[0] for batch in sink.batches for row in batch] == [f"r{i}" for i in range(12)]
+    assert writer.dropped == 0
+
+
+def test_blocked_submitter_counts_its_rows_as_dropped_on_close():
+    sink, gate = _Sink(), threading.Event()
+
+    def stalled(rows):
+        sink(rows)
+        gate.wait(5)
+
+    writer = AnalyticsWriter(write_fn=stalled, capacity=5, batch_rows=100, flush_interval_s=60)
+    writer.submit(_rows(5))
+    assert sink.flushed.wait(2)  # the writer holds r0-r4 and is stalled
+    writer.submit(_rows(5, start=5))  # full again
+    submitter = threading.Thread(target=writer.submit, args=(_rows(3, start=10),))
+    submitter.start()
+    time.sleep(0.05)  # blocked on the full buffer
+
+    closer = threading.Thread(target=writer.close)
+    closer.start()
+    submitter.join(2)
+    assert not submitter.is_alive()
+    gate.set()
+    closer.join(5)
+
+    assert [row[0] for batch in sink.batches for row in batch] == [f"r{i}" for i in range(10)]
+    assert writer.dropped == 3
+    with pytest.raises(RuntimeError):
+        writer.submit(_rows(1))
+
+
+@pytest.fixture
+def new_york_tz(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_persist_run_is_written_by_close_connection(tmp_path, monkeypatch, new_york_tz):
+    settings = Settings(storage=StorageSettings(duckdb_path=tmp_path / "idp.duckdb", write_flush_interval_s=60))
+    monkeypatch.setattr(analytics, "get_settings", lambda: settings)
+    analytics.close_connection()
+    run = {
+        "request_id": "req-1",
+        "documents": [
+            {
+                "doc_type": "invoice",
+                "fields": {
+                    "invoice_number": {"value": "INV-1", "confidence": 0.9, "valid": True},
+                    "total": {"value": "10.00", "confidence": 0.8, "valid": False},
+                },
+            }
+        ],
+    }
+
+    analytics.persist_run(run)
+    assert len(analytics._writer._buffer) == 2  # buffered, not yet written
+    analytics.close_connection()
+
+    con = duckdb.connect(str(tmp_path / "idp.duckdb"))
+    try:
+        rows = con.execute("SELECT field_name, valid FROM extractions ORDER BY field_name").fetchall()
+        stamps = con.execute("SELECT DISTINCT created_at FROM extractions").fetchall()
+    finally:
+        con.close()
+    assert rows == [("invoice_number", True), ("total", False)]
+    # One naive UTC stamp per run, whatever the process's local time zone.
+    assert len(stamps) == 1
+    assert abs((datetime.now(timezone.utc).replace(tzinfo=None) - stamps[0][0]).total_seconds()) < 60
+
+
+def test_failure_counts_reconcile_and_refresh(tmp_path, monkeypatch):
+    db_path = tmp_path / "idp.duckdb"
+    con = duckdb.connect(str(db_path))
+    con.execute(analytics._SCHEMA)
+    con.executemany(
+        "INSERT INTO extractions VALUES (?, 'invoice', ?, '', 0.5, ?, CURRENT_TIMESTAMP)",
+        [("a", "total", False), ("a", "iban", False), ("b", "total", False), ("b", "date", True)],
+    )
+    con.close()
+
+    settings = Settings(storage=StorageSettings(duckdb_path=db_path, write_mode="sync"))
+    monkeypatch.setattr(analytics, "get_settings", lambda: settings)
+    analytics.close_connection()
+    analytics.init_schema()  # pre-upgrade table: summary rebuilt from extractions
+    assert analytics.aggregate_failures() == [{"field": "total", "failures": 2}, {"field": "iban", "failures": 1}]
+
+    analytics.persist_run(
+        {"request_id": "c", "documents": [{"doc_type": "invoice", "fields": {"iban": {"valid": False}}}]}
+    )
+    assert analytics.aggregate_failures(limit=1) == [{"field": "iban", "failures": 2}]
+    analytics.close_connection()
+    analytics.init_schema()  # reloaded from field_failures, which the insert kept in step
+    assert analytics.aggregate_failures() == [{"field": "iban", "failures": 2}, {"field": "total", "failures": 2}]
+    analytics.close_connection()
+
+    counts = analytics.FailureCounts({"total": 1}, refresh_s=60)
+    assert counts.top() == [{"field": "total", "failures": 1}]
+    counts.record({"iban": 5})
+    assert counts.top() == [{"field": "total", "failures": 1}]  # snapshot until the next refresh
+
+
+def test_failures_count_only_rows_that_reach_the_database(tmp_path, monkeypatch):
+    settings = Settings(
+        storage=StorageSettings(duckdb_path=tmp_path / "idp.duckdb", write_flush_interval_s=60, maintenance_interval_s=0)
+    )
+    monkeypatch.setattr(analytics, "get_settings", lambda: settings)
+    analytics.close_connection()
+    analytics.init_schema()
+    failed = {"request_id": "a", "documents": [{"doc_type": "invoice", "fields": {"iban": {"valid": False}}}]}
+    try:
+        analytics.persist_run(failed)
+        assert analytics.aggregate_failures() == []  # still buffered
+
+        def broken(con, deltas):
+            raise duckdb.IOException("disk full")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(analytics, "_add_summary_failures", broken)
+            analytics._get_writer().flush()
+        assert analytics._get_writer().dropped == 1
+        assert analytics.aggregate_failures() == []
+
+        analytics.persist_run(dict(failed, request_id="b"))
+        analytics._get_writer().flush()
+        assert analytics.aggregate_failures() == [{"field": "iban", "failures": 1}]
+    finally:
+        analytics.close_connection()
+    analytics.init_schema()  # field_failures agrees with the counters served before
+    try:
+        assert analytics.aggregate_failures() == [{"field": "iban", "failures": 1}]
+    finally:
+        analytics.close_connection()
@@ -0,0 +1,135 @@
+import json
+import threading
+from pathlib import Path
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from idp.api.main import app
+from idp.services.admission import AdmissionController, AdmissionRejected
+from idp.services.batch import (
+    BatchRunner,
+    completed_request_ids,
+    items_from_directory,
+    items_from_manifest,
+)
+
+
+class _FakePipeline:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def extract(self, pdf_path, use_cache=True, content_hash=None, request_id=None):
+        with self._lock:
+            self.calls.append(Path(pdf_path).name)
+        if Path(pdf_path).name in self.fail:
+            raise RuntimeError("render failed")
+        return {"request_id": request_id, "documents": [], "metrics": {}, "analytics": {}}
+
+
+class _SaturatedAdmission:
+    """Rejects the named documents as a full queue would; runs the rest inline."""
+
+    max_in_flight = 1
+
+    def __init__(self, reject):
+        self.reject = set(reject)
+
+    async def run(self, fn, item, use_cache):
+        if item.source in self.reject:
+            raise AdmissionRejected(429, "Extraction queue is full", 7)
+        return fn(item, use_cache)
+
+
+def _pdfs(directory: Path, names):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b"%PDF-1.4 " + name.encode())
+
+
+def test_batch_resumes_from_previous_output(tmp_path: Path):
+    _pdfs(tmp_path / "in", ["a.pdf", "b.pdf", "c.pdf", "d.pdf"])
+    (tmp_path / "in" / "notes.txt").write_text("ignored")
+    items = items_from_directory(tmp_path / "in")
+    assert [item.source for item in items] == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    assert [item.request_id for item in items] == [item.request_id for item in items_from_directory(tmp_path / "in")]
+
+    out = tmp_path / "out.ndjson"
+    first = _FakePipeline(fail={"c.pdf"})
+    with out.open("ab") as fh:
+        for record in BatchRunner(first, workers=2, max_pending=2).run(items):
+            fh.write(orjson.dumps(record) + b"\n")
+            assert record["status"] == ("error" if record["source"] == "c.pdf" else "ok")
+        fh.write(b'{"request_id": "torn')
+
+    retry = _FakePipeline()
+    records = list(BatchRunner(retry, workers=2).run(items, skip=completed_request_ids(out)))
+
+    assert sorted(first.calls) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    assert retry.calls == ["c.pdf"]
+    assert records[0]["result"]["request_id"] == items[2].request_id
+
+
+def test_manifest_paths_and_ids(tmp_path: Path):
+    _pdfs(tmp_path / "docs", ["x.pdf", "y.pdf"])
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text('# backfill\ndocs/x.pdf\n{"path": "docs/y.pdf", "request_id": "inv-42"}\n')
+    items = items_from_manifest(manifest)
+
+    assert [item.path for item in items] == [tmp_path / "docs" / "x.pdf", tmp_path / "docs" / "y.pdf"]
+    assert items[1].request_id == "inv-42"
+
+
+def _batch_files(names):
+    return [("files", (f"{name}.pdf", b"%PDF-1.4 " + name.encode(), "application/pdf")) for name in names]
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    controller = AdmissionController(workers=2)
+    monkeypatch.setattr(app.state, "admission", controller, raising=False)
+    yield controller
+    controller.shutdown()
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch, admission):
+    pipeline = _FakePipeline()
+    monkeypatch.setattr(app.state, "batch", BatchRunner(pipeline, workers=2), raising=False)
+    client = TestClient(app)
+    files = _batch_files("abc")
+
+    res = client.post("/extract/batch", files=files)
+    records = [json.loads(line) for line in res.text.splitlines()]
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    assert sorted(r["source"] for r in records) == ["a.pdf", "b.pdf", "c.pdf"]
+
+    done = [r["request_id"] for r in records if r["source"] != "b.pdf"]
+    res = client.post("/extract/batch", files=files, data={"skip": done})
+    assert [json.loads(line)["source"] for line in res.text.splitlines()] == ["b.pdf"]
+
+
+def test_batch_endpoint_goes_through_admission(monkeypatch):
+    pipeline = _FakePipeline()
+    monkeypatch.setattr(app.state, "batch", BatchRunner(pipeline, workers=4), raising=False)
+    client = TestClient(app)
+
+    # Saturated before anything ran: the whole batch is turned away like /extract.
+    monkeypatch.setattr(app.state, "admission", _SaturatedAdmission({"a.pdf"}), raising=False)
+    res = client.post("/extract/batch", files=_batch_files("ab"))
+    assert res.status_code == 429
+    assert res.headers["retry-after"] == "7"
+    assert pipeline.calls == []
+
+    # Rejected mid-stream: a `rejected` record that a resend retries.
+    monkeypatch.setattr(app.state, "admission", _SaturatedAdmission({"b.pdf"}), raising=False)
+    res = client.post("/extract/batch", files=_batch_files("ab"))
+    records = {r["source"]: r for r in map(json.loads, res.text.splitlines())}
+    assert res.status_code == 200
+    assert records["a.pdf"]["status"] == "ok"
+    assert records["b.pdf"]["status"] == "rejected"
+    assert records["b.pdf"]["retry_after_s"] == 7
+    assert len(pipeline.calls) == 1
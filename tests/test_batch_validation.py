@@ -0,0 +1,81 @@
+import random
+from datetime import datetime
+
+import duckdb
+import pytest
+
+import idp.postprocess.analytics as analytics
+from idp.postprocess.batch_validation import revalidate_stored, validate_batch
+from idp.postprocess.validators import validate_fields
+
+_VALUES = {
+    "invoice_number": ["INV-1", "-bad", "", None, "A B", 42],
+    "tax_id": ["12-3456789", "123", None],
+    "routing_number": ["021000021", "02100002", None],
+    "bank_account": ["0123456789", "12ab", None],
+    "id_number": ["ID-1", "ID 1", None],
+    "subtotal_amount": ["100.00", "$1,000.00", "abc", None, 100],
+    "tax_amount": ["8.00", "10", None, 8.5],
+    "total_amount": ["108.00", "110.01", "1,010.00", None],
+    "invoice_date": ["2024-03-15", "15/03/2024", "03/16/2024", "soon", None],
+    "due_date": ["2024-03-14", "2024-04-14", None, datetime(2024, 1, 1)],
+    "expiry_date": ["2030-01-01", "1980-01-01", None],
+    "birth_date": ["1990-01-01", "31/12/1990", None],
+}
+
+
+def test_batch_matches_validate_fields_per_document():
+    rng = random.Random(0)
+    docs = [
+        {name: rng.choice(choices) for name, choices in _VALUES.items() if rng.random() < 0.8}
+        for _ in range(2000)
+    ]
+
+    summaries = validate_batch(docs)
+
+    assert summaries == [validate_fields(doc) for doc in docs]
+    assert any(s.errors for s in summaries) and any(s.warnings for s in summaries)
+    assert any(s.is_valid for s in summaries)
+    assert validate_batch([]) == []
+
+
+def test_revalidate_stored_pivots_the_extractions_table():
+    con = duckdb.connect()
+    con.execute(analytics._SCHEMA)
+    docs = {
+        "req-1": {"subtotal_amount": "100.00", "tax_amount": "8.00", "total_amount": "109.00"},
+        "req-2": {"invoice_number": "INV-2", "routing_number": "None", "total_amount": "5"},
+        "req-3": {"expiry_date": "1980-01-01", "birth_date": "1990-01-01", "invoice_date": "2024-03-15"},
+    }
+    con.executemany(
+        "INSERT INTO extractions VALUES (?, 'invoice', ?, ?, 0.9, true, ?)",
+        [(rid, name, value, datetime(2024, 5, 1)) for rid, fields in docs.items() for name, value in fields.items()],
+    )
+
+    stored = list(revalidate_stored(con, batch_docs=2))
+
+    # "None" is how persist_run stores a missing value.
+    expected = {rid: validate_fields({k: v for k, v in f.items() if v != "None"}) for rid, f in docs.items()}
+    assert stored == sorted(expected.items())
+    assert not stored[0][1].is_valid and stored[1][1].is_valid and not stored[2][1].is_valid
+    assert list(revalidate_stored(con, since=datetime(2024, 6, 1))) == []
+    with pytest.raises(ValueError):
+        list(revalidate_stored(con, table="extractions; DROP TABLE extractions"))
+
+
+def test_revalidate_stored_reads_only_the_latest_run_of_a_request():
+    con = duckdb.connect()
+    con.execute(analytics._SCHEMA)
+    runs = [
+        (datetime(2024, 5, 1), {"subtotal_amount": "100", "tax_amount": "10", "total_amount": "110"}),
+        (datetime(2024, 5, 2), {"subtotal_amount": "95", "tax_amount": "5", "total_amount": "100"}),
+    ]
+    con.executemany(
+        "INSERT INTO extractions VALUES ('req-1', 'invoice', ?, ?, 0.9, true, ?)",
+        [(name, value, at) for at, fields in runs for name, value in fields.items()],
+    )
+    # Both runs are valid on their own; mixing them string by string is not.
+    assert all(validate_fields(fields).is_valid for _, fields in runs)
+
+    assert list(revalidate_stored(con)) == [("req-1", validate_fields(runs[1][1]))]
+    assert list(revalidate_stored(con, since=datetime(2024, 5, 1, 12))) == [("req-1", validate_fields(runs[1][1]))]
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from idp.models.extractor import HeuristicExtractor
+from idp.ocr.tesseract_engine import OCRResult
+
+_FRAGMENTS = [
+    "Invoice", "invoice no.", "INVOICE #", "Number:", "Date:", "Due Date", "date of birth", "DOB",
+    "Birth Date", "Subtotal:", "sub-total", "sub total", "Tax:", "Tax Amount", "Tax ID:", "syntax",
+    "Total:", "TOTAL DUE", "Routing Number:", "Routing no", "Account Number:", "account no.", "ID Number:",
+    "paid no", "Identification", "Passport", "Expiry:", "expires", "Form 1040", "IRS", "$1,299.34",
+    "2024-03-15", "3/15/24", "INV-10042", "12-3456789", "123456789", "0123456789", "USD", "-", ":",
+    "P<EXAJOHN<DOE<<<<<<<<<<<<<<<<<", "L898902C36EXA9001011M3001019<", "İnvoice", "ſubtotal", "ıd no",
+    "K", "€", "\n", "  ",
+]
+
+
+def _both(text: str):
+    result = OCRResult(tokens=[], full_text=text, metadata={})
+    return HeuristicExtractor().extract(result), HeuristicExtractor(use_scanner=False).extract(result)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "Invoice Number: INV-1 Invoice Date: 2024-01-02 Subtotal: $1,000.00 Tax: $80.00 Total: $1,080.00",
+        "sub total 5 total 7",
+        "Total: 1 Subtotal: 2",
+        "REPUBLIC OF EXAMPLE - IDENTIFICATION CARD ID Number: ID-1 Date of Birth: 1990-01-01 Expiry: 2030-01-01",
+        "İnvoice Number: X-1 ſubtotal: 3",
+        "paid no 42 Kaccount no 1234567",
+        "Total: €100 İd no 5 P<EXAJOHN<DOE<<<<<<<<<<<<<<<<<",
+        "P<EXAJOHN<DOE<<<<<<<<<<<<<<<<< L898902C36EXA9001011M3001019< " + "A" * 95,
+    ],
+)
+def test_scanner_matches_reference(text: str):
+    scanned, reference = _both(text)
+    assert scanned == reference
+
+
+def test_scanner_matches_reference_on_random_text():
+    rng = random.Random(0)
+    for _ in range(500):
+        text = " ".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(0, 40)))
+        scanned, reference = _both(text)
+        assert scanned == reference, text
@@ -0,0 +1,164 @@
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from idp.api.main import app
+from idp.services.jobs import JobQueue, JobStore
+
+
+class _PagedPipeline:
+    def __init__(self, pages=3, fail=False):
+        self.pages = pages
+        self.fail = fail
+        self.seen = []
+
+    def extract(self, pdf_path, use_cache=True, content_hash=None, request_id=None, progress=None):
+        self.seen.append(Path(pdf_path).read_bytes())
+        for done in range(self.pages + 1):
+            progress(done, self.pages)
+        if self.fail:
+            raise RuntimeError("render failed")
+        return {"request_id": request_id, "documents": [], "metrics": {}, "analytics": {}}
+
+
+def _pdf(tmp_path: Path, contents: bytes) -> Path:
+    path = tmp_path / f"{abs(hash(contents))}.pdf"
+    path.write_bytes(contents)
+    return path
+
+
+@pytest.fixture
+def queue(tmp_path: Path):
+    queue = JobQueue(JobStore(tmp_path / "jobs.sqlite"), _PagedPipeline(), upload_dir=tmp_path / "uploads")
+    yield queue
+    queue.shutdown()
+
+
+def test_jobs_run_by_priority_with_progress(queue, tmp_path: Path):
+    low = queue.submit(_pdf(tmp_path, b"%PDF low"), priority=0)
+    high = queue.submit(_pdf(tmp_path, b"%PDF high"), priority=5)
+    later = queue.submit(_pdf(tmp_path, b"%PDF later"), priority=0)
+
+    while queue.run_one():
+        pass
+
+    assert queue.pipeline.seen == [b"%PDF high", b"%PDF low", b"%PDF later"]
+    job = queue.store.get(high.id)
+    assert job.status == "done"
+    assert job.to_dict()["progress"] == {"pages_done": 3, "pages_total": 3}
+    assert queue.store.result(later.id)["request_id"] == later.id
+    assert queue.store.get(low.id).finished_at <= queue.store.get(later.id).started_at
+    assert not any(queue.upload_dir.iterdir())
+
+
+def test_failed_job_and_restart_recovery(tmp_path: Path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    queue = JobQueue(store, _PagedPipeline(fail=True), upload_dir=tmp_path / "uploads")
+    failed = queue.submit(_pdf(tmp_path, b"%PDF a"))
+    queue.run_one()
+    assert store.get(failed.id).status == "failed"
+    assert store.get(failed.id).error == "render failed"
+
+    interrupted = queue.submit(_pdf(tmp_path, b"%PDF b"))
+    assert store.claim().id == interrupted.id  # crash while running
+    store.close()
+
+    # A sibling worker process opening the store must not requeue it.
+    sibling = JobStore(tmp_path / "jobs.sqlite", recover=False)
+    assert sibling.get(interrupted.id).status == "running"
+    sibling.close()
+
+    reopened = JobStore(tmp_path / "jobs.sqlite")
+    assert reopened.get(interrupted.id).status == "queued"
+    reopened.close()
+
+
+def test_stale_running_jobs_are_requeued_and_old_jobs_purged(tmp_path: Path):
+    db = tmp_path / "jobs.sqlite"
+    crashed, alive = JobStore(db), JobStore(db, recover=False)
+    queue = JobQueue(JobStore(db, recover=False), _PagedPipeline(), upload_dir=tmp_path / "uploads", stale_after_s=0.1)
+    orphan = queue.submit(_pdf(tmp_path, b"%PDF orphan"))
+    running = queue.submit(_pdf(tmp_path, b"%PDF running"))
+    assert crashed.claim().id == orphan.id
+    assert alive.claim().id == running.id
+
+    time.sleep(0.2)
+    alive.heartbeat()
+    queue.maintain()
+    assert queue.store.get(orphan.id).status == "queued"
+    assert queue.store.get(running.id).status == "running"
+
+    # The worker that lost the job comes back: its late result is ignored.
+    crashed.finish(orphan.id, {"request_id": "stale"})
+    assert queue.run_one()
+    assert queue.store.result(orphan.id)["request_id"] == orphan.id
+
+    alive.fail(running.id, "render failed")
+    queue.maintain()
+    assert queue.store.get(orphan.id) is not None  # within retention
+
+    queue.retention_s = 0.1
+    time.sleep(0.2)
+    queue.maintain()
+    assert queue.store.get(orphan.id) is None
+    assert queue.store.get(running.id) is None
+    assert queue.store.counts() == {}
+    crashed.close()
+    alive.close()
+    queue.shutdown()
+
+
+class _StalledPipeline:
+    """Runs past `stale_after_s`; meanwhile another queue's maintenance requeues the job."""
+
+    def __init__(self, other: JobQueue):
+        self.other = other
+
+    def extract(self, pdf_path, use_cache=True, content_hash=None, request_id=None, progress=None):
+        time.sleep(0.1)
+        self.other.maintain()
+        return {"request_id": "late", "documents": [], "metrics": {}, "analytics": {}}
+
+
+def test_late_finish_of_requeued_job_keeps_its_upload(tmp_path: Path):
+    db, uploads = tmp_path / "jobs.sqlite", tmp_path / "uploads"
+    new = JobQueue(JobStore(db), _PagedPipeline(), upload_dir=uploads, stale_after_s=0.05)
+    old = JobQueue(JobStore(db, recover=False), _StalledPipeline(new), upload_dir=uploads)
+    job = old.submit(_pdf(tmp_path, b"%PDF late"))
+
+    assert old.run_one()
+    assert old.store.get(job.id).status == "queued"  # the late result was discarded
+    assert Path(job.pdf_path).exists()
+
+    assert new.run_one()
+    assert new.pipeline.seen == [b"%PDF late"]
+    assert new.store.result(job.id)["request_id"] == job.id
+    assert not Path(job.pdf_path).exists()
+    old.shutdown()
+    new.shutdown()
+
+
+def test_jobs_endpoints(tmp_path: Path, monkeypatch):
+    queue = JobQueue(
+        JobStore(tmp_path / "jobs.sqlite"), _PagedPipeline(), upload_dir=tmp_path / "uploads", poll_interval_s=0.01
+    )
+    monkeypatch.setattr(app.state, "jobs", queue, raising=False)
+    client = TestClient(app)
+
+    res = client.post("/jobs?priority=2", files={"file": ("big.pdf", b"%PDF-1.4 big", "application/pdf")})
+    assert res.status_code == 202
+    job_id = res.json()["id"]
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    queue.start()
+    deadline = time.monotonic() + 5
+    while client.get(f"/jobs/{job_id}").json()["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    res = client.get(f"/jobs/{job_id}/result")
+    assert res.status_code == 200
+    assert res.json()["request_id"] == job_id
+    assert client.get("/jobs/unknown").status_code == 404
+    queue.shutdown()
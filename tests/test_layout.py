@@ -0,0 +1,94 @@
+import random
+
+from idp.models.extractor import HeuristicExtractor
+from idp.models.layout import LayoutExtractor
+from idp.ocr.tesseract_engine import OCRResult, OCRToken
+from idp.ocr.token_index import TokenGrid
+
+
+def _line(words, x, y, page=1, h=20):
+    """Tokens for `words` laid out left to right from (x, y), 12 px per character."""
+    tokens = []
+    for word in words:
+        tokens.append(OCRToken(word, 0.9, (x, y, x + 12 * len(word), y + h), page))
+        x += 12 * len(word) + 10
+    return tokens
+
+
+def _result(tokens):
+    return OCRResult(tokens=tokens, full_text=" ".join(t.text for t in tokens), metadata={})
+
+
+def test_grid_queries_match_brute_force():
+    rng = random.Random(0)
+    tokens = []
+    for _ in range(800):
+        x, y = rng.randrange(0, 2400), rng.randrange(0, 3200)
+        tokens.append(OCRToken("w", 0.9, (x, y, x + rng.randrange(5, 150), y + rng.randrange(10, 40)), 1))
+    grid = TokenGrid(tokens)
+
+    for query in rng.sample(tokens, 50):
+        x0, y0, x1, y1 = query.bbox
+        start_x, start_y = max(x0 + 1, x1 - (y1 - y0) // 4), max(y0 + 1, y1 - (y1 - y0) // 4)
+        right = sorted(
+            (t for t in tokens
+             if t.bbox[0] >= start_x and 2 * (min(y1, t.bbox[3]) - max(y0, t.bbox[1])) >= min(y1 - y0, t.bbox[3] - t.bbox[1])),
+            key=lambda t: t.bbox[0],
+        )
+        below = [t for t in tokens if t.bbox[1] >= start_y and min(x1, t.bbox[2]) > max(x0, t.bbox[0])]
+        assert [t.bbox[0] for t in grid.right_of(query.bbox)] == [t.bbox[0] for t in right]
+        assert sorted(map(id, grid.below(query.bbox))) == sorted(map(id, below))
+        assert [t.bbox[1] for t in grid.below(query.bbox)] == sorted(t.bbox[1] for t in below)
+        assert all(t.bbox[0] <= x1 + 100 for t in grid.right_of(query.bbox, max_gap=100))
+
+
+def test_layout_links_values_below_table_headers():
+    # Tesseract reads the header row first, so the flattened text is
+    # "Invoice Number Invoice Date INV-77 2024-03-15" and the regexes pick
+    # "Invoice" as the number.
+    tokens = _line(["Invoice", "Number"], 100, 100) + _line(["Invoice", "Date"], 600, 100)
+    tokens += _line(["INV-77"], 100, 130) + _line(["2024-03-15"], 600, 130)
+    tokens += _line(["Total:", "$1,080.00"], 100, 300)
+    result = _result(tokens)
+
+    regex = {p.name: p.value for p in HeuristicExtractor().extract(result).fields}
+    layout = LayoutExtractor().extract(result)
+
+    assert regex["invoice_number"] == "Invoice"
+    assert {p.name: p.value for p in layout.fields} == {
+        "invoice_number": "INV-77",
+        "invoice_date": "2024-03-15",
+        "total_amount": "1080.00",
+    }
+    assert {p.name: p.extra["link"] for p in layout.fields} == {
+        "invoice_number": "below",
+        "invoice_date": "below",
+        "total_amount": "right",
+    }
+    assert layout.document_type == "invoice"
+
+
+def test_layout_prefers_longer_labels_and_nearest_value():
+    tokens = _line(["Sub", "Total:", "USD", "100.00"], 100, 100)
+    tokens += _line(["Tax", "ID:", "12-3456789"], 100, 140)
+    tokens += _line(["Total", "Due:", "$", "108.00"], 100, 180)
+    tokens += _line(["Due", "Date:", "2024-04-14"], 100, 220)
+    tokens += _line(["Invoice", "No.", "see", "below", "A-1"], 100, 260, page=2)
+
+    fields = {p.name: (p.value, p.source) for p in LayoutExtractor().extract(_result(tokens)).fields}
+
+    assert {name: value for name, (value, source) in fields.items() if source == "layout"} == {
+        "subtotal_amount": "100.00",
+        "tax_id": "12-3456789",
+        "total_amount": "108.00",
+        "due_date": "2024-04-14",
+    }
+    # No layout link for these, so the regex matches stand.
+    assert fields["invoice_number"] == ("see", "regex")
+    assert fields["invoice_date"] == ("2024-04-14", "regex")
+
+
+def test_layout_without_tokens_is_the_regex_result():
+    result = OCRResult(tokens=[], full_text="Invoice Number: INV-1 Total: $5.00", metadata={})
+
+    assert LayoutExtractor().extract(result) == HeuristicExtractor().extract(result)
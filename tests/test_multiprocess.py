@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import duckdb
+import pytest
+
+import idp.postprocess.analytics as analytics
+from idp.config.settings import Settings, StorageSettings
+from idp.postprocess.analytics_ipc import WRITER_ENV, AnalyticsClient
+from idp.services import metrics
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+
+_ctx = multiprocessing.get_context("spawn")
+
+
+def _run(request_id: str) -> dict:
+    return {
+        "request_id": request_id,
+        "documents": [
+            {
+                "doc_type": "invoice",
+                "fields": {
+                    "invoice_number": {"value": "INV-1", "confidence": 0.9, "valid": True},
+                    "total_amount": {"value": "10.00", "confidence": 0.8, "valid": False},
+                },
+            }
+        ],
+    }
+
+
+def _writer_process(address: str, db_path: str, ready) -> None:
+    settings = Settings(storage=StorageSettings(duckdb_path=Path(db_path), maintenance_interval_s=0))
+    analytics.get_settings = lambda: settings
+    analytics.run_writer(address, ready)
+
+
+def _poll(read, done, timeout: float = 30.0):
+    """Failures count once the writer flushes them, within its flush interval."""
+    deadline = time.monotonic() + timeout
+    value = read()
+    while not done(value) and time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = read()
+    return value
+
+
+def _worker_process(address: str, worker: int, runs: int) -> None:
+    os.environ[WRITER_ENV] = address
+    for i in range(runs):
+        analytics.persist_run(_run(f"w{worker}-{i}"))
+    top = _poll(analytics.aggregate_failures, lambda top: bool(top) and top[0]["failures"] >= runs)
+    assert top[0]["failures"] >= runs
+    analytics.close_connection()
+
+
+def _count_process(doc_type: str) -> None:
+    metrics.DOCUMENT_PROCESSED.labels(doc_type).inc()
+
+
+def _start_writer(tmp_path: Path):
+    address = str(tmp_path / "analytics.sock")
+    ready = _ctx.Event()
+    writer = _ctx.Process(target=_writer_process, args=(address, str(tmp_path / "idp.duckdb"), ready))
+    writer.start()
+    assert ready.wait(30), "writer did not start"
+    return writer, address
+
+
+def test_worker_processes_write_through_one_writer(tmp_path):
+    writer, address = _start_writer(tmp_path)
+    try:
+        workers = [_ctx.Process(target=_worker_process, args=(address, w, 25)) for w in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+        assert [worker.exitcode for worker in workers] == [0, 0, 0]
+        client = AnalyticsClient(address)
+        expected = [{"field": "total_amount", "failures": 75}]
+        assert _poll(client.top, lambda top: top == expected) == expected
+        client.close()
+    finally:
+        writer.terminate()  # SIGTERM: drain the buffer, close DuckDB
+        writer.join(30)
+    assert writer.exitcode == 0
+    assert not Path(address).exists()
+
+    con = duckdb.connect(str(tmp_path / "idp.duckdb"))
+    try:
+        assert con.execute("SELECT count(*), count(DISTINCT request_id) FROM extractions").fetchone() == (150, 75)
+        assert con.execute("SELECT * FROM field_failures").fetchall() == [("total_amount", 75)]
+    finally:
+        con.close()
+
+
+def test_client_drops_rows_when_writer_is_unreachable(tmp_path):
+    client = AnalyticsClient(str(tmp_path / "missing.sock"))
+    rows = [("r", "invoice", "total_amount", "1", 0.5, False, None)] * 3
+
+    assert client.submit(rows) is False
+    assert client.dropped == 3
+    assert client.top() == []
+
+
+def test_metrics_are_summed_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv(metrics.MULTIPROC_ENV, str(tmp_path))
+    children = [_ctx.Process(target=_count_process, args=("invoice",)) for _ in range(3)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join(30)
+
+    text = metrics.render_latest().decode()
+
+    assert 'idp_documents_processed_total{doc_type="invoice"} 3.0' in text
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_serve_starts_workers_and_writer(tmp_path):
+    port = _free_port()
+    env = {k: v for k, v in os.environ.items() if k not in (WRITER_ENV, metrics.MULTIPROC_ENV)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "idp.serve", "--workers", "2", "--port", str(port)],
+        cwd=tmp_path,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as res:
+                    assert res.status == 200
+                break
+            except OSError:
+                assert proc.poll() is None and time.monotonic() < deadline, "server did not start"
+                time.sleep(0.2)
+        assert (tmp_path / "data" / "analytics.sock").exists()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as res:
+            assert b"idp_pipeline_in_flight" in res.read()
+        # Launcher, writer and both workers record into the shared directory.
+        pids = {path.stem.rsplit("_", 1)[1] for path in (tmp_path / "data" / "prometheus").glob("*.db")}
+        assert len(pids) >= 3
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait(60)
+    assert proc.returncode == 0
+    assert (tmp_path / "data" / "idp.duckdb").exists()
+    assert not (tmp_path / "data" / "analytics.sock").exists()
@@ -0,0 +1,152 @@
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import idp.ocr.page_cache as page_cache_module
+import idp.ocr.tesseract_engine as engine_module
+from idp.config.settings import OCRSettings, Settings
+from idp.ocr.page_cache import PageOCRCache
+from idp.ocr.parallel import ParallelOCREngine
+from idp.ocr.preprocess import BlankPage
+from idp.ocr.tesseract_engine import OCRResult, OCRTimeoutError, OCRToken, run_tesseract
+
+
+def _fake_page(image, timeout=0):
+    # Later pages finish first so out-of-order completion is exercised.
+    idx = int(image)
+    time.sleep(0.01 * (5 - idx % 5))
+    tokens = [
+        OCRToken(text=f"p{idx}w{j}", confidence=0.5 + 0.1 * j, bbox=(j, idx, j + 1, idx + 1), page_num=1)
+        for j in range(3)
+    ]
+    return OCRResult(tokens=tokens, full_text=" ".join(t.text for t in tokens), metadata={})
+
+
+def _slow_page(image, timeout=0):
+    if image == "slow":
+        raise OCRTimeoutError(f"OCR of {image} exceeded {timeout}s")
+    return _fake_page(image, timeout)
+
+
+def test_parallel_matches_sequential():
+    pages = [str(i) for i in range(12)]
+    sequential = ParallelOCREngine(workers=1, page_fn=_fake_page).run(pages)
+    engine = ParallelOCREngine(workers=4, max_pending=6, page_fn=_fake_page)
+    progress = []
+    try:
+        parallel = engine.run(iter(pages), on_page=progress.append)
+    finally:
+        engine.close()
+
+    assert parallel == sequential
+    assert progress == list(range(1, 13))
+    assert parallel.metadata["pages"] == 12
+    assert [t.page_num for t in parallel.tokens[::3]] == list(range(1, 13))
+    assert parallel.full_text.split("\n")[0] == "p0w0 p0w1 p0w2"
+
+
+def test_parallel_propagates_page_timeout():
+    engine = ParallelOCREngine(workers=2, page_timeout_s=1, page_fn=_slow_page)
+    try:
+        with pytest.raises(OCRTimeoutError):
+            engine.run(["0", "slow", "2"])
+    finally:
+        engine.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="shell script stands in for tesseract")
+def test_page_running_past_timeout_is_killed(tmp_path, monkeypatch):
+    # A tesseract that answers --version but then hangs on every page.
+    hung = tmp_path / "tesseract"
+    hung.write_text('#!/bin/sh\nif [ "$1" = "--version" ]; then echo "tesseract 5.3.0"; exit 0; fi\nexec sleep 30\n')
+    hung.chmod(0o755)
+    settings = Settings(ocr=OCRSettings(tesseract_cmd=str(hung)))
+    monkeypatch.setattr(engine_module, "get_settings", lambda: settings)
+    pages = [np.full((32, 32), 255, dtype=np.uint8)] * 3
+    engine = ParallelOCREngine(workers=2, page_timeout_s=0.5, page_fn=run_tesseract)
+
+    start = time.perf_counter()
+    try:
+        with pytest.raises(OCRTimeoutError, match="exceeded 0.5s"):
+            engine.run(pages)
+    finally:
+        engine.close()
+
+    # The stuck child was killed at the timeout instead of running its 30 s.
+    assert time.perf_counter() - start < 10
+
+
+class _CountingPageFn:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, image, timeout=0):
+        with self._lock:
+            self.calls += 1
+        value = int(image[0, 0])
+        token = OCRToken(text=f"v{value}", confidence=0.9, bbox=(0, 0, 1, 1), page_num=1)
+        return OCRResult(tokens=[token], full_text=token.text, metadata={})
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_page_cache_skips_repeated_pages(workers):
+    boilerplate = np.full((8, 8), 7, dtype=np.uint8)
+    pages = [np.full((8, 8), 1, dtype=np.uint8), boilerplate, boilerplate.copy(), boilerplate.copy()]
+    page_fn = _CountingPageFn()
+    engine = ParallelOCREngine(workers=workers, page_fn=page_fn, page_cache=PageOCRCache())
+    try:
+        first = engine.run(pages)
+        second = engine.run(pages)
+    finally:
+        engine.close()
+
+    assert page_fn.calls == 2
+    assert first == second
+    assert [t.page_num for t in first.tokens] == [1, 2, 3, 4]
+    assert first.full_text == "v1\nv7\nv7\nv7"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="shell scripts stand in for tesseract")
+def test_page_cache_is_salted_with_the_ocr_engine(tmp_path, monkeypatch):
+    binaries = {}
+    for version in ("4.1.1", "5.3.0"):
+        path = tmp_path / f"tesseract-{version}"
+        path.write_text(f'#!/bin/sh\necho "tesseract {version}"\n')
+        path.chmod(0o755)
+        binaries[version] = str(path)
+
+    def cache_key(**ocr):
+        settings = Settings(ocr=OCRSettings(**ocr))
+        monkeypatch.setattr(page_cache_module, "get_settings", lambda: settings)
+        return PageOCRCache.from_settings().key(np.zeros((4, 4), dtype=np.uint8))
+
+    base = cache_key(tesseract_cmd=binaries["5.3.0"])
+    assert cache_key(tesseract_cmd=binaries["5.3.0"]) == base
+    assert cache_key(tesseract_cmd=binaries["4.1.1"]) != base
+    assert cache_key(tesseract_cmd=binaries["5.3.0"], languages=["deu"]) != base
+    assert cache_key(tesseract_cmd=binaries["5.3.0"], backend="tesserocr") != base
+
+
+def test_page_cache_evicts_by_token_budget():
+    cache = PageOCRCache(max_entries=10, max_tokens=3)
+    tokens = [OCRToken(text="w", confidence=1.0, bbox=(0, 0, 1, 1), page_num=1)] * 2
+    for key in ("a", "b", "c"):
+        cache.put(key, OCRResult(tokens=list(tokens), full_text="w w", metadata={}))
+
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.stats()["tokens"] <= 3
+
+
+def test_blank_pages_skip_ocr():
+    page_fn = _CountingPageFn()
+    pages = [np.full((8, 8), 1, dtype=np.uint8), BlankPage(2), np.full((8, 8), 3, dtype=np.uint8)]
+    result = ParallelOCREngine(workers=1, page_fn=page_fn).run(pages)
+
+    assert page_fn.calls == 2
+    assert result.metadata["blank_pages"] == [2]
+    assert [t.page_num for t in result.tokens] == [1, 3]
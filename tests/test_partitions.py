@@ -0,0 +1,63 @@
+from datetime import date, datetime
+
+import duckdb
+import pytest
+
+from idp.postprocess import analytics, partitions
+
+TODAY = date(2025, 3, 10)
+
+
+def _live_db(tmp_path, days):
+    con = duckdb.connect(str(tmp_path / "idp.duckdb"))
+    con.execute(analytics._SCHEMA)
+    rows = [
+        (f"req-{day}-{i}", "invoice", "total", str(i), 0.9, i % 2 == 0, datetime(2025, 3, day, 12, i))
+        for day in days
+        for i in range(3)
+    ]
+    con.executemany("INSERT INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    return con
+
+
+def test_archive_compact_and_retention(tmp_path):
+    root = tmp_path / "archive"
+    con = _live_db(tmp_path, [7, 8, 10])
+
+    assert partitions.archive_rows(con, root, hot_days=1, today=TODAY) == [date(2025, 3, 7), date(2025, 3, 8)]
+    assert con.execute("SELECT COUNT(*) FROM extractions").fetchone()[0] == 3
+
+    # A second archive run for the same day adds another file to its partition.
+    con.execute("INSERT INTO extractions VALUES ('late', 'invoice', 'iban', '', 0.5, FALSE, '2025-03-08 23:00')")
+    partitions.archive_rows(con, root, hot_days=1, today=TODAY)
+    assert len(list(partitions.partition_dir(root, date(2025, 3, 8)).glob("*.parquet"))) == 2
+    assert partitions.compact_partitions(root) == [date(2025, 3, 8)]
+    assert len(list(partitions.partition_dir(root, date(2025, 3, 8)).glob("*.parquet"))) == 1
+
+    partitions.create_unified_view(con, root)
+    assert con.execute("SELECT COUNT(*) FROM extractions_all").fetchone()[0] == 10
+    assert con.execute("SELECT COUNT(*) FROM extractions_all WHERE date = '2025-03-08'").fetchone()[0] == 4
+
+    assert partitions.apply_retention(root, retention_days=3, today=TODAY) == [date(2025, 3, 7)]
+    partitions.create_unified_view(con, root)
+    assert con.execute("SELECT COUNT(*) FROM extractions_all").fetchone()[0] == 7
+    con.close()
+
+
+def test_recent_window_skips_old_partitions(tmp_path):
+    root = tmp_path / "archive"
+    con = _live_db(tmp_path, [1, 5, 9, 10])
+    partitions.archive_rows(con, root, hot_days=1, today=TODAY)
+    partitions.create_unified_view(con, root)
+
+    # An unreadable old partition only breaks queries that actually open it
+    # (the first partition is read for the schema, so damage a later one).
+    for part in partitions.partition_dir(root, date(2025, 3, 5)).glob("*.parquet"):
+        part.write_bytes(b"not parquet")
+    recent = con.execute(
+        "SELECT COUNT(*) FROM extractions_all WHERE date >= DATE '2025-03-09'"
+    ).fetchone()[0]
+    assert recent == 6
+    with pytest.raises(duckdb.Error):
+        con.execute("SELECT COUNT(*) FROM extractions_all").fetchall()
+    con.close()
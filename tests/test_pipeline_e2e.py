@@ -1,6 +1,6 @@
 """End-to-end test: synthetic invoice → OCR → extractor → validators.
 
-This is the only test that actually exercises Tesseract. It is skipped if the
+These are the only tests that actually exercise Tesseract. They are skipped if the
 binary is not available so contributors without tesseract installed can still
 run the rest of the suite.
 """
@@ -9,12 +9,15 @@ from __future__ import annotations
 import shutil
 from pathlib import Path
 
+import numpy as np
 import pytest
 
 from idp.models.extractor import HeuristicExtractor
+from idp.ocr.preprocess import PreprocessConfig, preprocess_array
+from idp.ocr.roi import roi_ocr_page
 from idp.ocr.tesseract_engine import run_tesseract
 from idp.postprocess import validators
-from tests.fixtures.synthetic import make_invoice
+from tests.fixtures.synthetic import letter_page, make_invoice
 
 pytestmark = pytest.mark.skipif(
     shutil.which("tesseract") is None, reason="tesseract binary not installed"
@@ -40,3 +43,15 @@ def test_invoice_extraction_end_to_end(tmp_path: Path):
 
     summary = validators.validate_fields(fields)
     assert summary.is_valid, f"validation errors: {summary.errors}"
+
+
+def test_roi_ocr_reads_the_same_fields(tmp_path: Path):
+    sample = make_invoice(tmp_path / "invoice.png", seed=42)
+    page = preprocess_array(np.asarray(letter_page(sample.image_path, 300)), PreprocessConfig())
+    ocr = roi_ocr_page(page)
+
+    assert ocr.metadata["source"] == "roi"
+    assert ocr.metadata["roi_coverage"] < 1.0
+    fields = {p.name: p.value for p in HeuristicExtractor().extract(ocr).fields}
+    for name in ("invoice_number", "invoice_date", "total_amount"):
+        assert fields.get(name) == sample.ground_truth[name]
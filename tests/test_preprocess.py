@@ -0,0 +1,164 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import idp.ocr.preprocess as preprocess
+from idp.ocr.parallel import prefetch
+from idp.ocr.preprocess import PreprocessConfig, preprocess_array, preprocess_image
+from tests.fixtures.synthetic import letter_page, make_invoice
+
+
+def test_in_memory_preprocess_matches_disk_path(tmp_path: Path):
+    sample = make_invoice(tmp_path / "invoice.png", seed=3)
+    rgb = np.asarray(Image.open(sample.image_path).convert("RGB"))
+    cfg = PreprocessConfig()
+
+    in_memory = preprocess_array(rgb, cfg)
+
+    disk_path = tmp_path / "page.png"
+    Image.fromarray(rgb).save(disk_path, format="PNG")
+    preprocess_image(disk_path, cfg)
+    on_disk = cv2.imread(str(disk_path), cv2.IMREAD_GRAYSCALE)
+
+    assert in_memory.dtype == np.uint8 and in_memory.ndim == 2
+    assert np.array_equal(in_memory, on_disk)
+
+
+def test_page_stream_renders_one_page_at_a_time(tmp_path: Path, monkeypatch):
+    calls = []
+
+    def fake_render(path, dpi, first_page, last_page):
+        calls.append((first_page, last_page))
+        page = np.full((48, 64, 3), 255, dtype=np.uint8)
+        page[10:30, 5:60:8] = 0  # a few glyph-sized strokes
+        return [Image.fromarray(page)]
+
+    monkeypatch.setattr(preprocess, "pdfinfo_from_path", lambda path: {"Pages": 200})
+    monkeypatch.setattr(preprocess, "convert_from_path", fake_render)
+
+    stream = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, PreprocessConfig(max_pages=3))
+    pages = list(stream)
+
+    assert calls == [(1, 1), (2, 2), (3, 3)]
+    assert len(pages) == 3 and all(isinstance(p, np.ndarray) for p in pages)
+    assert stream.metadata["page_count"] == 3
+    assert stream.metadata["checksum"] == preprocess.checksum_arrays(pages)
+
+
+def test_prefetch_preserves_order_and_errors():
+    assert list(prefetch(range(10), depth=2)) == list(range(10))
+
+    def failing():
+        yield 1
+        raise ValueError("render failed")
+
+    with pytest.raises(ValueError):
+        list(prefetch(failing(), depth=1))
+
+
+def test_blank_page_detection(tmp_path: Path):
+    cfg = PreprocessConfig()
+    white = np.full((3300, 2550, 3), 255, dtype=np.uint8)
+    scanner_noise = np.clip(
+        np.random.default_rng(0).normal(235, 3, size=(3300, 2550)), 0, 255
+    ).astype(np.uint8)
+    sample = make_invoice(tmp_path / "invoice.png", seed=1)
+    text_page = np.asarray(Image.open(sample.image_path).convert("RGB"))
+
+    assert preprocess.is_blank_page(white, cfg)
+    assert preprocess.is_blank_page(scanner_noise, cfg)
+    assert not preprocess.is_blank_page(text_page, cfg)
+
+
+def test_sparse_text_page_is_not_blank():
+    # One short line of ~7pt text at 300 DPI: too little ink for a thumbnail
+    # ink ratio, but every glyph is still there at render resolution.
+    cfg = PreprocessConfig(dpi=300)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 29)
+    except OSError:
+        pytest.skip("DejaVuSans not installed")
+    page = Image.new("RGB", (2550, 3300), color=(255, 255, 255))
+    ImageDraw.Draw(page).text((300, 1500), "Total: 1,234.00", fill=(0, 0, 0), font=font)
+    assert not preprocess.is_blank_page(np.asarray(page), cfg)
+
+    # Dust specks on an otherwise empty scan stay blank.
+    specks = np.full((3300, 2550), 255, dtype=np.uint8)
+    for y, x in [(400, 300), (1800, 2000), (3000, 1200)]:
+        specks[y : y + 3, x : x + 3] = 0
+    assert preprocess.is_blank_page(specks, cfg)
+
+
+def test_page_stream_marks_blank_pages(tmp_path: Path, monkeypatch):
+    def fake_render(path, dpi, first_page, last_page):
+        page = np.full((48, 64, 3), 255, dtype=np.uint8)
+        if first_page != 2:
+            page[10:30, 5:60:8] = 0
+        return [Image.fromarray(page)]
+
+    monkeypatch.setattr(preprocess, "pdfinfo_from_path", lambda path: {"Pages": 3})
+    monkeypatch.setattr(preprocess, "convert_from_path", fake_render)
+
+    stream = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, PreprocessConfig())
+    pages = list(stream)
+
+    assert pages[1] == preprocess.BlankPage(2)
+    assert isinstance(pages[0], np.ndarray) and isinstance(pages[2], np.ndarray)
+    assert stream.metadata["blank_pages"] == [2]
+
+
+def test_glyph_height_scales_with_dpi_and_picks_dpi(tmp_path: Path):
+    sample = make_invoice(tmp_path / "invoice.png", seed=2)
+    at_100 = preprocess.estimate_glyph_height(np.asarray(letter_page(sample.image_path, 100)))
+    at_200 = preprocess.estimate_glyph_height(np.asarray(letter_page(sample.image_path, 200)))
+    assert at_100 and at_200 == pytest.approx(2 * at_100, rel=0.15)
+
+    cfg = PreprocessConfig(dpi=300, adaptive_dpi=True, adaptive_target_glyph_px=2 * at_100)
+    assert preprocess.choose_dpi(np.asarray(letter_page(sample.image_path, 100)), cfg) == 200
+    # Nothing to measure: keep the configured DPI.
+    assert preprocess.choose_dpi(np.full((1100, 850), 255, dtype=np.uint8), cfg) == 300
+    cfg.adaptive_target_glyph_px = 100 * at_100
+    assert preprocess.choose_dpi(np.asarray(letter_page(sample.image_path, 100)), cfg) == cfg.adaptive_max_dpi
+
+
+def test_page_stream_adaptive_dpi(tmp_path: Path, monkeypatch):
+    sample = make_invoice(tmp_path / "invoice.png", seed=3)
+    calls = []
+
+    def fake_render(path, dpi, first_page, last_page):
+        calls.append((first_page, dpi))
+        if first_page == 2:
+            return [Image.new("RGB", (int(8.5 * dpi), 11 * dpi), color=(255, 255, 255))]
+        return [letter_page(sample.image_path, dpi)]
+
+    monkeypatch.setattr(preprocess, "pdfinfo_from_path", lambda path: {"Pages": 2})
+    monkeypatch.setattr(preprocess, "convert_from_path", fake_render)
+
+    cfg = PreprocessConfig(dpi=300, adaptive_dpi=True, use_text_layer=False)
+    stream = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, cfg)
+    pages = list(stream)
+
+    chosen = stream.metadata["page_dpi"][1]
+    assert cfg.adaptive_min_dpi <= chosen < 300
+    # The blank page is caught on its preview and never rendered for OCR.
+    assert calls == [(1, 100), (1, chosen), (2, 100)]
+    assert pages[1] == preprocess.BlankPage(2)
+    assert pages[0].shape[1] == int(8.5 * chosen)
+
+
+@pytest.mark.parametrize("angle", [-4.0, 0.0, 2.5])
+def test_projection_skew_estimate(tmp_path: Path, angle: float):
+    sample = make_invoice(tmp_path / "invoice.png", seed=5)
+    gray = cv2.cvtColor(np.asarray(Image.open(sample.image_path).convert("RGB")), cv2.COLOR_RGB2GRAY)
+    page = np.full((1650, 1275), 255, dtype=np.uint8)
+    page[100 : 100 + gray.shape[0], 80 : 80 + gray.shape[1]] = gray
+    h, w = page.shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    skewed = cv2.warpAffine(page, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+    estimate = preprocess.estimate_skew_projection(skewed, PreprocessConfig())
+
+    assert abs(estimate - angle) <= 0.15
@@ -0,0 +1,89 @@
+import pstats
+import threading
+from pathlib import Path
+
+from prometheus_client import REGISTRY
+
+from idp.ocr.parallel import ParallelOCREngine, prefetch
+from idp.ocr.tesseract_engine import OCRResult
+from idp.services import profiling
+from idp.services.profiling import RequestProfiler, dpi_bucket, page_bucket, stage, stage_labels
+from idp.utils.logging import _current_span, traced
+
+
+def test_label_buckets_stay_small():
+    assert {page_bucket(n) for n in range(1, 1000)} == {"1", "2-5", "6-20", "21-100", ">100"}
+    assert [dpi_bucket(d) for d in (72, 150, 200, 300, 600, None)] == [
+        "<=150", "<=150", "151-300", "151-300", ">300", "unknown"
+    ]
+
+
+def test_stage_labels_and_spans_reach_worker_threads():
+    seen = []
+
+    def page_fn(image, timeout=0):
+        with stage("tesseract", per_page=True):
+            seen.append((profiling._labels.get(), _current_span.get()["trace_id"]))
+        return OCRResult(tokens=[], full_text=str(image), metadata={})
+
+    def count():
+        return REGISTRY.get_sample_value(
+            "idp_stage_latency_ms_count", {"stage": "tesseract", "pages": "2-5", "dpi": "151-300"}
+        ) or 0.0
+
+    before = count()
+    engine = ParallelOCREngine(workers=3, page_fn=page_fn)
+    try:
+        with traced("extraction") as span, stage_labels(4, 300):
+            engine.run(prefetch(iter(["a", "b", "c", "d"]), depth=2))
+    finally:
+        engine.close()
+
+    assert seen and all(item == (("2-5", "151-300"), span["trace_id"]) for item in seen)
+    assert count() - before == 4
+
+
+def test_profiler_writes_sampled_requests(tmp_path: Path):
+    profiler = RequestProfiler(sample_rate=1.0, profile_dir=tmp_path)
+    with profiler.maybe_profile("req-1"):
+        sum(i * i for i in range(1000))
+    with RequestProfiler(sample_rate=0.0, profile_dir=tmp_path).maybe_profile("req-2"):
+        pass
+
+    (written,) = tmp_path.iterdir()
+    assert written.name.endswith("_req-1.prof")
+    assert pstats.Stats(str(written)).total_calls > 0
+
+
+def test_concurrent_sampled_requests_profile_one_at_a_time(tmp_path: Path):
+    profiler = RequestProfiler(sample_rate=1.0, profile_dir=tmp_path)
+    inside = threading.Barrier(2, timeout=5)
+    errors = []
+
+    def extract(request_id):
+        try:
+            with profiler.maybe_profile(request_id):
+                inside.wait()  # both requests are in flight at once
+                sum(i * i for i in range(1000))
+        except Exception as exc:  # pragma: no cover - the failure being tested
+            errors.append(exc)
+
+    threads = [threading.Thread(target=extract, args=(f"req-{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(list(tmp_path.iterdir())) == 1
+    with profiler.maybe_profile("req-3"):  # the slot was released
+        pass
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_profile_write_errors_do_not_fail_the_request(tmp_path: Path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    with RequestProfiler(sample_rate=1.0, profile_dir=blocker / "profiles").maybe_profile("req-1"):
+        result = sum(range(10))
+    assert result == 45
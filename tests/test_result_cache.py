@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import idp.services.pipeline as pipeline_module
+from idp.services.cache import ResultCache
+from idp.services.pipeline import ExtractionPipeline
+
+
+def _doc(i: int) -> dict:
+    return {
+        "documents": [
+            {
+                "doc_type": "invoice",
+                "fields": {"invoice_number": {"value": f"INV-{i}", "confidence": 0.85, "valid": True}},
+                "validation_summary": {"errors": [], "warnings": []},
+            }
+        ],
+        "ocr_avg_confidence": 0.9,
+    }
+
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(memory_entries=2, disk_dir=None)
+    cache.put("a", _doc(1))
+    cache.put("b", _doc(2))
+    assert cache.get("a") == _doc(1)
+    cache.put("c", _doc(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == _doc(1)
+    assert cache.stats()["hits"]["memory"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_memory_eviction_and_respects_size(tmp_path: Path):
+    cache = ResultCache(memory_entries=1, disk_dir=tmp_path, disk_max_bytes=10_000)
+    cache.put("k1", _doc(1))
+    cache.put("k2", _doc(2))
+    assert cache.get("k1") == _doc(1)
+    assert cache.stats()["hits"]["disk"] == 1
+
+    small = ResultCache(memory_entries=0, disk_dir=tmp_path / "small", disk_max_bytes=700)
+    for i in range(5):
+        small.put(f"key{i}", _doc(i))
+    assert small.stats()["disk_bytes"] <= 700
+    assert small.get("key4") == _doc(4)
+    assert small.get("key0") is None
+
+
+def test_pipeline_serves_repeat_documents_from_cache(tmp_path: Path, monkeypatch):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    calls = []
+
+    pipeline = ExtractionPipeline()
+    pipeline.result_cache = ResultCache(memory_entries=4, disk_dir=None)
+    monkeypatch.setattr(pipeline, "_process", lambda path, progress=None: calls.append(path) or _doc(7))
+    monkeypatch.setattr(pipeline_module, "persist_run", lambda response: None)
+    monkeypatch.setattr(pipeline_module, "aggregate_failures", lambda: [])
+
+    first = pipeline.extract(pdf)
+    second = pipeline.extract(pdf)
+    bypass = pipeline.extract(pdf, use_cache=False)
+
+    assert len(calls) == 2
+    assert first["metrics"]["cache_hit"] is False
+    assert second["metrics"]["cache_hit"] is True
+    assert bypass["metrics"]["cache_hit"] is False
+    assert second["documents"] == first["documents"]
+    assert second["request_id"] != first["request_id"]
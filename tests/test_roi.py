@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from prometheus_client import REGISTRY
+
+import idp.ocr.roi as roi
+from idp.models.extractor import ExtractionResult, FieldPrediction
+from idp.ocr.page_cache import PageOCRCache
+from idp.ocr.parallel import ParallelOCREngine
+from idp.ocr.tesseract_engine import OCRResult, OCRToken
+from tests.fixtures.synthetic import make_invoice
+
+
+def _invoice_page(tmp_path: Path) -> np.ndarray:
+    sample = make_invoice(tmp_path / "invoice.png", seed=4)
+    return np.asarray(Image.open(sample.image_path).convert("L"))
+
+
+def test_detect_text_lines_finds_one_box_per_line(tmp_path: Path):
+    lines = roi.detect_text_lines(_invoice_page(tmp_path))
+
+    # 16 non-empty lines; the item table's columns may split into extra boxes.
+    assert 16 <= len(lines) <= 24
+    assert lines == sorted(lines, key=lambda b: (b[1], b[0]))
+
+
+def test_roi_page_ocrs_only_anchor_lines(tmp_path: Path, monkeypatch):
+    page = _invoice_page(tmp_path)
+    lines = roi.detect_text_lines(page)
+    anchor_line, plain_line = lines[2], lines[0]  # "Invoice Number: ...", "ACME WIDGETS INC."
+    calls = []
+
+    def fake_tesseract(image, timeout=0):
+        calls.append(image.shape)
+        if len(calls) == 1:  # the low-resolution pass, at scale 0.5
+            tokens = [
+                OCRToken(text, 0.9, tuple(v // 2 for v in box), 1)
+                for text, box in (("Invoice", anchor_line), ("ACME", plain_line))
+            ]
+            return OCRResult(tokens=tokens, full_text="", metadata={})
+        return OCRResult(tokens=[OCRToken("INV-1", 0.9, (5, 5, 20, 15), 1)], full_text="INV-1", metadata={})
+
+    monkeypatch.setattr(roi, "run_tesseract", fake_tesseract)
+    result = roi.roi_ocr_page(page, lowres_scale=0.5)
+
+    assert len(calls) == 2
+    x0, y0 = result.tokens[0].bbox[:2]
+    assert x0 == 5 + max(0, anchor_line[0] - (anchor_line[3] - anchor_line[1]) // 2)
+    assert anchor_line[1] - 20 < y0 < anchor_line[3]
+    assert result.metadata["source"] == "roi"
+    assert 0 < result.metadata["roi_coverage"] < 0.2
+
+
+def test_roi_page_without_anchors_falls_back_to_full_page(tmp_path: Path, monkeypatch):
+    page = _invoice_page(tmp_path)
+    calls = []
+
+    def fake_tesseract(image, timeout=0):
+        calls.append(image.shape)
+        return OCRResult(tokens=[], full_text="", metadata={})
+
+    monkeypatch.setattr(roi, "run_tesseract", fake_tesseract)
+    result = roi.roi_ocr_page(page)
+
+    assert calls[-1] == page.shape
+    assert result.metadata["source"] == "roi_fallback"
+    assert result.metadata["roi_coverage"] == 1.0
+
+
+def test_missing_required():
+    required = {"invoice": ["invoice_number", "total_amount"]}
+    complete = ExtractionResult(
+        "invoice", [FieldPrediction("invoice_number", "INV-1", 0.9), FieldPrediction("total_amount", "10", 0.9)]
+    )
+    partial = ExtractionResult("invoice", [FieldPrediction("invoice_number", "INV-1", 0.9)])
+
+    assert roi.missing_required(complete, required) is None
+    assert roi.missing_required(partial, required) == ["total_amount"]
+    assert roi.missing_required(ExtractionResult("tax_form", []), required) is None
+    assert roi.missing_required(ExtractionResult("unknown", []), required) == ["doc_type"]
+
+
+def test_engine_page_fn_override_bypasses_page_cache():
+    cache = PageOCRCache()
+    engine = ParallelOCREngine(
+        workers=1, page_fn=lambda image, timeout=0: OCRResult([], "full", {}), page_cache=cache
+    )
+    page = np.zeros((4, 4), dtype=np.uint8)
+
+    result = engine.run([page], page_fn=lambda image, timeout=0: OCRResult([], "roi", {"source": "roi"}))
+
+    assert result.full_text == "roi" and result.metadata["page_sources"] == ["roi"]
+    assert cache.stats()["entries"] == 0
+    assert engine.run([page]).full_text == "full"
+
+
+def test_engine_counts_pages_by_the_source_their_result_reports():
+    def pages(source):
+        return REGISTRY.get_sample_value("idp_pages_total", {"source": source}) or 0.0
+
+    sources = ["roi", "roi_fallback", None]
+    before = {source: pages(source or "ocr") for source in sources}
+    results = iter(OCRResult([], "", {"source": source} if source else {}) for source in sources)
+    engine = ParallelOCREngine(workers=1)
+    page = np.zeros((4, 4), dtype=np.uint8)
+
+    result = engine.run([page] * 3, page_fn=lambda image, timeout=0: next(results))
+
+    assert result.metadata["page_sources"] == ["roi", "roi_fallback", "ocr"]
+    assert {source: pages(source or "ocr") - before[source] for source in sources} == {
+        "roi": 1, "roi_fallback": 1, None: 1
+    }
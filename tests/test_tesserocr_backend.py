@@ -0,0 +1,169 @@
+import shutil
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+import idp.ocr.tesseract_engine as engine
+from idp.config.settings import OCRSettings, Settings
+from idp.ocr import tesserocr_backend
+from idp.ocr.parallel import ParallelOCREngine
+from idp.ocr.tesseract_engine import OCRResult, as_columns
+
+_TSV_ROWS = "\n".join(
+    [
+        "1\t1\t0\t0\t0\t0\t0\t0\t800\t600\t-1\t",
+        "5\t1\t1\t1\t1\t1\t60\t40\t120\t30\t96.4\tInvoice",
+        "5\t1\t1\t1\t1\t2\t190\t40\t140\t30\t91.2\tNumber:",
+        "5\t1\t1\t1\t1\t3\t340\t40\t150\t30\t88\tINV-10042",
+    ]
+)
+
+
+class _FakeAPI:
+    created = 0
+
+    def __init__(self, lang, path=None):
+        type(self).created += 1
+        self.lang = lang
+        self.ended = False
+
+    def SetImage(self, image):
+        self.image = image
+
+    def Recognize(self, timeout=0):
+        return True
+
+    def GetTSVText(self, page):
+        return _TSV_ROWS
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        self.ended = True
+
+
+def _tokens(result):
+    tokens = as_columns(result.tokens)
+    return list(zip(tokens.texts(), tokens.confidences.tolist(), tokens.bboxes.tolist(), tokens.page_nums.tolist()))
+
+
+def test_tesserocr_backend_parses_api_tsv_into_tokens(monkeypatch):
+    monkeypatch.setattr(tesserocr_backend, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=_FakeAPI))
+    monkeypatch.setattr(engine, "get_settings", lambda: Settings(ocr=OCRSettings(backend="tesserocr")))
+    _FakeAPI.created = 0
+    tesserocr_backend.end_all()
+
+    page = np.full((600, 800), 255, dtype=np.uint8)
+    results = []
+
+    def worker():
+        results.append(engine.run_tesseract(page))
+        results.append(engine.run_tesseract(page))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # GetTSVText has no header row; the page-level row carries no text.
+    expected = [
+        ("Invoice", [60, 40, 180, 70], 1),
+        ("Number:", [190, 40, 330, 70], 1),
+        ("INV-10042", [340, 40, 490, 70], 1),
+    ]
+    assert _FakeAPI.created == 2  # one handle per thread, reused across pages
+    for result in results:
+        tokens = _tokens(result)
+        assert [(text, bbox, page) for text, _, bbox, page in tokens] == expected
+        # pytesseract's parser truncates conf to an int, on the CLI path too.
+        assert [conf for _, conf, _, _ in tokens] == pytest.approx([0.96, 0.91, 0.88])
+        assert result.full_text == "Invoice Number: INV-10042"
+    tesserocr_backend.end_all()
+
+
+@pytest.mark.skipif(
+    not tesserocr_backend.available() or shutil.which("tesseract") is None,
+    reason="needs both tesserocr and the tesseract binary",
+)
+def test_tesserocr_backend_matches_pytesseract_on_a_real_page(monkeypatch):
+    font_path = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+    if not font_path.exists():
+        pytest.skip("DejaVuSans font not installed")
+    image = Image.new("L", (1200, 300), 255)
+    ImageDraw.Draw(image).text((40, 100), "Invoice Number: INV-10042", fill=0, font=ImageFont.truetype(str(font_path), 48))
+    page = np.asarray(image)
+
+    results = {}
+    for backend in ("pytesseract", "tesserocr"):
+        settings = Settings(ocr=OCRSettings(backend=backend))
+        monkeypatch.setattr(engine, "get_settings", lambda settings=settings: settings)
+        results[backend] = _tokens(engine.run_tesseract(page, timeout=0))
+    tesserocr_backend.end_all()
+
+    assert results["tesserocr"]
+    assert results["tesserocr"] == results["pytesseract"]
+
+
+def _backend_page(image, timeout=0):
+    tesserocr_backend.image_to_data(image, "eng", timeout)
+    return tesserocr_backend._local.apis["eng"]
+
+
+def test_closing_an_engine_ends_only_its_own_handles(monkeypatch):
+    monkeypatch.setattr(tesserocr_backend, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=_FakeAPI))
+    tesserocr_backend.end_all()
+    pages = [np.full((60, 80), 255, dtype=np.uint8)] * 4
+    first, second = (ParallelOCREngine(workers=2, page_fn=_backend_page) for _ in range(2))
+    try:
+        first_apis = first._run_parallel(pages, None, first._page_fn, None)
+        second_apis = second._run_parallel(pages, None, second._page_fn, None)
+        first.close()
+
+        assert all(api.ended for api in first_apis)
+        assert not any(api.ended for api in second_apis)
+        assert not any(api.ended for api in second._run_parallel(pages, None, second._page_fn, None))
+    finally:
+        first.close()
+        second.close()
+    assert all(api.ended for api in second_apis)
+    tesserocr_backend.end_all()
+
+
+def test_handles_of_inline_runs_are_ended_once_their_threads_exit(monkeypatch):
+    monkeypatch.setattr(tesserocr_backend, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=_FakeAPI))
+    tesserocr_backend.end_all()
+    page = np.full((60, 80), 255, dtype=np.uint8)
+    apis = {}
+
+    def page_fn(image, timeout=0):
+        apis[threading.current_thread()] = _backend_page(image, timeout)
+        return OCRResult([], "", {})
+
+    # workers=1 OCRs on the calling thread, e.g. an admission or batch pool.
+    ocr = ParallelOCREngine(workers=1, page_fn=page_fn)
+    stop = threading.Event()
+    live = threading.Thread(target=lambda: (ocr.run([page]), stop.wait(5)))
+    live.start()
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda _: ocr.run([page]), range(4)))
+        while live not in apis:
+            stop.wait(0.01)
+
+        ocr.close()
+        assert all(api.ended for thread, api in apis.items() if thread is not live)
+        assert not apis[live].ended
+    finally:
+        stop.set()
+        live.join()
+    ocr.run([page])  # reaps the handle of the thread that has exited since
+    assert apis[live].ended
+    ocr.close()
+    tesserocr_backend.end_all()
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import idp.ocr.preprocess as preprocess
+from idp.ocr.parallel import ParallelOCREngine
+from idp.ocr.preprocess import PreprocessConfig
+from idp.ocr.tesseract_engine import OCRResult, OCRToken
+from idp.ocr.text_layer import is_usable, parse_bbox_html, uncovered_ink_ratio
+
+_BBOX_HTML = """<!DOCTYPE html><html><body><doc>
+<page width="612.000000" height="792.000000">
+    <word xMin="36.000000" yMin="72.000000" xMax="90.000000" yMax="84.000000">Invoice</word>
+    <word xMin="96.000000" yMin="72.000000" xMax="140.500000" yMax="84.000000">Number:</word>
+    <word xMin="146.000000" yMin="72.000000" xMax="210.000000" yMax="84.000000">INV-10042</word>
+    <word xMin="36.000000" yMin="96.000000" xMax="80.000000" yMax="108.000000">Total</word>
+    <word xMin="86.000000" yMin="96.000000" xMax="120.000000" yMax="108.000000">&amp;</word>
+    <word xMin="126.000000" yMin="96.000000" xMax="170.000000" yMax="108.000000">1,250.00</word>
+</page>
+<page width="612.000000" height="792.000000">
+</page>
+</doc></body></html>"""
+
+
+def test_parse_bbox_html_scales_points_to_pixels():
+    results = parse_bbox_html(_BBOX_HTML, dpi=144, first_page=3)
+
+    assert sorted(results) == [3, 4]
+    first = results[3]
+    assert first.full_text == "Invoice Number: INV-10042 Total & 1,250.00"
+    assert first.tokens[0].bbox == (72, 144, 180, 168)
+    assert {t.page_num for t in first.tokens} == {3}
+    assert first.metadata["source"] == "text_layer"
+    assert results[4].tokens == []
+
+
+def test_text_layer_usability():
+    page = parse_bbox_html(_BBOX_HTML, dpi=300)[1]
+    garbage = OCRResult(
+        tokens=[OCRToken(text="��", confidence=1.0, bbox=(0, 0, 1, 1), page_num=1)] * 8,
+        full_text="",
+        metadata={},
+    )
+
+    assert is_usable(page, min_words=5, min_alnum_ratio=0.6)
+    assert not is_usable(page, min_words=10, min_alnum_ratio=0.6)
+    assert not is_usable(garbage, min_words=5, min_alnum_ratio=0.6)
+
+
+def _page_at_72dpi(layer: OCRResult, scanned_body: bool) -> np.ndarray:
+    """A 612x792pt page rendered at 72 DPI: glyph-sized strokes inside each layer word's box,
+    plus, for a hybrid scan, lines of strokes that exist only as pixels."""
+    page = np.full((792, 612, 3), 255, dtype=np.uint8)
+    for x0, y0, x1, y1 in (np.array(layer.tokens.bboxes) * 72 / 300).astype(int).tolist():
+        page[y0 + 2 : y1 - 2, x0 + 1 : x1 - 1 : 5] = 0
+    if scanned_body:
+        for y in range(200, 700, 16):
+            page[y : y + 8, 40:560:5] = 0
+    return page
+
+
+def test_page_stream_serves_text_pages_without_rendering(tmp_path: Path, monkeypatch):
+    rendered = []
+    layer = parse_bbox_html(_BBOX_HTML, dpi=300)[1]
+
+    def fake_render(path, dpi, first_page, last_page):
+        rendered.append((first_page, dpi))
+        if first_page == 1:
+            return [Image.fromarray(_page_at_72dpi(layer, scanned_body=False))]
+        page = np.full((48, 64, 3), 255, dtype=np.uint8)
+        page[10:30, 5:60:8] = 0
+        return [Image.fromarray(page)]
+
+    monkeypatch.setattr(preprocess, "pdfinfo_from_path", lambda path: {"Pages": 2})
+    monkeypatch.setattr(preprocess, "convert_from_path", fake_render)
+    monkeypatch.setattr(preprocess, "extract_text_layer", lambda *args, **kwargs: {1: layer})
+
+    stream = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, PreprocessConfig())
+    pages = list(stream)
+
+    # Page 1 is only rendered at low DPI to check that the layer explains its ink.
+    assert rendered == [(1, 72), (2, 300)]
+    assert pages[0] == preprocess.TextLayerPage(1, layer)
+    assert isinstance(pages[1], np.ndarray)
+    assert stream.metadata["text_layer_pages"] == [1]
+
+    def fail(image, timeout=0):
+        raise AssertionError("text-layer pages must not be OCR'd")
+
+    result = ParallelOCREngine(workers=1, page_fn=fail).run(pages[:1])
+    assert result.full_text == layer.full_text
+    assert result.metadata["page_sources"] == ["text_layer"]
+
+
+def test_hybrid_scan_with_text_stamp_is_ocrd(tmp_path: Path, monkeypatch):
+    # A scanned page whose only real text objects are a stamp / Bates line:
+    # the layer is "usable" but explains a fraction of the ink on the page.
+    layer = parse_bbox_html(_BBOX_HTML, dpi=300)[1]
+    hybrid = _page_at_72dpi(layer, scanned_body=True)
+    assert uncovered_ink_ratio(layer, _page_at_72dpi(layer, scanned_body=False), 72 / 300) == 0.0
+    assert uncovered_ink_ratio(layer, hybrid, 72 / 300) > 0.9
+
+    def fake_render(path, dpi, first_page, last_page):
+        return [Image.fromarray(hybrid if dpi == 72 else np.asarray(Image.fromarray(hybrid).resize((2550, 3300))))]
+
+    monkeypatch.setattr(preprocess, "pdfinfo_from_path", lambda path: {"Pages": 1})
+    monkeypatch.setattr(preprocess, "convert_from_path", fake_render)
+    monkeypatch.setattr(preprocess, "extract_text_layer", lambda *args, **kwargs: {1: layer})
+
+    stream = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, PreprocessConfig())
+    pages = list(stream)
+
+    assert isinstance(pages[0], np.ndarray)
+    assert stream.metadata["text_layer_pages"] == []
+    assert stream.metadata["page_dpi"] == {1: 300}
+
+    trusting = preprocess.PageStream(tmp_path / "doc.pdf", tmp_path, PreprocessConfig(text_layer_verify=False))
+    assert list(trusting) == [preprocess.TextLayerPage(1, layer)]
@@ -0,0 +1,74 @@
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from idp.ocr.parallel import merge_page_results
+from idp.ocr.tesseract_engine import OCRResult, OCRToken, TokenColumns, as_columns, result_from_data
+
+
+def _data(n: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    words = [rng.choice(["", " ", "Invoice", "Total:", "$1,080.00", " INV-1 ", "é"]) for _ in range(n)]
+    return {
+        "text": words,
+        "conf": [rng.choice([-1, "96.5", 87, "12"]) for _ in range(n)],
+        "left": [rng.randrange(0, 2000) for _ in range(n)],
+        "top": [rng.randrange(0, 3000) for _ in range(n)],
+        "width": [rng.randrange(1, 200) for _ in range(n)],
+        "height": [rng.randrange(1, 40) for _ in range(n)],
+        "page_num": [rng.randrange(1, 3) for _ in range(n)],
+    }
+
+
+def _reference_tokens(data: dict) -> list:
+    """The per-word loop `result_from_data` used to run."""
+    tokens = []
+    for i, raw in enumerate(data["text"]):
+        word = raw.strip()
+        if word:
+            left, top = int(data["left"][i]), int(data["top"][i])
+            bbox = (left, top, left + int(data["width"][i]), top + int(data["height"][i]))
+            tokens.append(OCRToken(word, float(data["conf"][i]) / 100.0, bbox, int(data["page_num"][i])))
+    return tokens
+
+
+def test_result_from_data_matches_per_word_conversion():
+    data = _data(500)
+    result = result_from_data(data)
+    reference = _reference_tokens(data)
+
+    assert isinstance(result.tokens, TokenColumns)
+    assert result.tokens == reference
+    assert result.full_text == " ".join(t.text for t in reference)
+    assert result.metadata["token_count"] == len(reference)
+    assert result.metadata["avg_confidence"] == pytest.approx(
+        sum(t.confidence for t in reference) / len(reference)
+    )
+    assert result_from_data({k: [] for k in data}).tokens == []
+
+
+def test_columns_views_slices_and_pickling():
+    tokens = as_columns([OCRToken("Total:", 0.9, (1, 2, 3, 4), 1), OCRToken("$5.00", 0.8, (5, 2, 9, 4), 1)])
+
+    assert tokens[-1] == OCRToken("$5.00", 0.8, (5, 2, 9, 4), 1)
+    assert list(tokens[1:]) == [tokens[1]] and tokens.texts() == ["Total:", "$5.00"]
+    assert pickle.loads(pickle.dumps(tokens)) == tokens
+    assert as_columns(tokens) is tokens
+    with pytest.raises(ValueError):
+        tokens.bboxes[0, 0] = 7
+
+
+def test_merge_and_shift_build_new_columns():
+    first = result_from_data(_data(50, seed=1))
+    second = OCRResult(tokens=[OCRToken("w", 0.5, (0, 0, 1, 1), 9)], full_text="w", metadata={})
+    before = first.tokens.page_nums.copy()
+
+    merged = merge_page_results([first, second])
+    shifted = first.tokens.shifted(10, 20)
+
+    assert np.array_equal(first.tokens.page_nums, before)
+    assert set(merged.tokens.page_nums.tolist()) == {1, 2} and merged.tokens[-1].page_num == 2
+    assert merged.tokens.texts() == first.tokens.texts() + ["w"]
+    assert np.array_equal(shifted.bboxes - first.tokens.bboxes, np.tile([10, 20, 10, 20], (len(first.tokens), 1)))
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+import idp.api.main as main
+from idp.api.uploads import MULTIPART_OVERHEAD, save_upload
+from idp.config.settings import ServiceSettings, Settings
+
+
+def _save(tmp_path: Path, data: bytes, **kwargs):
+    upload = UploadFile(file=io.BytesIO(data), filename="scan.pdf")
+    return asyncio.run(save_upload(upload, directory=tmp_path, chunk_bytes=1024, **kwargs))
+
+
+def test_upload_is_streamed_and_hashed(tmp_path: Path):
+    data = b"%PDF-1.7\n" + bytes(range(256)) * 40
+    saved = _save(tmp_path, data)
+
+    assert saved.path.parent == tmp_path
+    assert saved.path.read_bytes() == data
+    assert saved.sha256 == hashlib.sha256(data).hexdigest()
+    assert saved.size == len(data)
+
+
+@pytest.mark.parametrize(
+    "data, kwargs, status",
+    [
+        (b"%PDF-1.4\n" + b"x" * 5000, {"max_bytes": 4096}, 413),
+        (b"PK\x03\x04" + b"x" * 5000, {}, 400),
+        (b"hello", {}, 400),
+    ],
+)
+def test_rejected_uploads_leave_no_file(tmp_path: Path, data, kwargs, status):
+    with pytest.raises(HTTPException) as exc:
+        _save(tmp_path, data, **kwargs)
+    assert exc.value.status_code == status
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_oversized_request_body_is_rejected_before_parsing(monkeypatch):
+    settings = Settings(service=ServiceSettings(max_upload_bytes=1024))
+    monkeypatch.setattr(main, "get_settings", lambda: settings)
+    client = TestClient(main.app)
+    body = b"%PDF-1.4\n" + b"x" * (MULTIPART_OVERHEAD + 2048)
+
+    res = client.post("/extract", files={"file": ("scan.pdf", body, "application/pdf")})
+    assert res.status_code == 413
+    assert res.json()["detail"].startswith("Request body exceeds")
+
+    # No Content-Length: counted while it is received.
+    boundary = "idp-test-boundary"
+    payload = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.pdf\"\r\n"
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + body + f"\r\n--{boundary}--\r\n".encode()
+    chunks = (payload[i : i + 8192] for i in range(0, len(payload), 8192))
+    res = client.post(
+        "/extract", content=chunks, headers={"content-type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert res.status_code == 413